@@ -5,19 +5,47 @@
     
     Revision History
     29 May 2017 - Created and debugged
+    19 Oct 2026 - Added tracker bank, offline batch filtering and steady state gains
+    19 Oct 2026 - trackfilt __slots__, state snapshot/restore and clone
     
     Author: Lars Soltmann
     
     References: - https://en.wikipedia.org/wiki/Alpha_beta_filter
+                - Kalata, P.R., "The Tracking Index: A Generalized Parameter for alpha-beta and
+                  alpha-beta-gamma Target Trackers", IEEE Trans. AES, vol. 20, no. 2, 1984
+                - https://en.wikipedia.org/wiki/Prefix_sum (parallel scan)
     
     Notes:
     - Written for Python3
+    - trackfilt_bank holds the states of many channels in arrays and updates them all in one
+      call, alpha, beta and dt can be scalars or one value per channel
+    - track_batch filters whole recorded arrays with a constant dt. With constant gains the
+      filter is a linear recurrence s[k] = A*s[k-1] + B*z[k], which is evaluated with a
+      parallel prefix scan in at most log2(N) NumPy passes instead of a loop over samples,
+      the scan stops early once the filter's memory has decayed below rounding error. Results
+      match trackfilt.track to rounding error
+    - steady_state_gains(lam) returns the optimal steady state alpha and beta for the tracking
+      index lam = process noise std * dt^2 / measurement noise std, results are cached
+    - trackfilt.snapshot(buf,offset) packs the filter state (STATE_FIELDS) into a writable
+      buffer as doubles, or into a new bytearray if no buffer is given, and
+      restore(buf,offset) loads it back. clone() returns an independent copy
     
-    Requirements: None
+    Requirements: numpy (trackfilt_bank and track_batch only)
     
 '''
 
+import math
+import struct
+import functools
+
 class trackfilt:
+    __slots__=('alpha','beta','first_time','xk_1','vk_1')
+
+    ## Dynamic state saved by snapshot(), one double each
+    STATE_FIELDS=__slots__[2:]
+    STATE=struct.Struct('<3d')
+    STATE_SIZE=STATE.size
+
     def __init__(self,alpha,beta):
         self.alpha=alpha
         self.beta=beta
@@ -34,6 +62,26 @@ class trackfilt:
     ## Reset filter
     def reset(self):
         self.first_time=1
+        self.xk_1=0
+        self.vk_1=0
+
+    ## Save the filter state to a buffer
+    def snapshot(self,buf=None,offset=0):
+        if buf is None:
+            buf=bytearray(self.STATE_SIZE)
+        self.STATE.pack_into(buf,offset,self.first_time,self.xk_1,self.vk_1)
+        return buf
+
+    ## Load the filter state from a buffer written by snapshot()
+    def restore(self,buf,offset=0):
+        self.first_time,self.xk_1,self.vk_1=self.STATE.unpack_from(buf,offset)
+
+    ## Independent copy with the same coefficients and state
+    def clone(self):
+        new=trackfilt.__new__(trackfilt)
+        for name in trackfilt.__slots__:
+            setattr(new,name,getattr(self,name))
+        return new
 
     ## Track the state
     def track(self,xm,dt):
@@ -63,3 +111,144 @@ class trackfilt:
             self.vk_1=vk
 
         return xk,vk
+
+
+## Steady state alpha and beta from the tracking index (Kalata)
+# lam = sigma_process*dt^2/sigma_measurement
+@functools.lru_cache(maxsize=1024)
+def steady_state_gains(lam):
+    r=(4+lam-math.sqrt(8*lam+lam*lam))/4
+    alpha=1-r*r
+    beta=2*(2-alpha)-4*math.sqrt(1-alpha)
+    return alpha,beta
+
+
+class trackfilt_bank:
+    def __init__(self,alpha,beta,n):
+        import numpy as np
+        self.n=n
+        self.alpha=np.broadcast_to(np.asarray(alpha,dtype=float),(n,)).copy()
+        self.beta=np.broadcast_to(np.asarray(beta,dtype=float),(n,)).copy()
+        self.xk_1=np.zeros(n)
+        self.vk_1=np.zeros(n)
+        self.reset()
+
+    ## Set new alpha coefficient(s), channel=None sets all channels
+    def set_alpha(self,newalpha,channel=None):
+        if channel is None:
+            self.alpha[:]=newalpha
+        else:
+            self.alpha[channel]=newalpha
+
+    ## Set new beta coefficient(s), channel=None sets all channels
+    def set_beta(self,newbeta,channel=None):
+        if channel is None:
+            self.beta[:]=newbeta
+        else:
+            self.beta[channel]=newbeta
+
+    ## Reset filter, channel=None resets all channels
+    def reset(self,channel=None):
+        import numpy as np
+        if channel is None:
+            self.first_time=np.ones(self.n,dtype=bool)
+        else:
+            self.first_time[channel]=True
+
+    ## Track the states of all channels, xm and dt are scalars or one value per channel
+    def track(self,xm,dt):
+        import numpy as np
+        xm=np.asarray(xm,dtype=float)
+        # Predict the next state while holding velocity constant
+        xk=self.xk_1+self.vk_1*dt
+        # Correct using the prediction error
+        rk=xm-xk
+        xk=xk+self.alpha*rk
+        vk=self.vk_1+(self.beta*rk)/dt
+        # First sample of a channel sets its state to the measurement
+        if self.first_time.any():
+            xk=np.where(self.first_time,xm,xk)
+            vk=np.where(self.first_time,0.0,vk)
+            self.first_time[:]=False
+        self.xk_1=xk
+        self.vk_1=vk
+        return xk,vk
+
+
+## Filter whole arrays offline with a constant dt
+# xm has shape (N,) or (N,channels), alpha and beta are scalars or one value per channel
+# Returns position and velocity arrays the same shape as xm
+def track_batch(xm,dt,alpha,beta):
+    import numpy as np
+    z=np.asarray(xm,dtype=float)
+    single=z.ndim==1
+    if single:
+        z=z[:,None]
+    n,m=z.shape
+    alpha=np.broadcast_to(np.asarray(alpha,dtype=float),(m,))
+    beta=np.broadcast_to(np.asarray(beta,dtype=float),(m,))
+
+    # State transition s[k] = A*s[k-1] + c[k], s = [x, v]
+    a00=1-alpha
+    a01=(1-alpha)*dt
+    a10=-beta/dt
+    a11=1-beta
+    x=alpha*z
+    v=beta/dt*z
+    # First sample sets the state to the measurement
+    x[0]=z[0]
+    v[0]=0
+
+    # Inclusive scan, after the pass with shift d every s[k] holds the sum over the last 2d inputs
+    d=1
+    while d<n:
+        xd=x[:-d]
+        vd=v[:-d]
+        x[d:],v[d:]=x[d:]+a00*xd+a01*vd,v[d:]+a10*xd+a11*vd
+        # A^(2d)
+        a00,a01,a10,a11=a00*a00+a01*a10,a00*a01+a01*a11,a10*a00+a11*a10,a10*a01+a11*a11
+        d=d*2
+        # Inputs older than 2d samples no longer contribute once A^(2d) has decayed below rounding error
+        if max(np.abs(a00).max(),np.abs(a01/dt).max(),np.abs(a10*dt).max(),np.abs(a11).max())<1e-17:
+            break
+
+    if single:
+        return x[:,0],v[:,0]
+    return x,v
+
+
+## Benchmark the bank and batch filter against trackfilt
+if __name__ == '__main__':
+    import random
+    import time
+    import numpy as np
+
+    random.seed(1)
+    n=100000
+    dt=0.01
+    z=[math.sin(0.01*i)+random.gauss(0,0.05) for i in range(n)]
+    alpha,beta=steady_state_gains(0.01)
+
+    f=trackfilt(alpha,beta)
+    t0=time.perf_counter()
+    ref=[f.track(zi,dt) for zi in z]
+    t_scalar=(time.perf_counter()-t0)/n
+
+    t0=time.perf_counter()
+    x,v=track_batch(z,dt,alpha,beta)
+    t_batch=(time.perf_counter()-t0)/n
+    err=max(abs(x[i]-ref[i][0]) for i in range(n))
+
+    channels=16
+    bank=trackfilt_bank(alpha,beta,channels)
+    zz=np.array(z[:10000])
+    t0=time.perf_counter()
+    for zi in zz:
+        bank.track(np.full(channels,zi),dt)
+    t_bank=(time.perf_counter()-t0)/(len(zz)*channels)
+
+    print('alpha, beta for lam=0.01:  %.4f %.4f' % (alpha,beta))
+    print('trackfilt.track:           %.3f us/sample' % (t_scalar*1e6))
+    print('trackfilt_bank (%d ch):    %.3f us/sample' % (channels,t_bank*1e6))
+    print('track_batch:               %.3f us/sample' % (t_batch*1e6))
+    print('Max difference:            %.2e' % err)
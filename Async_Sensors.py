@@ -0,0 +1,127 @@
+'''
+    Async_Sensors.py
+
+    Description: asyncio versions of the I2C sensor drivers (MB1242, MS5805, HWSSC)
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    Inputs: async_MB1242 / async_MS5805 / async_HWSSC init
+                - sensor = driver instance (MB1242, MS5805 after initialize(), HWSSC)
+                - executor <optional> = concurrent.futures executor for the blocking bus calls,
+                                        defaults to a shared single thread executor
+            async_HWSSC.measure
+                - calRange, sensRange = see SSC005D.convertPressure
+
+    Outputs: async_MB1242.measure   - distance (cm)
+             async_MS5805.measure   - [pressure (mbar), temperature (degC)]
+             async_HWSSC.measure    - differential pressure (units of sensRange)
+
+    NOTES:
+    - Written for python3
+    - Conversion waits use asyncio.sleep, so one event loop can interleave the conversions
+      of all sensors instead of sleeping through each one in turn
+    - The blocking smbus calls run in the executor so they never stall the event loop. The
+      default executor has one thread because transactions on one bus are serial anyway
+    - The wrapped driver is still usable directly, its attributes (dist, PRESS, TEMP, pdata)
+      are updated as usual
+    - Example:
+          async def main():
+              sonar=async_MB1242(MB1242(0x70))
+              baro=async_MS5805(MS5805(0x76))
+              dist,(press,temp)=await asyncio.gather(sonar.measure(),baro.measure())
+
+'''
+
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+_executor=None
+
+## Shared executor for the blocking bus calls
+def default_executor():
+    global _executor
+    if _executor is None:
+        _executor=ThreadPoolExecutor(max_workers=1,thread_name_prefix='i2c')
+    return _executor
+
+
+class _async_sensor:
+    def __init__(self,sensor,executor=None):
+        self.sensor=sensor
+        self.executor=executor if executor is not None else default_executor()
+
+    ## Run a blocking driver call in the executor
+    async def run(self,fn,*args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor,fn,*args)
+
+
+class async_MB1242(_async_sensor):
+    def __init__(self,sensor,executor=None,wait=0.1):
+        _async_sensor.__init__(self,sensor,executor)
+        self.wait=wait # MaxBotix recommends 100ms between reading commands
+
+    async def measure(self):
+        await self.run(self.sensor.refreshDistance)
+        await asyncio.sleep(self.wait)
+        await self.run(self.sensor.readDistance)
+        return self.sensor.dist #cm
+
+
+class async_MS5805(_async_sensor):
+    async def measure(self):
+        s=self.sensor
+        # Uses the driver's non-blocking state machine, including temperature decimation
+        if s.conversion is None:
+            await self.run(s.poll)
+        while True:
+            remaining=s.conversion_time-(time.monotonic()-s.t_start)
+            await asyncio.sleep(max(remaining,0))
+            if await self.run(s.poll)==1:
+                return [s.PRESS,s.TEMP] #mbar, degC
+
+
+class async_HWSSC(_async_sensor):
+    async def measure(self,calRange,sensRange):
+        await self.run(self.sensor.readPressure_raw)
+        return self.sensor.convertPressure(calRange,sensRange)
+
+
+## Compare sequential blocking reads with interleaved async reads on a fake bus
+if __name__ == '__main__':
+    from I2C_Bus import fake_i2c_bus
+    from MB1242 import MB1242
+    from MS5805 import MS5805
+    from SSC005D import HWSSC
+
+    bus=fake_i2c_bus()
+    bus.set_read(0x70,0x00,[0,120])
+    bus.set_read(0x28,0,[0x20,0x00])
+    bus.set_read(0x76,0x00,[0x62,0xA8,0xA4])
+    sonar=MB1242(0x70,bus=bus)
+    baro=MS5805(0x76,bus=bus)
+    baro.C1,baro.C2,baro.C3,baro.C4,baro.C5,baro.C6=46372,43981,29059,27842,31553,28165
+    baro.precompute()
+    pitot=HWSSC(0x28,bus=bus)
+
+    t0=time.perf_counter()
+    sonar.refreshDistance()
+    time.sleep(0.1)
+    sonar.readDistance()
+    baro.read_pressure_temperature()
+    pitot.readPressure_raw()
+    t_blocking=time.perf_counter()-t0
+
+    async def main():
+        a_sonar=async_MB1242(sonar)
+        a_baro=async_MS5805(baro)
+        a_pitot=async_HWSSC(pitot)
+        t0=time.perf_counter()
+        await asyncio.gather(a_sonar.measure(),a_baro.measure(),a_pitot.measure(1,5))
+        return time.perf_counter()-t0
+
+    t_async=asyncio.run(main())
+    print('Blocking, one after another:  %.1f ms' % (t_blocking*1e3))
+    print('asyncio, interleaved:         %.1f ms' % (t_async*1e3))
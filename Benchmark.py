@@ -0,0 +1,498 @@
+'''
+    Benchmark.py
+
+    Description: Hot path benchmarks with JSON baselines and regression checking
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    Inputs: (command line)
+                python3 Benchmark.py                              run and print the benchmarks
+                python3 Benchmark.py --save baseline.json         run and store the results as a baseline
+                python3 Benchmark.py --compare baseline.json      run and compare with a baseline, the exit
+                                                                  status is 1 if any hot path regressed
+                --threshold <percent> <defaults to 10>  = slowdown counted as a regression
+                --repeat <n> <defaults to 7>            = timed runs per benchmark, the fastest is used
+                --only <name> [<name> ...]              = run only these benchmarks
+            run_benchmarks
+                - names <optional> = list of benchmark names, defaults to all of BENCHMARKS
+                - repeat <defaults to 7> = timed runs per benchmark
+                - min_time <defaults to 0.02> = minimum length of one timed run (s)
+            compare_results
+                - results, baseline = dictionaries of name : ns per call
+                - threshold <defaults to 10> = percent slowdown counted as a regression
+
+    Outputs: run_benchmarks     - dictionary of benchmark name : ns per call
+             compare_results    - list of [name, baseline ns, current ns, change (%)] for the
+                                  benchmarks in both, and the list of names that regressed
+
+    NOTES:
+    - Written for python3
+    - Runs offline, the drivers are given fake buses (Hardware.py) and the GPS decoder is
+      fed recorded style frames, so no hardware is needed
+    - Inputs come from fixed seeds and stepping clocks instead of time.time, so every run
+      does the same work
+    - Each benchmark is timed repeat times and the fastest run is kept, which is the least
+      affected by other load on the machine. Baselines are only comparable on the same
+      machine and Python version, compare mode warns when they differ
+    - 'all 4' benchmarks save and restore (or copy) one each of comp_filt, alt_kalman, PID
+      and trackfilt, as for a checkpoint of the whole estimator and controller state
+    - To add a benchmark write a function returning (fn, calls), where fn() makes calls
+      calls of the hot path, and add it to BENCHMARKS
+
+    Calls: Complementary_Filter2, Kalman_Altitude, PID, Alpha_Beta_Filter, Navigation,
+           UbloxGPS, MS5805, I2C_Bus, Hardware, Read_Config
+
+'''
+
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import platform
+import atexit
+import tempfile
+import argparse
+
+
+## Clock that advances a fixed step every call, replaces time.time in the filters and controllers
+class step_clock:
+    def __init__(self,dt=0.001):
+        self.t=0.0
+        self.dt=dt
+
+    def __call__(self):
+        self.t=self.t+self.dt
+        return self.t
+
+
+## Repeatable IMU samples (ax, ay, az [g], gx, gy, gz [deg/s], mx, my, mz [uT])
+def imu_samples(n,seed=1):
+    rng=random.Random(seed)
+    samples=[]
+    for i in range(n):
+        roll=0.3*math.sin(i*0.01)
+        pitch=0.2*math.cos(i*0.013)
+        samples.append((-math.sin(pitch)+rng.gauss(0,0.01),math.sin(roll)+rng.gauss(0,0.01),math.cos(roll)*math.cos(pitch)+rng.gauss(0,0.01),
+                        rng.gauss(0,2),rng.gauss(0,2),rng.gauss(0,2),
+                        20+rng.gauss(0,0.5),5+rng.gauss(0,0.5),40+rng.gauss(0,0.5)))
+    return samples
+
+## Repeatable [lat, lon] points around a home position
+def nav_points(n,seed=2,home=(40.0,-105.0),spread=0.03):
+    rng=random.Random(seed)
+    return [[home[0]+rng.uniform(-spread,spread),home[1]+rng.uniform(-spread,spread)] for i in range(n)]
+
+## UBX NAV-PVT frame as read from the receiver
+def pvt_frame(lat=40.0,lon=-105.0,hmsl=1600.0):
+    import struct
+    values=[0xb5,0x62,0x01,0x07,92,123456000,2026,10,19,12,0,0,0x37,50,0,3,0x01,0,12,
+            int(lon*1e7),int(lat*1e7),int(hmsl*1000+20000),int(hmsl*1000),1500,2500,
+            1000,-500,-200,1118,4500000,300,80000,120,0,0,0,0,0,0,0,0,0,0,0,0]
+    return list(struct.pack('<BBBBHIHBBBBBBIiBBBBiiiiIIiiiiiIIHBBBBBBiBBBBH',*values))
+
+CONFIG_TEXT='''#Configuration file
+PITCH_PID
+1.1 2.2 3.3 1.2
+
+ROLL_PID
+4.4 5.5 6.6 4.5
+
+YAW_PID
+7.7 8.8 9.9 7.8
+
+ALT_PID
+1.0 0.5 0.1 2.0
+
+MAX_PITCH
+30
+
+MAX_ROLL
+30
+
+MAX_YAWRATE
+90
+
+PWM_RANGE
+1000 2000
+
+PWM_FREQ
+400
+
+DEAD_BAND
+20
+
+THR_CUT
+50
+
+SYS_ORIENTATION
+1
+
+SYS_ORIENTATION_OFFSET
+0.5 -0.5
+'''
+
+
+## Benchmarks, each returns (fn, calls)
+def bench_attitude2():
+    from Complementary_Filter2 import comp_filt
+    samples=[s[:6] for s in imu_samples(2000)]
+    def run():
+        cf=comp_filt(clock=step_clock())
+        for s in samples:
+            cf.attitude2(*s)
+    return run,len(samples)
+
+def bench_attitude3():
+    from Complementary_Filter2 import comp_filt
+    samples=imu_samples(2000)
+    def run():
+        cf=comp_filt(1.0,-2.0,0.5,clock=step_clock())
+        for s in samples:
+            cf.attitude3(*s)
+    return run,len(samples)
+
+def bench_alt_kf():
+    from Kalman_Altitude import alt_kalman
+    rng=random.Random(3)
+    steps=[([1.0,1.0,1.0 if i%5==0 else 0.0,1.0 if i%5==0 else 0.0],
+            [i*0.1+rng.gauss(0,0.1),i*0.1+rng.gauss(0,1),i*0.1+rng.gauss(0,5),2.5+rng.gauss(0,0.5)],0.04) for i in range(2000)]
+    def run():
+        kf=alt_kalman([1.0,0.0,0.0,1.0],[0.01,0.1],[0.5,4.0,25.0,1.0],[0.0,0.0])
+        for h,z,dt in steps:
+            kf.alt_kf(h,z,dt)
+    return run,len(steps)
+
+def bench_pid_type1():
+    from PID import PID
+    rng=random.Random(4)
+    actual=[rng.gauss(0,5) for i in range(5000)]
+    def run():
+        pid=PID(1.0,0.1,0.05,10.0,clock=step_clock(0.01))
+        for a in actual:
+            pid.control(0.0,a,1)
+    return run,len(actual)
+
+def bench_pid_type2():
+    from PID import PID
+    rng=random.Random(5)
+    actual=[(rng.gauss(0,5),rng.gauss(0,20)) for i in range(5000)]
+    def run():
+        pid=PID(1.0,0.1,0.05,10.0,clock=step_clock(0.01))
+        for a,dadt in actual:
+            pid.control(0.0,a,2,dadt)
+    return run,len(actual)
+
+def bench_track():
+    from Alpha_Beta_Filter import trackfilt
+    rng=random.Random(6)
+    xm=[i*0.04+rng.gauss(0,0.3) for i in range(5000)]
+    def run():
+        tf=trackfilt(0.5,0.1)
+        for x in xm:
+            tf.track(x,0.04)
+    return run,len(xm)
+
+def _nav_bench(method,local):
+    from Navigation import nav
+    n=nav()
+    if local==1:
+        n.set_local_mode([40.0,-105.0])
+    p=nav_points(3000)
+    rng=random.Random(7)
+    if method=='destination_point':
+        args=[(p[i],rng.uniform(0,360),rng.uniform(0,5000)) for i in range(len(p))]
+    elif method=='crosstrack':
+        args=[(p[i],p[i-1],p[i-2]) for i in range(len(p))]
+    else:
+        args=[(p[i],p[i-1]) for i in range(len(p))]
+    fn=getattr(n,method)
+    def run():
+        for a in args:
+            fn(*a)
+    return run,len(args)
+
+def bench_nav_distance():
+    return _nav_bench('distance',0)
+
+def bench_nav_bearing():
+    return _nav_bench('bearing',0)
+
+def bench_nav_destination_point():
+    return _nav_bench('destination_point',0)
+
+def bench_nav_crosstrack():
+    return _nav_bench('crosstrack',0)
+
+def bench_nav_distance_local():
+    return _nav_bench('distance',1)
+
+def bench_nav_bearing_local():
+    return _nav_bench('bearing',1)
+
+def bench_nav_destination_point_local():
+    return _nav_bench('destination_point',1)
+
+def bench_nav_crosstrack_local():
+    return _nav_bench('crosstrack',1)
+
+def _ublox():
+    from UbloxGPS import Ublox
+    from Hardware import fake_spi
+    return Ublox(bus=fake_spi())
+
+def bench_ublox_decode():
+    gps=_ublox()
+    frames=[pvt_frame(40.0+i*1e-5,-105.0-i*1e-5,1600.0+i*0.1) for i in range(1000)]
+    def run():
+        for f in frames:
+            gps.decodeMessage(f)
+    return run,len(frames)
+
+def bench_ublox_scan():
+    gps=_ublox()
+    # Frames separated by idle bytes, as clocked out of the SPI port
+    stream=[]
+    for i in range(50):
+        stream.extend([0xff]*20)
+        stream.extend(pvt_frame(40.0+i*1e-5))
+    def run():
+        gps.typeFlag=0
+        data_array=[0]*100
+        messageType=gps.messageType
+        for b in stream:
+            messageType(b,data_array)
+    return run,len(stream)
+
+def _estimators():
+    from Complementary_Filter2 import comp_filt
+    from Kalman_Altitude import alt_kalman
+    from PID import PID
+    from Alpha_Beta_Filter import trackfilt
+    clock=step_clock()
+    cf=comp_filt(1.0,-2.0,0.5,clock=clock)
+    kf=alt_kalman([1.0,0.0,0.0,1.0],[0.01,0.1],[0.5,4.0,25.0,1.0],[0.0,0.0])
+    pid=PID(1.0,0.1,0.05,10.0,clock=clock)
+    tf=trackfilt(0.5,0.1)
+    for i,s in enumerate(imu_samples(100)):
+        cf.attitude3(*s)
+        kf.alt_kf([1.0,1.0,0.0,0.0],[i*0.1,i*0.1,0.0,0.0],0.04)
+        pid.control(0.0,cf.roll_d,1)
+        tf.track(i*0.1,0.04)
+    return [cf,kf,pid,tf]
+
+def bench_snapshot_restore():
+    objs=_estimators()
+    buf=bytearray(sum(o.STATE_SIZE for o in objs))
+    def run():
+        for i in range(1000):
+            offset=0
+            for o in objs:
+                o.snapshot(buf,offset)
+                offset=offset+o.STATE_SIZE
+            offset=0
+            for o in objs:
+                o.restore(buf,offset)
+                offset=offset+o.STATE_SIZE
+    return run,1000
+
+def bench_clone():
+    objs=_estimators()
+    def run():
+        for i in range(1000):
+            for o in objs:
+                o.clone()
+    return run,1000
+
+def bench_deepcopy():
+    import copy
+    objs=_estimators()
+    def run():
+        for i in range(100):
+            copy.deepcopy(objs)
+    return run,100
+
+def _ms5805():
+    from MS5805 import MS5805
+    from I2C_Bus import fake_i2c_bus
+    baro=MS5805(0x76,bus=fake_i2c_bus())
+    baro.C1,baro.C2,baro.C3,baro.C4,baro.C5,baro.C6=46372,43981,29059,27842,31553,28165
+    baro.precompute()
+    rng=random.Random(8)
+    # Temperatures above and below 20degC so both compensation branches run
+    raw=[(6465444+rng.randint(-20000,20000),8077636+rng.randint(-300000,300000)) for i in range(5000)]
+    return baro,raw
+
+def bench_ms5805_compensate():
+    baro,raw=_ms5805()
+    def run():
+        for d1,d2 in raw:
+            baro.compensate(d1,d2)
+    return run,len(raw)
+
+def bench_ms5805_compensate_int():
+    baro,raw=_ms5805()
+    def run():
+        for d1,d2 in raw:
+            baro.compensate_int(d1,d2)
+    return run,len(raw)
+
+def bench_config_parse():
+    from Read_Config import parse_configuration
+    def run():
+        for i in range(100):
+            parse_configuration(CONFIG_TEXT)
+    return run,100
+
+## One temporary folder for the benchmarks' files, removed when the program exits
+_temp_dir=None
+
+def _temp_folder():
+    global _temp_dir
+    if _temp_dir is None:
+        _temp_dir=tempfile.TemporaryDirectory(prefix='ap_bench_')
+        atexit.register(_temp_dir.cleanup)
+    return _temp_dir.name
+
+def _config_file(name):
+    file_name=os.path.join(_temp_folder(),name)
+    with open(file_name,'w') as f:
+        f.write(CONFIG_TEXT)
+    return file_name
+
+def bench_config_read():
+    from Read_Config import read_config_file
+    file_name=_config_file('config_read.txt')
+    def run():
+        for i in range(100):
+            read_config_file(file_name,'','',use_cache=0).read_configuration_file()
+    return run,100
+
+def bench_config_read_cached():
+    from Read_Config import read_config_file
+    file_name=_config_file('config_cached.txt')
+    read_config_file(file_name,'','').read_configuration_file()
+    def run():
+        for i in range(100):
+            read_config_file(file_name,'','').read_configuration_file()
+    return run,100
+
+BENCHMARKS={
+    'comp_filt.attitude2':              bench_attitude2,
+    'comp_filt.attitude3':              bench_attitude3,
+    'alt_kalman.alt_kf':                bench_alt_kf,
+    'PID.control type 1':               bench_pid_type1,
+    'PID.control type 2':               bench_pid_type2,
+    'trackfilt.track':                  bench_track,
+    'nav.distance':                     bench_nav_distance,
+    'nav.bearing':                      bench_nav_bearing,
+    'nav.destination_point':            bench_nav_destination_point,
+    'nav.crosstrack':                   bench_nav_crosstrack,
+    'nav.distance local':               bench_nav_distance_local,
+    'nav.bearing local':                bench_nav_bearing_local,
+    'nav.destination_point local':      bench_nav_destination_point_local,
+    'nav.crosstrack local':             bench_nav_crosstrack_local,
+    'snapshot+restore all 4':           bench_snapshot_restore,
+    'clone all 4':                      bench_clone,
+    'copy.deepcopy all 4':              bench_deepcopy,
+    'Ublox.decodeMessage':              bench_ublox_decode,
+    'Ublox.messageType scan':           bench_ublox_scan,
+    'MS5805.compensate':                bench_ms5805_compensate,
+    'MS5805.compensate_int':            bench_ms5805_compensate_int,
+    'parse_configuration':              bench_config_parse,
+    'read_config_file':                 bench_config_read,
+    'read_config_file cached':          bench_config_read_cached,
+}
+
+
+## Time the benchmarks, returns a dictionary of name : ns per call
+def run_benchmarks(names=None,repeat=7,min_time=0.02):
+    results={}
+    for name in (names if names is not None else BENCHMARKS):
+        fn,calls=BENCHMARKS[name]()
+        # Warm up, and run fn enough times that each timed run takes at least min_time
+        t0=time.perf_counter()
+        fn()
+        loops=max(1,int(math.ceil(min_time/max(time.perf_counter()-t0,1e-9))))
+        best=float('inf')
+        for i in range(repeat):
+            t0=time.perf_counter()
+            for j in range(loops):
+                fn()
+            best=min(best,time.perf_counter()-t0)
+        results[name]=best/(loops*calls)*1e9
+    return results
+
+## Describe the machine the results were taken on
+def environment():
+    return {'python':platform.python_version(),'implementation':platform.python_implementation(),
+            'machine':platform.machine(),'processor':platform.processor(),'system':platform.system()}
+
+def save_baseline(file_name,results):
+    with open(file_name,'w') as f:
+        json.dump({'environment':environment(),'results':results},f,indent=2,sort_keys=True)
+    return None
+
+def load_baseline(file_name):
+    with open(file_name,'r') as f:
+        return json.load(f)
+
+## Compare results with a baseline, change is positive when slower
+def compare_results(results,baseline,threshold=10.0):
+    rows=[]
+    regressions=[]
+    for name in results:
+        if name not in baseline:
+            continue
+        change=(results[name]-baseline[name])/baseline[name]*100
+        rows.append([name,baseline[name],results[name],change])
+        if change>threshold:
+            regressions.append(name)
+    return rows,regressions
+
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Hot path benchmarks')
+    parser.add_argument('--save',metavar='FILE',help='store the results as a baseline')
+    parser.add_argument('--compare',metavar='FILE',help='compare with a baseline, exit status 1 on a regression')
+    parser.add_argument('--threshold',type=float,default=10.0,help='percent slowdown counted as a regression')
+    parser.add_argument('--repeat',type=int,default=7,help='timed runs per benchmark')
+    parser.add_argument('--only',nargs='+',metavar='NAME',help='benchmarks to run')
+    args=parser.parse_args(argv)
+
+    if args.only:
+        unknown=[name for name in args.only if name not in BENCHMARKS]
+        if unknown:
+            parser.error('unknown benchmark(s): %s' % ', '.join(unknown))
+    results=run_benchmarks(args.only,args.repeat)
+
+    if args.save:
+        save_baseline(args.save,results)
+
+    if args.compare is None:
+        print('%-32s %12s' % ('benchmark','ns/call'))
+        for name in results:
+            print('%-32s %12.1f' % (name,results[name]))
+        return 0
+
+    baseline=load_baseline(args.compare)
+    if baseline.get('environment')!=environment():
+        print('Warning: baseline was taken on a different machine or Python version')
+    rows,regressions=compare_results(results,baseline['results'],args.threshold)
+    print('%-32s %12s %12s %9s' % ('benchmark','baseline','current','change'))
+    for name,base,current,change in rows:
+        print('%-32s %12.1f %12.1f %+8.1f%%%s' % (name,base,current,change,'  REGRESSION' if name in regressions else ''))
+    missing=[name for name in results if name not in baseline['results']]
+    if missing:
+        print('Not in baseline: %s' % ', '.join(missing))
+    if regressions:
+        print('%d hot path(s) regressed more than %.1f%%' % (len(regressions),args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,9 @@
     21 Mar 2016 - Created and debugged
     04 Apr 2016 - Added magnetometer readings
     28 Apr 2016 - Debugged magnetomer code    
+    19 Oct 2026 - Clock can be passed in for replay and simulation
+    19 Oct 2026 - __slots__, state snapshot/restore and clone
+    19 Oct 2026 - Soft-iron correction matrix for attitude3()
 
     Author: Lars Soltmann
     
@@ -18,6 +21,9 @@
                 gx,gy,gz    - Gyroscope components [deg/s]
                 mx,my,mz    - Magnetometer components [uT] - For attitude3() only
                 hix,hiy,hiz - Mangetometer hard iron offests - Required for attitude3()
+                soft_iron   - 3x3 soft iron correction matrix applied after the hard iron offsets
+                              (see Mag_Calibration.py) - Optional, for attitude3() only
+                clock       - Function returning the current time [s] - Optional, defaults to time.time
     
     OUTPUTS:
                 roll_d      - Roll angle [deg]
@@ -36,19 +42,45 @@
     - Right hand rule used for rates
     - Because filter is based on Euler angles, filter fails and requires a reset if roll or pitch exceeds 90deg
     - *=unfiltered
+    - snapshot(buf,offset) packs the filter state (STATE_FIELDS) into a writable buffer as
+      doubles, or into a new bytearray if no buffer is given, and restore(buf,offset) loads
+      it back. clone() returns an independent copy, e.g. for what-if runs
     
     '''
 
 
 import math
 import time
+import struct
 
 class comp_filt:
-    def __init__(self,hi_x=0,hi_y=0,hi_z=0):
+    __slots__=('clock','hix','hiy','hiz','soft_iron',
+               'first_time','previous_time','iterm_pitch','iterm_roll','iterm_yaw','pitch','roll','yaw',
+               'pitch_d','roll_d','yaw_d','pitch_r','roll_r','yaw_r','thetad_d','phid_d','psid_d')
+
+    ## Dynamic state saved by snapshot(), one double each
+    STATE_FIELDS=__slots__[5:]
+    STATE=struct.Struct('<%dd' % len(STATE_FIELDS))
+    STATE_SIZE=STATE.size
+
+    def __init__(self,hi_x=0,hi_y=0,hi_z=0,clock=time.time,soft_iron=None):
+        self.clock=clock
         self.reset()
         self.hix=hi_x
         self.hiy=hi_y
         self.hiz=hi_z
+        self.set_soft_iron(soft_iron)
+
+    ## Set the soft iron correction matrix (3x3 or 9 values row by row), None to turn it off
+    def set_soft_iron(self,matrix):
+        if matrix is None:
+            self.soft_iron=None
+            return None
+        w=[float(v) for row in matrix for v in (row if hasattr(row,'__len__') else [row])]
+        if len(w)!=9:
+            raise ValueError('Soft iron matrix must be 3x3, got %d values' % len(w))
+        self.soft_iron=tuple(w)
+        return None
     
     def reset(self):
         self.iterm_pitch=0
@@ -56,6 +88,32 @@ class comp_filt:
         self.iterm_yaw=0
         self.previous_time=0
         self.first_time=1
+        self.pitch=self.roll=self.yaw=0
+        self.pitch_d=self.roll_d=self.yaw_d=0
+        self.pitch_r=self.roll_r=self.yaw_r=0
+        self.thetad_d=self.phid_d=self.psid_d=0
+
+    ## Save the filter state to a buffer
+    def snapshot(self,buf=None,offset=0):
+        if buf is None:
+            buf=bytearray(self.STATE_SIZE)
+        self.STATE.pack_into(buf,offset,self.first_time,self.previous_time,self.iterm_pitch,self.iterm_roll,self.iterm_yaw,
+                             self.pitch,self.roll,self.yaw,self.pitch_d,self.roll_d,self.yaw_d,
+                             self.pitch_r,self.roll_r,self.yaw_r,self.thetad_d,self.phid_d,self.psid_d)
+        return buf
+
+    ## Load the filter state from a buffer written by snapshot()
+    def restore(self,buf,offset=0):
+        (self.first_time,self.previous_time,self.iterm_pitch,self.iterm_roll,self.iterm_yaw,
+         self.pitch,self.roll,self.yaw,self.pitch_d,self.roll_d,self.yaw_d,
+         self.pitch_r,self.roll_r,self.yaw_r,self.thetad_d,self.phid_d,self.psid_d)=self.STATE.unpack_from(buf,offset)
+
+    ## Independent copy with the same settings and state
+    def clone(self):
+        new=comp_filt.__new__(comp_filt)
+        for name in comp_filt.__slots__:
+            setattr(new,name,getattr(self,name))
+        return new
 
     ########## ROLL AND PITCH ONLY ##########
     def attitude2(self,ax,ay,az,gx,gy,gz):
@@ -63,12 +121,12 @@ class comp_filt:
         if self.first_time==1:
             dt=0
             self.first_time=0
-            self.previous_time=time.time()
+            self.previous_time=self.clock()
             # Use accelerometer angles as initial angles
             self.pitch=math.atan2(ax,math.sqrt(math.pow(ay,2)+math.pow(az,2)))
             self.roll=-math.atan2(ay,math.sqrt(math.pow(ax,2)+math.pow(az,2)))
         else:
-            t1=time.time()
+            t1=self.clock()
             dt=t1-self.previous_time
             self.previous_time=t1
        
@@ -136,12 +194,16 @@ class comp_filt:
         mx=mx-self.hix
         my=my-self.hiy
         mz=mz-self.hiz
+        # Remove soft-iron distortion
+        if self.soft_iron is not None:
+            w=self.soft_iron
+            mx,my,mz=w[0]*mx+w[1]*my+w[2]*mz,w[3]*mx+w[4]*my+w[5]*mz,w[6]*mx+w[7]*my+w[8]*mz
 
         # Calculate time increment and save for next iteration
         if self.first_time==1:
             dt=0
             self.first_time=0
-            self.previous_time=time.time()
+            self.previous_time=self.clock()
             # Use accelerometer and magnetometer angles as initial angles
             self.pitch=math.atan2(ax,math.sqrt(math.pow(ay,2)+math.pow(az,2)))
             self.roll=-math.atan2(ay,math.sqrt(math.pow(ax,2)+math.pow(az,2)))
@@ -153,7 +215,7 @@ class comp_filt:
                 self.yaw=self.yaw+2*math.pi 
 
         else:
-            t1=time.time()
+            t1=self.clock()
             dt=t1-self.previous_time
             self.previous_time=t1
        
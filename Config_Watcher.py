@@ -0,0 +1,202 @@
+'''
+    Config_Watcher.py
+
+    Description: Hot reload of the configuration file and PID gains without restarting the flight loop
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    Inputs: init
+                - file_name = configuration file (see Read_Config.py for format)
+                - pids <optional> = dictionary of config keyword to PID instance,
+                                    e.g. {'PITCH_PID':pid_pitch,'ROLL_PID':pid_roll}
+                - config <optional> = read_config_file instance to keep in sync
+                - poll_interval <defaults to 0.5> = seconds between checks when inotify is unavailable
+            apply
+                - None, call once per control loop cycle
+
+    Outputs: apply              - number of sections that were updated
+             errors             - errors from the most recent parse (the previous values are kept)
+             version            - number of successful reloads
+
+    NOTES:
+    - Written for python3
+    - The file is watched from a background thread using inotify on Linux, other systems
+      (or if inotify cannot be initialized) fall back to polling the modification time
+    - Parsing happens in the background thread, apply() only compares already parsed values
+      and calls set_kp/set_kd/set_ki, so the control loop never waits for file I/O
+    - Each reload is handed to the control thread as a single tuple assignment, so apply()
+      always sees a complete set of values and gains of one PID are never mixed between
+      two versions of the file
+    - Only sections whose values changed are applied, unchanged PIDs are not touched
+    - A file with errors (e.g. while it is being saved) is ignored until it parses cleanly
+
+    Calls: Read_Config
+
+'''
+
+
+import os
+import sys
+import time
+import struct
+import select
+import threading
+from Read_Config import CONFIG_SECTIONS, parse_configuration
+
+## inotify event masks (linux/inotify.h)
+IN_MODIFY=0x00000002
+IN_CLOSE_WRITE=0x00000008
+IN_MOVED_TO=0x00000080
+IN_CREATE=0x00000100
+IN_EVENT=struct.Struct('iIII')
+
+class config_watcher:
+    def __init__(self,file_name,pids=None,config=None,poll_interval=0.5):
+        self.file_name=os.path.abspath(file_name)
+        self.pids=pids if pids is not None else {}
+        self.config=config
+        self.poll_interval=poll_interval
+        self.errors=[]
+        self.version=0
+        self.thread=None
+        self.running=0
+        self.inotify_fd=-1
+
+        # Latest parsed values, replaced as a whole by the watcher thread
+        self._latest=(0,{})
+        self._applied_version=0
+        self._applied={}
+
+        # Parse once so that the first change is compared against the current file
+        self.reload()
+        self._applied_version=self._latest[0]
+        self._applied=self._latest[1]
+
+    ## Start watching the file in a background thread
+    def start(self):
+        if self.running==1:
+            return None
+        self.running=1
+        self.inotify_fd=self.init_inotify()
+        self.thread=threading.Thread(target=self.watch,name='config_watcher',daemon=True)
+        self.thread.start()
+        return None
+
+    ## Stop the background thread
+    def stop(self):
+        self.running=0
+        if self.thread is not None:
+            self.thread.join()
+            self.thread=None
+        if self.inotify_fd>=0:
+            os.close(self.inotify_fd)
+            self.inotify_fd=-1
+        return None
+
+    ## Set up inotify on the config file's directory, returns -1 if not available
+    # The directory is watched because many editors save by replacing the file
+    def init_inotify(self):
+        if not sys.platform.startswith('linux'):
+            return -1
+        try:
+            import ctypes
+            libc=ctypes.CDLL(None,use_errno=True)
+            fd=libc.inotify_init1(os.O_NONBLOCK|os.O_CLOEXEC)
+            if fd<0:
+                return -1
+            wd=libc.inotify_add_watch(fd,os.path.dirname(self.file_name).encode(),IN_MODIFY|IN_CLOSE_WRITE|IN_MOVED_TO|IN_CREATE)
+            if wd<0:
+                os.close(fd)
+                return -1
+            return fd
+        except (OSError,AttributeError):
+            return -1
+
+    ## Background thread
+    def watch(self):
+        name=os.path.basename(self.file_name)
+        last=self.file_stamp()
+        while self.running==1:
+            if self.inotify_fd>=0:
+                ready=select.select([self.inotify_fd],[],[],self.poll_interval)[0]
+                if not ready:
+                    continue
+                changed=0
+                try:
+                    buf=os.read(self.inotify_fd,4096)
+                except BlockingIOError:
+                    continue
+                i=0
+                while i+IN_EVENT.size<=len(buf):
+                    wd,mask,cookie,length=IN_EVENT.unpack_from(buf,i)
+                    event_name=buf[i+IN_EVENT.size:i+IN_EVENT.size+length].rstrip(b'\0').decode(errors='replace')
+                    if event_name==name:
+                        changed=1
+                    i=i+IN_EVENT.size+length
+                if changed==0:
+                    continue
+            else:
+                time.sleep(self.poll_interval)
+                stamp=self.file_stamp()
+                if stamp==last:
+                    continue
+                last=stamp
+            self.reload()
+        return None
+
+    ## Modification time and size of the file, None if missing
+    def file_stamp(self):
+        try:
+            st=os.stat(self.file_name)
+            return (st.st_mtime_ns,st.st_size)
+        except OSError:
+            return None
+
+    ## Parse the file and publish the values, runs on the watcher thread
+    def reload(self):
+        try:
+            with open(self.file_name,'r') as f:
+                text=f.read()
+        except OSError as e:
+            self.errors=[str(e)]
+            return 0
+        values,errors=parse_configuration(text)
+        self.errors=errors
+        if errors:
+            return 0
+        # Group the values by section so unchanged sections can be skipped
+        sections={}
+        for keyword in CONFIG_SECTIONS:
+            fields=CONFIG_SECTIONS[keyword][0]
+            if fields[0] in values:
+                sections[keyword]=tuple(values[name] for name in fields)
+        if sections!=self._latest[1]:
+            self.version=self._latest[0]+1
+            self._latest=(self.version,sections)
+        return 1
+
+    ## Apply any new values, call from the control loop
+    def apply(self):
+        version,sections=self._latest
+        if version==self._applied_version:
+            return 0
+        updated=0
+        for keyword in sections:
+            values=sections[keyword]
+            if self._applied.get(keyword)==values:
+                continue
+            pid=self.pids.get(keyword)
+            if pid is not None:
+                kp,kd,ki,I_L=values
+                pid.set_kp(kp)
+                pid.set_kd(kd)
+                pid.set_ki(ki)
+                pid.I_L=I_L
+            if self.config is not None:
+                for name,value in zip(CONFIG_SECTIONS[keyword][0],values):
+                    setattr(self.config,name,value)
+            updated=updated+1
+        self._applied_version=version
+        self._applied=sections
+        return updated
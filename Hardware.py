@@ -0,0 +1,189 @@
+'''
+    Hardware.py
+
+    Description: Bus backends for the sensor drivers, real smbus/spidev, recording, file replay and fake
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Transactions recorded in order under the lock, failed transactions recorded and replayed
+
+    Inputs: set_backend
+                - name = 'real'   open the devices with smbus/spidev
+                         'record' as real, and write every transaction to a transcript file
+                         'replay' answer from transcript files written by 'record', no hardware
+                         'fake'   fake_i2c_bus / fake_spi, no hardware
+                - prefix <optional> = transcript file prefix, files are <prefix>_i2c<n>.jsonl
+                                      and <prefix>_spi<bus>.<device>.jsonl
+            open_i2c
+                - bus_number <defaults to 1> = /dev/i2c-<bus_number>
+            open_spi
+                - bus, device <default to 0,0> = /dev/spidev<bus>.<device>
+
+    Outputs: open_i2c           - object with the smbus.SMBus methods the drivers use
+             open_spi           - object with the spidev.SpiDev methods the drivers use
+
+    NOTES:
+    - Written for python3
+    - The drivers (MS5805, HWSSC, MB1242, i2c_bus, Ublox) open their bus here when none is
+      passed in. smbus and spidev are imported only when a real bus is opened, so every module
+      imports on any machine and only constructing a driver with the 'real' backend needs
+      the hardware
+    - The backend defaults to the AP_HARDWARE environment variable ('real' if not set) and
+      the transcript prefix to AP_HARDWARE_FILE ('hardware'), so a program can be switched
+      to recording or replay without changes:
+          AP_HARDWARE=record python3 flight.py     # on the aircraft
+          AP_HARDWARE=replay python3 flight.py     # anywhere, replays the recorded bus traffic
+    - A transcript holds one JSON list per line: [method, arguments, result]. A call that
+      raised is recorded with {"error": repr(exception)} as its result. Replay returns the
+      recorded results in order, raises IOError for recorded errors, ValueError if the
+      program makes a different call than was recorded, and EOFError when the transcript
+      runs out
+    - The recording lock is held across each call and its transcript line, so calls from
+      several threads are recorded in the order they reached the bus
+    - Devices opened for 'replay' or 'fake' take no time, but the drivers' conversion waits
+      (time.sleep) still run
+
+'''
+
+
+import os
+import json
+import threading
+
+BACKENDS=('real','record','replay','fake')
+
+_backend=os.environ.get('AP_HARDWARE','real')
+_prefix=os.environ.get('AP_HARDWARE_FILE','hardware')
+
+## Select the backend used by open_i2c and open_spi
+def set_backend(name,prefix=None):
+    global _backend,_prefix
+    if name not in BACKENDS:
+        raise ValueError('Unknown hardware backend %r, must be one of %s' % (name,', '.join(BACKENDS)))
+    _backend=name
+    if prefix is not None:
+        _prefix=prefix
+    return None
+
+def get_backend():
+    return _backend
+
+def transcript_file(device):
+    return '%s_%s.jsonl' % (_prefix,device)
+
+
+## Open an I2C bus with the selected backend
+def open_i2c(bus_number=1):
+    if _backend not in BACKENDS:
+        raise ValueError('Unknown hardware backend %r (AP_HARDWARE)' % (_backend,))
+    device='i2c%d' % bus_number
+    if _backend=='fake':
+        from I2C_Bus import fake_i2c_bus
+        return fake_i2c_bus()
+    if _backend=='replay':
+        return replay_bus(transcript_file(device))
+    import smbus
+    bus=smbus.SMBus(bus_number)
+    if _backend=='record':
+        return recording_bus(bus,transcript_file(device))
+    return bus
+
+## Open an SPI device with the selected backend
+def open_spi(bus=0,device=0):
+    if _backend not in BACKENDS:
+        raise ValueError('Unknown hardware backend %r (AP_HARDWARE)' % (_backend,))
+    name='spi%d.%d' % (bus,device)
+    if _backend=='fake':
+        return fake_spi()
+    if _backend=='replay':
+        return replay_bus(transcript_file(name))
+    import spidev
+    spi=spidev.SpiDev()
+    spi.open(bus,device)
+    if _backend=='record':
+        return recording_bus(spi,transcript_file(name))
+    return spi
+
+
+class recording_bus:
+    def __init__(self,bus,file_name):
+        self.bus=bus
+        self.file=open(file_name,'w')
+        self.lock=threading.Lock()
+
+    ## Forward any bus method and record the call
+    def __getattr__(self,method):
+        fn=getattr(self.bus,method)
+        if not callable(fn):
+            return fn
+        def call(*args):
+            with self.lock:
+                try:
+                    result=fn(*args)
+                except Exception as e:
+                    self.file.write(json.dumps([method,list(args),{'error':repr(e)}])+'\n')
+                    raise
+                self.file.write(json.dumps([method,list(args),result])+'\n')
+            return result
+        return call
+
+    def close(self):
+        self.file.close()
+        if hasattr(self.bus,'close'):
+            self.bus.close()
+        return None
+
+
+class replay_bus:
+    def __init__(self,file_name):
+        self.file_name=file_name
+        with open(file_name,'r') as f:
+            self.records=[json.loads(line) for line in f if line.strip()]
+        self.index=0
+        self.lock=threading.Lock()
+
+    ## Answer any bus method from the transcript
+    def __getattr__(self,method):
+        if method.startswith('__'):
+            raise AttributeError(method)
+        def call(*args):
+            # Compare in the form the arguments were recorded in
+            args=json.loads(json.dumps(list(args)))
+            with self.lock:
+                if self.index>=len(self.records):
+                    raise EOFError('%s: transcript ended after %d transactions' % (self.file_name,self.index))
+                expected_method,expected_args,result=self.records[self.index]
+                if expected_method!=method or expected_args!=args:
+                    raise ValueError('%s: transaction %d was %s%s when recorded, not %s%s' % (
+                        self.file_name,self.index+1,expected_method,tuple(expected_args),method,tuple(args)))
+                self.index=self.index+1
+            if isinstance(result,dict) and 'error' in result:
+                raise IOError('%s: transaction %d failed when recorded: %s' % (self.file_name,self.index,result['error']))
+            return result
+        return call
+
+    def close(self):
+        return None
+
+
+class fake_spi:
+    def __init__(self):
+        self.pending=[]
+        self.log=[]
+
+    ## Queue bytes to be clocked out to the next transfers
+    def feed(self,data):
+        self.pending.extend(data)
+
+    def open(self,bus,device):
+        return None
+
+    def xfer2(self,values):
+        self.log.append(list(values))
+        n=len(values)
+        data=self.pending[:n]
+        del self.pending[:n]
+        return data+[0]*(n-len(data))
+
+    def close(self):
+        return None
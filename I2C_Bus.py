@@ -0,0 +1,327 @@
+'''
+    I2C_Bus.py
+
+    Description: Shared I2C bus manager and fake bus for the smbus drivers (MS5805, HWSSC, MB1242)
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Failed transactions no longer stop the bus thread, fail_next() on the fake bus
+    19 Oct 2026 - Read merging only for reads registered as idempotent (allow_merge)
+
+    Inputs: i2c_bus init
+                - bus_number <defaults to 1> = I2C bus, /dev/i2c-<bus_number>
+                - threaded <defaults to 1> = 1 to run transactions from a queue on a bus thread,
+                                             0 to run them on the calling thread under a lock
+                - bus <optional> = object with the smbus methods to use instead of opening the bus
+                - merge_reads <optional> = (addr,cmd) pairs of idempotent reads that may be merged,
+                                           cmd is None for read_byte, see allow_merge
+            allow_merge
+                - addr,cmd = device address and command of a read that returns the same data every
+                             time (e.g. a calibration PROM), cmd=None for read_byte
+            fake_i2c_bus
+                - set_read(addr,cmd,data) = data returned by reads of cmd, data can be a list of
+                                            bytes or a function (addr,cmd,length) returning one
+                - on_write = optional function (addr,cmd,data) called for every write
+                - fail_next(addr,count=1) = the next count transactions to addr raise IOError
+
+    Outputs: statistics         - dictionary of device address : [transactions, bus time (s), bytes, batched reads]
+
+    NOTES:
+    - Written for python3
+    - i2c_bus has the same methods as smbus.SMBus that the drivers use, so it is passed to
+      a driver in place of the bus it would otherwise open:
+          bus=i2c_bus(1)
+          baro=MS5805(0x76,bus=bus)
+          pitot=HWSSC(0x28,bus=bus)
+          sonar=MB1242(0x70,bus=bus)
+    - One file descriptor is shared by every device on the bus and transactions from
+      different threads never interleave
+    - In threaded mode identical reads that are queued back to back (same device, command
+      and length) are done once and the result is given to every caller, but only for reads
+      registered with allow_merge. Merging is off by default because most reads consume
+      data: the MS5805 ADC read, the HWSSC and MB1242 measurement reads each return a new
+      sample, and merging them would give two callers the same one. Register only reads of
+      fixed registers, e.g. the MS5805 PROM:
+          for cmd in range(0xA0,0xB0,2):
+              bus.allow_merge(0x76,cmd)
+    - A transaction that fails raises its error in the calling thread only, the bus thread
+      keeps running and every caller waiting on it is released
+    - fake_i2c_bus records every transaction in log and needs no hardware
+    - python3 I2C_Bus.py checks batching and error handling on the fake bus
+
+'''
+
+
+import time
+import threading
+import queue
+
+class _transaction:
+    __slots__=('op','addr','args','done','result','error')
+
+    def __init__(self,op,addr,args):
+        self.op=op
+        self.addr=addr
+        self.args=args
+        self.done=threading.Event()
+        self.result=None
+        self.error=None
+
+
+class i2c_bus:
+    def __init__(self,bus_number=1,threaded=1,bus=None,merge_reads=None):
+        if bus is None:
+            from Hardware import open_i2c
+            bus=open_i2c(bus_number)
+        self.bus=bus
+        self.threaded=threaded
+        self.mergeable=set(merge_reads) if merge_reads is not None else set()
+        self.lock=threading.Lock()
+        self.stats={}
+        self.thread=None
+        if threaded==1:
+            self.queue=queue.Queue()
+            self.thread=threading.Thread(target=self._worker,name='i2c_bus',daemon=True)
+            self.thread.start()
+
+    ## smbus compatible methods
+    def write_byte(self,addr,value):
+        return self.transact('write_byte',addr,(value,))
+
+    def read_byte(self,addr):
+        return self.transact('read_byte',addr,())
+
+    def write_i2c_block_data(self,addr,cmd,data):
+        return self.transact('write_i2c_block_data',addr,(cmd,list(data)))
+
+    def read_i2c_block_data(self,addr,cmd,length=32):
+        return self.transact('read_i2c_block_data',addr,(cmd,length))
+
+    ## Allow identical queued reads of cmd on addr to be merged, only for reads without side effects
+    def allow_merge(self,addr,cmd=None):
+        self.mergeable.add((addr,cmd))
+        return None
+
+    ## 1 if queued copies of transaction t may share one bus read
+    def _mergeable(self,t):
+        if t.op=='read_i2c_block_data':
+            return 1 if (t.addr,t.args[0]) in self.mergeable else 0
+        if t.op=='read_byte':
+            return 1 if (t.addr,None) in self.mergeable else 0
+        return 0
+
+    ## Run one transaction, blocks until it is complete
+    def transact(self,op,addr,args):
+        if self.threaded==1:
+            t=_transaction(op,addr,args)
+            self.queue.put(t)
+            t.done.wait()
+            if t.error is not None:
+                raise t.error
+            return t.result
+        with self.lock:
+            return self._execute(op,addr,args)
+
+    ## Perform a transaction on the bus and record its statistics
+    def _execute(self,op,addr,args):
+        s=self.stats.get(addr)
+        if s is None:
+            s=[0,0.0,0,0]
+            self.stats[addr]=s
+        t0=time.perf_counter()
+        result=getattr(self.bus,op)(addr,*args)
+        dt=time.perf_counter()-t0
+        s[0]=s[0]+1
+        s[1]=s[1]+dt
+        if op=='read_i2c_block_data':
+            s[2]=s[2]+args[1]
+        elif op=='write_i2c_block_data':
+            s[2]=s[2]+1+len(args[1])
+        else:
+            s[2]=s[2]+1
+        return result
+
+    ## Bus thread, runs queued transactions in order
+    def _worker(self):
+        while True:
+            pending=[self.queue.get()]
+            # Take everything that is already waiting so identical reads can be merged
+            while True:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            i=0
+            while i<len(pending):
+                t=pending[i]
+                if t is None:
+                    # Release anything queued behind the close request
+                    for g in pending[i+1:]:
+                        if g is not None:
+                            g.error=IOError('i2c_bus closed')
+                            g.done.set()
+                    return None
+                group=[t]
+                try:
+                    if self._mergeable(t)==1:
+                        while (i+len(group)<len(pending) and pending[i+len(group)] is not None and
+                               pending[i+len(group)].op==t.op and pending[i+len(group)].addr==t.addr and
+                               pending[i+len(group)].args==t.args):
+                            group.append(pending[i+len(group)])
+                    try:
+                        result=self._execute(t.op,t.addr,t.args)
+                        error=None
+                    except Exception as e:
+                        result=None
+                        error=e
+                    if len(group)>1:
+                        s=self.stats.setdefault(t.addr,[0,0.0,0,0])
+                        s[3]=s[3]+len(group)-1
+                    for g in group:
+                        g.result=list(result) if isinstance(result,list) else result
+                        g.error=error
+                except Exception as e:
+                    for g in group:
+                        g.error=e
+                finally:
+                    # Every caller is released, whatever happened above
+                    for g in group:
+                        g.done.set()
+                i=i+len(group)
+
+    ## Per-device statistics
+    def statistics(self):
+        return {addr:list(self.stats[addr]) for addr in self.stats}
+
+    ## Stop the bus thread and close the bus
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread=None
+        if hasattr(self.bus,'close'):
+            self.bus.close()
+        return None
+
+
+class fake_i2c_bus:
+    def __init__(self,on_write=None):
+        self.reads={}
+        self.on_write=on_write
+        self.log=[]
+        self.failures={}
+
+    ## Set the data returned when cmd is read from addr
+    def set_read(self,addr,cmd,data):
+        self.reads[(addr,cmd)]=data
+
+    ## Make the next count transactions to addr fail as an absent device would
+    def fail_next(self,addr,count=1):
+        self.failures[addr]=self.failures.get(addr,0)+count
+
+    def _check(self,addr):
+        if self.failures.get(addr,0)>0:
+            self.failures[addr]=self.failures[addr]-1
+            self.log.append(('error',addr))
+            raise IOError(121,'Remote I/O error (fake, address 0x%02x)' % addr)
+
+    def _read(self,addr,cmd,length):
+        self._check(addr)
+        data=self.reads.get((addr,cmd),[0]*length)
+        if callable(data):
+            data=data(addr,cmd,length)
+        return list(data[:length])
+
+    def write_byte(self,addr,value):
+        self._check(addr)
+        self.log.append(('write_byte',addr,value))
+        if self.on_write is not None:
+            self.on_write(addr,value,[])
+
+    def read_byte(self,addr):
+        data=self._read(addr,None,1)
+        self.log.append(('read_byte',addr,data[0]))
+        return data[0]
+
+    def write_i2c_block_data(self,addr,cmd,data):
+        self._check(addr)
+        self.log.append(('write_i2c_block_data',addr,cmd,list(data)))
+        if self.on_write is not None:
+            self.on_write(addr,cmd,list(data))
+
+    def read_i2c_block_data(self,addr,cmd,length=32):
+        data=self._read(addr,cmd,length)
+        self.log.append(('read_i2c_block_data',addr,cmd,data))
+        return data
+
+    def close(self):
+        return None
+
+
+## Check batching and error handling of the threaded bus on the fake bus
+if __name__ == '__main__':
+    fake=fake_i2c_bus()
+    fake.set_read(0x28,0,[1,2,3,4])
+    bus=i2c_bus(bus=fake)
+
+    # A failed first transaction to a device is raised to its caller, the bus keeps running
+    fake.fail_next(0x28)
+    try:
+        bus.read_i2c_block_data(0x28,0,4)
+        raise AssertionError('expected IOError')
+    except IOError:
+        pass
+    assert bus.thread.is_alive()
+    assert bus.read_i2c_block_data(0x28,0,4)==[1,2,3,4]
+
+    # A failed batched read, the first transaction to its device, releases every caller
+    bus.allow_merge(0x29,0)
+    fake.set_read(0x29,0,[5,6])
+    fake.fail_next(0x29)
+    results=[]
+    def caller():
+        try:
+            results.append(bus.read_i2c_block_data(0x29,0,2))
+        except IOError as e:
+            results.append(e)
+    # Hold the bus thread in a write so the reads queue up behind it and are batched
+    release=threading.Event()
+    fake.on_write=lambda addr,cmd,data: release.wait(2.0)
+    blocker=threading.Thread(target=bus.write_byte,args=(0x40,1))
+    blocker.start()
+    time.sleep(0.05)
+    callers=[threading.Thread(target=caller) for k in range(4)]
+    for c in callers:
+        c.start()
+    time.sleep(0.05)
+    release.set()
+    blocker.join(2.0)
+    for c in callers:
+        c.join(2.0)
+    assert not any(c.is_alive() for c in callers),'callers blocked'
+    assert len(results)==4 and all(isinstance(r,IOError) for r in results),results
+    assert bus.statistics()[0x29]==[0,0.0,0,3]
+    assert bus.thread.is_alive()
+    assert bus.read_i2c_block_data(0x29,0,2)==[5,6]
+
+    # Reads not registered with allow_merge are each done on the bus
+    samples=iter(range(100))
+    fake.set_read(0x76,0x00,lambda addr,cmd,length: [next(samples)]*length)
+    results=[]
+    release.clear()
+    blocker=threading.Thread(target=bus.write_byte,args=(0x40,1))
+    blocker.start()
+    time.sleep(0.05)
+    callers=[threading.Thread(target=lambda: results.append(bus.read_i2c_block_data(0x76,0x00,3))) for k in range(4)]
+    for c in callers:
+        c.start()
+    time.sleep(0.05)
+    release.set()
+    blocker.join(2.0)
+    for c in callers:
+        c.join(2.0)
+    assert sorted(r[0] for r in results)==[0,1,2,3],results
+    assert bus.statistics()[0x76][3]==0
+
+    bus.close()
+    print('i2c_bus checks passed')
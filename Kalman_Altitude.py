@@ -24,6 +24,7 @@
     
     Revision History
     17 Aug 2016 - Created and debugged
+    19 Oct 2026 - __slots__, state snapshot/restore and clone
     
     Author: Lars Soltmann
     
@@ -37,13 +38,27 @@
       row 2 all columns, row 3 all columns, ...
         example for 3x3 matrix
             x = [M(1,1),M(1,2),M(1,3),M(2,1),M(2,2),M(2,3),M(3,1),M(3,2),M(3,3)]
+    - snapshot(buf,offset) packs the states and covariance (STATE_FIELDS) into a writable
+      buffer as doubles, or into a new bytearray if no buffer is given, and restore(buf,offset)
+      loads them back, e.g. to roll back after a bad measurement. clone() returns an
+      independent copy
             
     References: - Kalman_Altitude_equations.mw (MAPLE 2016 file)
         
     
 '''
 
+import struct
+
 class alt_kalman:
+    __slots__=('x1','x2','p1','p2','p3','p4','q1','q2','r1','r2','r3','r4',
+               'xpred1','xpred2','ppred1','ppred2','ppred3','ppred4')
+
+    ## Dynamic state saved by snapshot(), one double each
+    STATE_FIELDS=__slots__[:6]
+    STATE=struct.Struct('<6d')
+    STATE_SIZE=STATE.size
+
     def __init__(self,p,q,r,x):
         ## Initialize covariance matrix
         self.p1=p[0]
@@ -175,3 +190,22 @@ class alt_kalman:
         self.p4=self.ppred4
 
         return [xest1,xest2]
+
+    ## Save the states and covariance to a buffer
+    def snapshot(self,buf=None,offset=0):
+        if buf is None:
+            buf=bytearray(self.STATE_SIZE)
+        self.STATE.pack_into(buf,offset,self.x1,self.x2,self.p1,self.p2,self.p3,self.p4)
+        return buf
+
+    ## Load the states and covariance from a buffer written by snapshot()
+    def restore(self,buf,offset=0):
+        self.x1,self.x2,self.p1,self.p2,self.p3,self.p4=self.STATE.unpack_from(buf,offset)
+
+    ## Independent copy with the same noise settings and state
+    def clone(self):
+        new=alt_kalman.__new__(alt_kalman)
+        for name in alt_kalman.__slots__:
+            if hasattr(self,name):
+                setattr(new,name,getattr(self,name))
+        return new
@@ -0,0 +1,617 @@
+'''
+    Kernels.py
+
+    Description: Optional Numba compiled kernels for the comp_filt, alt_kalman, PID and trackfilt step functions
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    Inputs: jit_comp_filt / jit_alt_kalman / jit_PID / jit_trackfilt
+                - same inputs as comp_filt, alt_kalman, PID and trackfilt
+            *_step kernels
+                - s = float64 state array laid out as the class's STATE_FIELDS, updated in place
+                - the class's settings, the step inputs, and the time (s) where the class
+                  would read its clock
+            *_batch kernels
+                - s and the settings as for the step kernels
+                - arrays of step inputs, one row per step
+
+    Outputs: fast_comp_filt, fast_alt_kalman, fast_PID, fast_trackfilt
+                        - the fastest implementation of each class available, use them in
+                          place of the class names
+             NUMBA      - 1 if the kernels are compiled
+
+    NOTES:
+    - Written for python3
+    - The kernels are plain Python functions in the subset Numba compiles. When Numba is
+      installed they are compiled with numba.njit(cache=True), the machine code is cached
+      in __pycache__ (or NUMBA_CACHE_DIR) so later runs load it instead of compiling. Without
+      Numba, or with AP_DISABLE_NUMBA=1 set, they run as ordinary Python
+    - The jit_* classes keep their state in a float64 array with the layout of the pure
+      class's STATE_FIELDS, so snapshot()/restore() buffers can be exchanged between the two.
+      Outputs such as roll_d are read from the array through properties
+    - Calling a compiled function from Python costs about 0.5-1 us, whatever it computes.
+      The attitude and Kalman steps save more than that, PID.control and trackfilt.track
+      do not, so fast_PID and fast_trackfilt are always the pure classes. All four
+      kernels pay off in the *_batch functions, which run the whole loop compiled
+    - Results match the pure classes to rounding error (the compiled math library may
+      differ in the last bit), see the parity check below
+    - python3 Kernels.py runs the parity check and prints the benchmark table
+
+    Calls: Complementary_Filter2, Kalman_Altitude, PID, Alpha_Beta_Filter
+
+    Requirements: numpy, numba (optional)
+
+'''
+
+
+import os
+import math
+import time
+import numpy as np
+from Complementary_Filter2 import comp_filt
+from Kalman_Altitude import alt_kalman
+from PID import PID
+from Alpha_Beta_Filter import trackfilt
+
+try:
+    if os.environ.get('AP_DISABLE_NUMBA','0')=='1':
+        raise ImportError
+    import numba
+    NUMBA=1
+except ImportError:
+    NUMBA=0
+
+def jit(fn):
+    if NUMBA==1:
+        return numba.njit(cache=True)(fn)
+    return fn
+
+
+########## comp_filt ##########
+IDENTITY=(1.0,0.0,0.0,0.0,1.0,0.0,0.0,0.0,1.0)
+
+# s = first_time, previous_time, iterm_pitch, iterm_roll, iterm_yaw, pitch, roll, yaw, pitch_d, roll_d,
+#     yaw_d, pitch_r, roll_r, yaw_r, thetad_d, phid_d, psid_d
+
+@jit
+def schedule_gains(ax,ay,az):
+    accel_mag=math.fabs(math.sqrt(ax*ax+ay*ay+az*az)-1)
+    if accel_mag<0.015:
+        return 0.1414,0.01,0.1414,0.01
+    elif accel_mag<5:
+        return 0.01414,0.0001,0.0707,0.0025
+    return 0.0,0.0,0.0,0.0
+
+@jit
+def attitude2_step(s,ax,ay,az,gx,gy,gz,t):
+    if s[0]==1:
+        dt=0.0
+        s[0]=0
+        s[1]=t
+        s[5]=math.atan2(ax,math.sqrt(ay*ay+az*az))
+        s[6]=-math.atan2(ay,math.sqrt(ax*ax+az*az))
+    else:
+        dt=t-s[1]
+        s[1]=t
+    kp_pitch,ki_pitch,kp_roll,ki_roll=schedule_gains(ax,ay,az)
+    pitch=s[5]
+    roll=s[6]
+
+    pitch_a=math.atan2(ax,math.sqrt(ay*ay+az*az))
+    roll_a=-math.atan2(ay,math.sqrt(ax*ax+az*az))
+    pitch_dot_g=math.radians(gy*math.cos(roll)-gz*math.sin(roll))
+    roll_dot_g=math.radians(gx+math.tan(pitch)*(gy*math.sin(roll)+gz*math.cos(roll)))
+    error_pitch=pitch-pitch_a
+    error_roll=roll-roll_a
+
+    s[2]=s[2]+ki_pitch*error_pitch*dt
+    s[3]=s[3]+ki_roll*error_roll*dt
+    pitch=pitch+(pitch_dot_g-kp_pitch*error_pitch-s[2])*dt
+    roll=roll+(roll_dot_g-kp_roll*error_roll-s[3])*dt
+
+    s[5]=pitch
+    s[6]=roll
+    s[8]=math.degrees(pitch)
+    s[9]=math.degrees(roll)
+    s[11]=pitch
+    s[12]=roll
+    s[14]=math.degrees(pitch_dot_g)
+    s[15]=math.degrees(roll_dot_g)
+
+@jit
+def attitude3_step(s,hix,hiy,hiz,w,ax,ay,az,gx,gy,gz,mx,my,mz,t):
+    mx=mx-hix
+    my=my-hiy
+    mz=mz-hiz
+    mx,my,mz=w[0]*mx+w[1]*my+w[2]*mz,w[3]*mx+w[4]*my+w[5]*mz,w[6]*mx+w[7]*my+w[8]*mz
+    if s[0]==1:
+        dt=0.0
+        s[0]=0
+        s[1]=t
+        pitch=math.atan2(ax,math.sqrt(ay*ay+az*az))
+        roll=-math.atan2(ay,math.sqrt(ax*ax+az*az))
+        xh=mx*math.cos(pitch)+my*math.sin(pitch)*math.sin(roll)+mz*math.sin(pitch)*math.cos(roll)
+        yh=-my*math.cos(roll)+mz*math.sin(roll)
+        yaw=math.atan2(yh,xh)
+        if yaw<0:
+            yaw=yaw+2*math.pi
+        s[5]=pitch
+        s[6]=roll
+        s[7]=yaw
+    else:
+        dt=t-s[1]
+        s[1]=t
+    kp_pitch,ki_pitch,kp_roll,ki_roll=schedule_gains(ax,ay,az)
+    kp_yaw=0.1414
+    ki_yaw=0.01
+    pitch=s[5]
+    roll=s[6]
+    yaw=s[7]
+
+    pitch_a=math.atan2(ax,math.sqrt(ay*ay+az*az))
+    roll_a=-math.atan2(ay,math.sqrt(ax*ax+az*az))
+    xh=mx*math.cos(pitch)+my*math.sin(pitch)*math.sin(roll)+mz*math.sin(pitch)*math.cos(roll)
+    yh=-my*math.cos(roll)+mz*math.sin(roll)
+    yaw_m=math.atan2(yh,xh)
+    if yaw_m<0:
+        yaw_m=yaw_m+2*math.pi
+
+    pitch_dot_g=math.radians(gy*math.cos(roll)-gz*math.sin(roll))
+    roll_dot_g=math.radians(gx+math.tan(pitch)*(gy*math.sin(roll)+gz*math.cos(roll)))
+    yaw_dot_g=math.radians(gy*math.sin(roll)/math.cos(pitch)+gz*math.cos(roll)/math.cos(pitch))
+
+    error_pitch=pitch-pitch_a
+    error_roll=roll-roll_a
+    error_yaw=yaw-yaw_m
+    if error_yaw>1.5*math.pi:
+        error_yaw=error_yaw-2*math.pi
+    elif error_yaw<-1.5*math.pi:
+        error_yaw=error_yaw+2*math.pi
+
+    s[2]=s[2]+ki_pitch*error_pitch*dt
+    s[3]=s[3]+ki_roll*error_roll*dt
+    s[4]=s[4]+ki_yaw*error_yaw*dt
+    pitch=pitch+(pitch_dot_g-kp_pitch*error_pitch-s[2])*dt
+    roll=roll+(roll_dot_g-kp_roll*error_roll-s[3])*dt
+    yaw=yaw+(yaw_dot_g-kp_yaw*error_yaw-s[4])*dt
+    if yaw>2*math.pi:
+        yaw=yaw-2*math.pi
+    elif yaw<0:
+        yaw=yaw+2*math.pi
+
+    s[5]=pitch
+    s[6]=roll
+    s[7]=yaw
+    s[8]=math.degrees(pitch)
+    s[9]=math.degrees(roll)
+    s[10]=math.degrees(yaw)
+    s[11]=pitch
+    s[12]=roll
+    s[13]=yaw
+    s[14]=math.degrees(pitch_dot_g)
+    s[15]=math.degrees(roll_dot_g)
+    s[16]=math.degrees(yaw_dot_g)
+
+## w = soft iron matrix as 9 values row by row (IDENTITY if none)
+## imu = rows of ax, ay, az, gx, gy, gz, mx, my, mz, returns rows of roll_d, pitch_d, yaw_d
+@jit
+def attitude3_batch(s,hix,hiy,hiz,w,imu,t):
+    out=np.empty((imu.shape[0],3))
+    for k in range(imu.shape[0]):
+        attitude3_step(s,hix,hiy,hiz,w,imu[k,0],imu[k,1],imu[k,2],imu[k,3],imu[k,4],imu[k,5],imu[k,6],imu[k,7],imu[k,8],t[k])
+        out[k,0]=s[9]
+        out[k,1]=s[8]
+        out[k,2]=s[10]
+    return out
+
+
+########## alt_kalman ##########
+# s = x1, x2, p1, p2, p3, p4
+
+@jit
+def alt_kf_step(s,q1,q2,r1,r2,r3,r4,h1,h2,h3,h4,z1,z2,z3,z4,dt):
+    x1=s[0]
+    x2=s[1]
+    p1=s[2]
+    p2=s[3]
+    p3=s[4]
+    p4=s[5]
+
+    t1=h2**2
+    t2=t1*p1
+    t3=h3**2
+    t4=t3*r2
+    t5=t4*p1
+    t6=(r2+t2)*r3+t5
+    t7=h4**2
+    t8=t1*r3
+    t9=t7*p4
+    t6=r4*t6+t9*t6-t7*(t4+t8)*p3*p2
+    t10=h1**2
+    t11=p1*t10+r1
+    t2=t2*r1+r2*t11
+    t5=t5*r1+r3*t2
+    t12=t10*r2
+    t1=t1*r1
+    t13=-t1-t12
+    t14=t4*r1
+    t15=r4*t5+t9*t5+t7*(r3*t13-t14)*p3*p2
+    t7=t7*p2*p3
+    t16=(-r4-t9)*p1+t7
+    t15=0.1e1/t15
+    t4=(t4+t8)*t16
+    t8=t7*r3
+    t17=t15*h1
+    t3=t3*r1
+    t11=t3*p1+r3*t11
+    t10=t10*r3
+    t11=r4*t11+t9*t11-t7*(t10+t3)
+    t3=(t10+t3)*t16
+    t10=t15*h2
+    t2=r4*t2+t7*t13+t9*t2
+    t13=(t1+t12)*t16
+    t16=t15*h3
+    t1=(-t1-t12)*r3-t14
+    t12=t9*r2
+
+    ksim1=t17*((t4+t6)*p1-t8*r2)
+    ksim2=t10*((t3+t11)*p1-t8*r1)
+    ksim3=t16*((t13+t2)*p1-t7*r1*r2)
+    ksim4=t15*p2*h4*(t1*p1+t5)
+    ksim5=t17*p3*(-t12*r3+t4+t6)
+    ksim6=t10*p3*(-t9*r1*r3+t11+t3)
+    ksim7=t16*p3*(-t12*r1+t13+t2)
+    ksim8=t15*h4*(p3*p2*t1+p4*t5)
+
+    xest1=x1+ksim1*(-h1*x1+z1)+ksim2*(-h2*x1+z2)+ksim3*(-h3*x1+z3)+ksim4*(-h4*x2+z4)
+    xest2=x2+ksim5*(-h1*x1+z1)+ksim6*(-h2*x1+z2)+ksim7*(-h3*x1+z3)+ksim8*(-h4*x2+z4)
+
+    t1=-h1*x1+z1
+    t2=-h2*x1+z2
+    t3=-h3*x1+z3
+    t4=-h4*x2+z4
+    t5=ksim5*t1+ksim6*t2+ksim7*t3+ksim8*t4+x2
+    s[0]=dt*t5+ksim1*t1+ksim2*t2+ksim3*t3+ksim4*t4+x1
+    s[1]=t5
+
+    t1=-h1*ksim1-h2*ksim2-h3*ksim3+1
+    t2=h1*ksim5+h2*ksim6+h3*ksim7
+    t3=-h4*ksim8+1
+    t4=t2*p1
+    t5=t3*p3
+    t2=t2*p2
+    t3=t3*p4
+    t6=dt*(t2-t3)
+    t7=ksim4*h4
+    t8=-p2*t1+t7*p4+t6
+    s[2]=-(t4-t5+t8)*dt+p1*t1+q1-t7*p3
+    s[3]=-t8
+    s[4]=-t6-t4+t5
+    s[5]=q2-t2+t3
+    return xest1,xest2
+
+## h, z = rows of the four observations and measurements, returns rows of xest1, xest2
+@jit
+def alt_kf_batch(s,q1,q2,r1,r2,r3,r4,h,z,dt):
+    out=np.empty((h.shape[0],2))
+    for k in range(h.shape[0]):
+        xest1,xest2=alt_kf_step(s,q1,q2,r1,r2,r3,r4,h[k,0],h[k,1],h[k,2],h[k,3],z[k,0],z[k,1],z[k,2],z[k,3],dt[k])
+        out[k,0]=xest1
+        out[k,1]=xest2
+    return out
+
+
+########## PID ##########
+# s = error_sum, error_previous, t_previous, seed_flag, freeze, first_time, I_TERM
+
+@jit
+def pid_step(s,kp,kd,ki,target,actual,type,dadt,t):
+    if s[5]==1:
+        s[2]=t
+        s[5]=0
+        return s[6]
+    dt=t-s[2]
+    error=target-actual
+    P_TERM=error*kp
+    if type==1:
+        derivative_term=(error-s[1])/dt
+    else:
+        derivative_term=dadt
+    D_TERM=derivative_term*kd
+    if s[4]!=1:
+        s[0]=s[0]+error*dt
+    if ki!=0:
+        if s[3]==1 and s[4]==0:
+            s[0]=s[6]/ki
+            s[3]=0
+        else:
+            s[6]=s[0]*ki
+    else:
+        s[6]=0
+    s[2]=t
+    s[1]=error
+    return P_TERM+D_TERM+s[6]
+
+@jit
+def pid_batch(s,kp,kd,ki,target,actual,type,dadt,t):
+    out=np.empty(actual.shape[0])
+    for k in range(actual.shape[0]):
+        out[k]=pid_step(s,kp,kd,ki,target[k],actual[k],type,dadt[k],t[k])
+    return out
+
+
+########## trackfilt ##########
+# s = first_time, xk_1, vk_1
+
+@jit
+def track_step(s,alpha,beta,xm,dt):
+    if s[0]==1:
+        s[0]=0
+        s[1]=xm
+        s[2]=0
+        return xm,0.0
+    xk=s[1]+s[2]*dt
+    vk=s[2]
+    rk=xm-xk
+    xk=xk+alpha*rk
+    vk=vk+(beta*rk)/dt
+    s[1]=xk
+    s[2]=vk
+    return xk,vk
+
+@jit
+def track_loop(s,alpha,beta,xm,dt):
+    out=np.empty((xm.shape[0],2))
+    for k in range(xm.shape[0]):
+        xk,vk=track_step(s,alpha,beta,xm[k],dt[k])
+        out[k,0]=xk
+        out[k,1]=vk
+    return out
+
+
+########## Classes ##########
+
+class _jit_state:
+    __slots__=('s',)
+
+    ## Save the state to a buffer, compatible with the pure class's snapshot()
+    def snapshot(self,buf=None,offset=0):
+        if buf is None:
+            return bytearray(self.s.astype('<f8').tobytes())
+        memoryview(buf).cast('B')[offset:offset+self.STATE_SIZE]=self.s.astype('<f8').tobytes()
+        return buf
+
+    def restore(self,buf,offset=0):
+        self.s[:]=np.frombuffer(buf,'<f8',len(self.STATE_FIELDS),offset)
+
+    def clone(self):
+        cls=type(self)
+        new=cls.__new__(cls)
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__',()):
+                setattr(new,name,getattr(self,name))
+        new.s=self.s.copy()
+        return new
+
+## Read only attribute backed by element i of the state array
+def _state_property(i):
+    return property(lambda self: float(self.s[i]))
+
+def _add_state_properties(cls):
+    for i,name in enumerate(cls.STATE_FIELDS):
+        setattr(cls,name,_state_property(i))
+    return cls
+
+
+@_add_state_properties
+class jit_comp_filt(_jit_state):
+    __slots__=('clock','hix','hiy','hiz','soft_iron','w')
+    STATE_FIELDS=comp_filt.STATE_FIELDS
+    STATE_SIZE=comp_filt.STATE_SIZE
+
+    def __init__(self,hi_x=0,hi_y=0,hi_z=0,clock=time.time,soft_iron=None):
+        self.clock=clock
+        self.hix=hi_x
+        self.hiy=hi_y
+        self.hiz=hi_z
+        self.s=np.zeros(len(self.STATE_FIELDS))
+        self.set_soft_iron(soft_iron)
+        self.reset()
+
+    def set_soft_iron(self,matrix):
+        comp_filt.set_soft_iron(self,matrix)
+        self.w=IDENTITY if self.soft_iron is None else self.soft_iron
+
+    def reset(self):
+        self.s[:]=0
+        self.s[0]=1
+
+    def attitude2(self,ax,ay,az,gx,gy,gz):
+        attitude2_step(self.s,ax,ay,az,gx,gy,gz,self.clock())
+
+    def attitude3(self,ax,ay,az,gx,gy,gz,mx,my,mz):
+        attitude3_step(self.s,self.hix,self.hiy,self.hiz,self.w,ax,ay,az,gx,gy,gz,mx,my,mz,self.clock())
+
+
+@_add_state_properties
+class jit_alt_kalman(_jit_state):
+    __slots__=('q1','q2','r1','r2','r3','r4')
+    STATE_FIELDS=alt_kalman.STATE_FIELDS
+    STATE_SIZE=alt_kalman.STATE_SIZE
+
+    def __init__(self,p,q,r,x):
+        self.q1,self.q2=q[0],q[1]
+        self.r1,self.r2,self.r3,self.r4=r[0],r[1],r[2],r[3]
+        self.s=np.array([x[0],x[1],p[0],p[1],p[2],p[3]],dtype=np.float64)
+
+    def alt_kf(self,h,z,dt):
+        xest1,xest2=alt_kf_step(self.s,self.q1,self.q2,self.r1,self.r2,self.r3,self.r4,
+                                h[0],h[1],h[2],h[3],z[0],z[1],z[2],z[3],dt)
+        return [xest1,xest2]
+
+
+@_add_state_properties
+class jit_PID(_jit_state):
+    __slots__=('clock','kp','kd','ki','I_L')
+    STATE_FIELDS=PID.STATE_FIELDS
+    STATE_SIZE=PID.STATE_SIZE
+
+    def __init__(self,kp,kd,ki,I_L,clock=time.time):
+        self.clock=clock
+        self.kp=kp
+        self.kd=kd
+        self.ki=ki
+        self.I_L=I_L
+        self.s=np.zeros(len(self.STATE_FIELDS))
+        self.reset()
+
+    def reset(self):
+        self.s[:]=0
+        self.s[5]=1
+
+    def seed_controller(self,seed_value):
+        self.reset()
+        self.s[6]=seed_value
+        self.s[3]=1
+
+    def freeze_integrator(self,ON_OFF):
+        self.s[4]=ON_OFF
+
+    def set_kp(self,new_kp):
+        self.kp=new_kp
+
+    def set_kd(self,new_kd):
+        self.kd=new_kd
+
+    def set_ki(self,new_ki):
+        self.ki=new_ki
+
+    def control(self,target,actual,type=1,dadt=0):
+        return pid_step(self.s,self.kp,self.kd,self.ki,target,actual,type,dadt,self.clock())
+
+
+@_add_state_properties
+class jit_trackfilt(_jit_state):
+    __slots__=('alpha','beta')
+    STATE_FIELDS=trackfilt.STATE_FIELDS
+    STATE_SIZE=trackfilt.STATE_SIZE
+
+    def __init__(self,alpha,beta):
+        self.alpha=alpha
+        self.beta=beta
+        self.s=np.zeros(len(self.STATE_FIELDS))
+        self.reset()
+
+    def set_alpha(self,newalpha):
+        self.alpha=newalpha
+
+    def set_beta(self,newbeta):
+        self.beta=newbeta
+
+    def reset(self):
+        self.s[:]=0
+        self.s[0]=1
+
+    def track(self,xm,dt):
+        return track_step(self.s,self.alpha,self.beta,xm,dt)
+
+
+## Fastest implementation of each class (see NOTES)
+fast_comp_filt=jit_comp_filt if NUMBA==1 else comp_filt
+fast_alt_kalman=jit_alt_kalman if NUMBA==1 else alt_kalman
+fast_PID=PID
+fast_trackfilt=trackfilt
+
+
+## Parity check and benchmark table
+if __name__ == '__main__':
+    from Benchmark import step_clock, imu_samples
+
+    n=2000
+    imu=imu_samples(n)
+    rng=np.random.default_rng(1)
+    h=np.ones((n,4))
+    h[:,2:]=(np.arange(n)%5==0)[:,None]
+    z=np.stack([np.arange(n)*0.1+rng.normal(0,0.1,n),np.arange(n)*0.1+rng.normal(0,1,n),
+                np.arange(n)*0.1+rng.normal(0,5,n),2.5+rng.normal(0,0.5,n)],1)
+    kf_args=([1.0,0.0,0.0,1.0],[0.01,0.1],[0.5,4.0,25.0,1.0],[0.0,0.0])
+    z_list=z.tolist()
+    h_list=h.tolist()
+    soft_iron=((1.02,0.03,0.0),(0.03,0.97,-0.01),(0.0,-0.01,1.01))
+
+    # Each case: name, make pure, make jit, one step
+    cases=[
+        ('comp_filt.attitude3',lambda: comp_filt(1.0,-2.0,0.5,clock=step_clock(),soft_iron=soft_iron),
+                               lambda: jit_comp_filt(1.0,-2.0,0.5,clock=step_clock(),soft_iron=soft_iron),
+                               lambda o,k: (o.attitude3(*imu[k]),o.roll_d,o.pitch_d,o.yaw_d)[1:]),
+        ('comp_filt.attitude2',lambda: comp_filt(clock=step_clock()),
+                               lambda: jit_comp_filt(clock=step_clock()),
+                               lambda o,k: (o.attitude2(*imu[k][:6]),o.roll_d,o.pitch_d)[1:]),
+        ('alt_kalman.alt_kf',  lambda: alt_kalman(*kf_args),
+                               lambda: jit_alt_kalman(*kf_args),
+                               lambda o,k: o.alt_kf(h_list[k],z_list[k],0.04)),
+        ('PID.control',        lambda: PID(1.0,0.1,0.05,10.0,clock=step_clock(0.01)),
+                               lambda: jit_PID(1.0,0.1,0.05,10.0,clock=step_clock(0.01)),
+                               lambda o,k: (o.control(0.0,z_list[k][1]-k*0.1,1),)),
+        ('trackfilt.track',    lambda: trackfilt(0.5,0.1),
+                               lambda: jit_trackfilt(0.5,0.1),
+                               lambda o,k: o.track(z_list[k][1],0.04)),
+    ]
+
+    print('Numba: %s' % ('compiled' if NUMBA==1 else 'not available, kernels run as Python'))
+    t0=time.perf_counter()
+    for name,pure,fast,step in cases:
+        step(fast(),0)
+    attitude3_batch(np.zeros(17),0.0,0.0,0.0,IDENTITY,np.zeros((1,9)),np.zeros(1))
+    alt_kf_batch(np.zeros(6),0.0,0.0,1.0,1.0,1.0,1.0,np.ones((1,4)),np.ones((1,4)),np.ones(1))
+    pid_batch(np.zeros(7),1.0,0.0,0.0,np.zeros(1),np.zeros(1),1,np.zeros(1),np.ones(1))
+    track_loop(np.zeros(3),0.5,0.1,np.zeros(1),np.ones(1))
+    print('Compile or cache load: %.2f s\n' % (time.perf_counter()-t0))
+
+    print('%-22s %10s %10s %8s %14s' % ('step','pure(us)','jit(us)','speedup','max difference'))
+    for name,pure,fast,step in cases:
+        a=pure()
+        b=fast()
+        diff=0.0
+        for k in range(n):
+            ra=step(a,k)
+            rb=step(b,k)
+            diff=max(diff,max(abs(x-y) for x,y in zip(ra,rb)))
+        times=[]
+        for make in (pure,fast):
+            best=float('inf')
+            for r in range(5):
+                o=make()
+                t0=time.perf_counter()
+                for k in range(n):
+                    step(o,k)
+                best=min(best,time.perf_counter()-t0)
+            times.append(best/n*1e6)
+        print('%-22s %10.2f %10.2f %7.1fx %14.2e' % (name,times[0],times[1],times[0]/times[1],diff))
+
+    # Whole loops compiled
+    imu_a=np.array(imu)
+    t=np.arange(1,n+1)*0.001
+    dt=np.full(n,0.04)
+    batches=[
+        ('attitude3_batch',lambda: attitude3_batch(np.array([1.0]+[0.0]*16),1.0,-2.0,0.5,IDENTITY,imu_a,t),
+                           lambda: [(o.attitude3(*imu[k]),o.roll_d)[1] for o in [comp_filt(1.0,-2.0,0.5,clock=step_clock())] for k in range(n)]),
+        ('alt_kf_batch',   lambda: alt_kf_batch(np.array([0.0,0.0,1.0,0.0,0.0,1.0]),0.01,0.1,0.5,4.0,25.0,1.0,h,z,dt),
+                           lambda: [o.alt_kf(h_list[k],z_list[k],0.04) for o in [alt_kalman(*kf_args)] for k in range(n)]),
+        ('pid_batch',      lambda: pid_batch(np.array([0.0,0.0,0.0,0.0,0.0,1.0,0.0]),1.0,0.1,0.05,np.zeros(n),z[:,1],1,np.zeros(n),t),
+                           lambda: [o.control(0.0,z_list[k][1],1) for o in [PID(1.0,0.1,0.05,10.0,clock=step_clock())] for k in range(n)]),
+        ('track_loop',     lambda: track_loop(np.array([1.0,0.0,0.0]),0.5,0.1,z[:,1],dt),
+                           lambda: [o.track(z_list[k][1],0.04) for o in [trackfilt(0.5,0.1)] for k in range(n)]),
+    ]
+    print('\n%-22s %10s %10s %8s' % ('batch of %d' % n,'pure(us)','jit(us)','speedup'))
+    for name,fast,pure in batches:
+        times=[]
+        for fn in (pure,fast):
+            best=float('inf')
+            for r in range(5):
+                t0=time.perf_counter()
+                fn()
+                best=min(best,time.perf_counter()-t0)
+            times.append(best/n*1e6)
+        print('%-22s %10.3f %10.3f %7.1fx' % (name,times[0],times[1],times[0]/times[1]))
@@ -5,10 +5,12 @@
     
     Revision History
     17 Apr 2016 - Created and debugged
+    19 Oct 2026 - Bus can be passed in (see I2C_Bus.py)
     
     Author: Lars Soltmann
     
     INPUTS:     i2c_addr = I2C address of sensor
+                bus <optional> = shared i2c_bus or fake_i2c_bus, otherwise opened with Hardware.open_i2c
     
     OUTPUTS:    self.dist = Measured sensor distance (cm)
     
@@ -19,12 +21,14 @@
     '''
 
 import time
-import smbus
 
 class MB1242:
-    def __init__(self, i2c_addr):
+    def __init__(self, i2c_addr, bus=None):
         self.addr=i2c_addr
-        self.bus=smbus.SMBus(1)
+        if bus is None:
+            from Hardware import open_i2c
+            bus=open_i2c(1)
+        self.bus=bus
 
     def refreshDistance(self):
         self.bus.write_byte(self.addr, 0x51)
@@ -5,6 +5,9 @@
     
     Revision History
     05 May 2017 - Created and debugged
+    19 Oct 2026 - Added non-blocking conversion state machine and selectable oversampling ratio
+    19 Oct 2026 - Added integer compensation and batch conversion of logged readings
+    19 Oct 2026 - Bus can be passed in (see I2C_Bus.py)
     
     Author: Lars Soltmann
     
@@ -12,6 +15,19 @@
     
     Notes:
     - Written for Python3
+    - read_pressure_temperature() blocks for two conversions. For use inside a loop, call
+      start_conversion() once and then poll() every cycle, poll() never sleeps. It returns 1
+      when a new pressure is available and immediately starts the next conversion so the ADC
+      is always converting while the loop runs
+    - Temperature changes slowly, so in the non-blocking mode it is only converted every
+      temp_decimation cycles and the last value is reused for compensation
+    - osr = 256, 512, 1024, 2048, 4096 or 8192, conversion time is 0.6ms to 16.5ms
+    - integer_math=1 uses compensate_int(), the data sheet's 64-bit integer arithmetic with
+      shifts and constants precomputed from the calibration coefficients, instead of float
+      division. Results are within 0.02mbar and 0.01degC of the float path
+    - bus <optional> = shared i2c_bus or fake_i2c_bus, otherwise opened with Hardware.open_i2c
+    - compensate_batch() converts arrays of raw D1/D2 readings from logs in one call and
+      does not need the sensor, only the calibration coefficients
     
     Hardware Requirements:
     - MS5805 pressure transducer
@@ -23,16 +39,32 @@
     
 '''
 
-import smbus
 import time
 import math
 
+## Oversampling ratio : (D1/D2 command offset, maximum conversion time (s))
+OSR_SETTINGS={
+    256:  (0x00,0.00054),
+    512:  (0x02,0.00106),
+    1024: (0x04,0.00208),
+    2048: (0x06,0.00413),
+    4096: (0x08,0.00822),
+    8192: (0x0A,0.01644),
+}
+
 class MS5805:
-    def __init__(self,devAddr):
+    def __init__(self,devAddr,osr=8192,temp_decimation=10,integer_math=0,bus=None):
         self.devAddr=devAddr
-        self.bus=smbus.SMBus(1)
-        self.D1=0x4A
-        self.D2=0x5A
+        if bus is None:
+            from Hardware import open_i2c
+            bus=open_i2c(1)
+        self.bus=bus
+        self.set_osr(osr)
+        self.temp_decimation=temp_decimation
+        self.conversion=None
+        self.tempi=None
+        if integer_math==1:
+            self.compensate=self.compensate_int
         self.RESET=0x1E
         self.ADCREAD=0x00
         self.CRC=0xA0
@@ -66,18 +98,75 @@ class MS5805:
         self.C6 = 27058;
         # *!*!*!*!*!*!*!*!*!*!
 
+        self.precompute()
+
+    # Constants derived from the calibration coefficients for compensate_int()
+    def precompute(self):
+        self.TREF = self.C5 << 8
+        self.OFF_T1 = self.C2 << 17
+        self.SENS_T1 = self.C1 << 16
+
+
+    # Set the oversampling ratio
+    def set_osr(self,osr):
+        offset,self.conversion_time=OSR_SETTINGS[osr]
+        self.osr=osr
+        self.D1=0x40+offset
+        self.D2=0x50+offset
+        # Wait used by the blocking read, 0.02s at the default oversampling ratio
+        self.blocking_wait=self.conversion_time+0.0036
+
 
     def read_pressure_temperature(self):
         self.bus.write_i2c_block_data(self.devAddr, self.D1,[0])
-        time.sleep(0.02)
+        time.sleep(self.blocking_wait)
         temp_val=self.bus.read_i2c_block_data(self.devAddr, self.ADCREAD,3)
         pressi = (temp_val[0] << 16) | (temp_val[1] << 8) | temp_val[2]
         
         self.bus.write_i2c_block_data(self.devAddr, self.D2,[0])
-        time.sleep(0.02)
+        time.sleep(self.blocking_wait)
         temp_val=self.bus.read_i2c_block_data(self.devAddr, self.ADCREAD,3)
         tempi = (temp_val[0] << 16) | (temp_val[1] << 8) | temp_val[2]
         
+        self.compensate(pressi,tempi)
+
+
+    ## NON-BLOCKING CONVERSIONS
+    # Start the next conversion, temperature if it is due (or not yet known), otherwise pressure
+    def start_conversion(self):
+        if self.tempi is None or self.temp_count>=self.temp_decimation:
+            self.conversion=self.D2
+            self.temp_count=0
+        else:
+            self.conversion=self.D1
+        self.bus.write_i2c_block_data(self.devAddr, self.conversion,[0])
+        self.t_start=time.monotonic()
+        return None
+
+    # Check the running conversion, returns 1 if a new pressure and temperature are available
+    def poll(self):
+        if self.conversion is None:
+            self.temp_count=self.temp_decimation
+            self.start_conversion()
+            return 0
+        if time.monotonic()-self.t_start<self.conversion_time:
+            return 0
+        temp_val=self.bus.read_i2c_block_data(self.devAddr, self.ADCREAD,3)
+        adc = (temp_val[0] << 16) | (temp_val[1] << 8) | temp_val[2]
+        finished=self.conversion
+        # Keep the ADC busy while the result is used
+        if finished==self.D2:
+            self.tempi=adc
+            self.start_conversion()
+            return 0
+        self.temp_count=self.temp_count+1
+        self.start_conversion()
+        self.compensate(adc,self.tempi)
+        return 1
+
+
+    # First and second order temperature compensation from the data sheet
+    def compensate(self,pressi,tempi):
         dT = tempi - self.C5 * 2**8
         temp = (2000 + ((dT * self.C6) / 2**23))
         
@@ -103,6 +192,29 @@ class MS5805:
         self.TEMP = temp / 100
 
 
+    # Integer compensation, 64-bit arithmetic as in the data sheet
+    def compensate_int(self,pressi,tempi):
+        dT = tempi - self.TREF
+        temp = 2000 + ((dT * self.C6) >> 23)
+        OFF = self.OFF_T1 + ((self.C4 * dT) >> 6)
+        SENS = self.SENS_T1 + ((self.C3 * dT) >> 7)
+
+        if (temp < 2000):
+            t = (temp - 2000) * (temp - 2000)
+            temp = temp - ((11 * dT * dT) >> 35)
+            OFF = OFF - ((31 * t) >> 3)
+            SENS = SENS - ((63 * t) >> 5)
+
+        # Pressure in 0.01mbar, temperature in 0.01degC
+        self.PRESS = (((pressi * SENS) >> 21) - OFF) >> 15
+        self.PRESS = self.PRESS / 100
+        self.TEMP = temp / 100
+
+    # Convert arrays of raw D1/D2 readings, returns pressure (mbar) and temperature (degC) arrays
+    def compensate_batch(self,pressi,tempi):
+        return compensate_batch(pressi,tempi,(self.C1,self.C2,self.C3,self.C4,self.C5,self.C6))
+
+
     def getTemperature_degF(self):
         return self.TEMP*1.8+32
 
@@ -115,3 +227,77 @@ class MS5805:
 
     def getPressure_psf(self):
         return self.PRESS*2.0885434273
+
+
+## Integer compensation of arrays of raw D1 (pressi) and D2 (tempi) readings
+# coeffs = (C1,C2,C3,C4,C5,C6), returns pressure (mbar) and temperature (degC) arrays
+def compensate_batch(pressi,tempi,coeffs):
+    import numpy as np
+    C1,C2,C3,C4,C5,C6=[np.int64(c) for c in coeffs]
+    D1=np.asarray(pressi,dtype=np.int64)
+    D2=np.asarray(tempi,dtype=np.int64)
+
+    dT = D2 - (C5 << 8)
+    temp = 2000 + ((dT * C6) >> 23)
+    OFF = (C2 << 17) + ((C4 * dT) >> 6)
+    SENS = (C1 << 16) + ((C3 * dT) >> 7)
+
+    low = temp < 2000
+    t = np.where(low, (temp - 2000) * (temp - 2000), 0)
+    temp = temp - np.where(low, (11 * dT * dT) >> 35, 0)
+    OFF = OFF - ((31 * t) >> 3)
+    SENS = SENS - ((63 * t) >> 5)
+
+    press = (((D1 * SENS) >> 21) - OFF) >> 15
+    return press / 100, temp / 100
+
+
+## Compare the integer and float compensation and benchmark them
+if __name__ == '__main__':
+    import random
+    import numpy as np
+
+    # Calibration coefficients from the data sheet example, sensor is not accessed
+    sensor=MS5805.__new__(MS5805)
+    sensor.C1,sensor.C2,sensor.C3,sensor.C4,sensor.C5,sensor.C6=46372,43981,29059,27842,31553,28165
+    sensor.precompute()
+
+    random.seed(1)
+    n=20000
+    d1=[random.randint(4000000,7500000) for i in range(n)]
+    d2=[random.randint(7000000,9000000) for i in range(n)]
+
+    worst_p=0
+    worst_t=0
+    for i in range(n):
+        MS5805.compensate(sensor,d1[i],d2[i])
+        p,t=sensor.PRESS,sensor.TEMP
+        sensor.compensate_int(d1[i],d2[i])
+        worst_p=max(worst_p,abs(sensor.PRESS-p))
+        worst_t=max(worst_t,abs(sensor.TEMP-t))
+
+    t0=time.perf_counter()
+    for i in range(n):
+        MS5805.compensate(sensor,d1[i],d2[i])
+    t_float=(time.perf_counter()-t0)/n
+
+    t0=time.perf_counter()
+    for i in range(n):
+        sensor.compensate_int(d1[i],d2[i])
+    t_int=(time.perf_counter()-t0)/n
+
+    D1=np.array(d1)
+    D2=np.array(d2)
+    t0=time.perf_counter()
+    press,temp=sensor.compensate_batch(D1,D2)
+    t_batch=(time.perf_counter()-t0)/n
+
+    batch_match=True
+    for i in range(0,n,101):
+        sensor.compensate_int(d1[i],d2[i])
+        batch_match=batch_match and press[i]==sensor.PRESS and temp[i]==sensor.TEMP
+    print('Max difference int vs float:  %.4f mbar  %.4f degC' % (worst_p,worst_t))
+    print('Float:                        %.3f us/sample' % (t_float*1e6))
+    print('Integer:                      %.3f us/sample' % (t_int*1e6))
+    print('Batch:                        %.4f us/sample' % (t_batch*1e6))
+    print('Batch matches scalar:         %s' % batch_match)
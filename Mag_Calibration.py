@@ -0,0 +1,213 @@
+'''
+    Mag_Calibration.py
+
+    Description: Hard and soft iron magnetometer calibration by ellipsoid fitting, recursive
+                 least squares as samples stream in and a batch fit for logged data
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Directional forgetting, no covariance windup at a fixed attitude
+
+    Inputs: mag_calibrator init
+                - scale <defaults to 50> = typical field magnitude [uT], samples are divided by
+                                           it so the fit is well conditioned
+                - forgetting <defaults to 1> = RLS forgetting factor, 1 keeps every sample,
+                                               e.g. 0.99 follows a slowly changing installation
+                - p0 <defaults to 1e6> = initial covariance of the RLS parameters
+            add
+                - mx,my,mz = magnetometer components [uT]
+            add_batch / fit_ellipsoid
+                - m = array of samples, one row of mx, my, mz per sample [uT]
+            write_calibration_file
+                - file_name = magnetometer calibration file (the file read by
+                              Read_Config.read_magnetometer_calibration_file)
+                - offset, W = hard iron offsets and soft iron matrix from solution()/fit_ellipsoid()
+
+    Outputs: solution / fit_ellipsoid
+                        - [offset, W], offset = hard iron offsets hix, hiy, hiz [uT]
+                                       W = 3x3 soft iron correction matrix
+                          or None if the samples do not determine an ellipsoid yet
+             field_strength - radius of the corrected sphere [uT]
+
+    NOTES:
+    - Written for python3
+    - The measurements of a fixed field, rotated through all attitudes, lie on an ellipsoid
+          (m-offset)' A (m-offset) = 1
+      The hard iron offset is its centre and the soft iron distortion its shape. The
+      ellipsoid is fitted as the general quadric
+          a x^2 + b y^2 + c z^2 + 2d xy + 2e xz + 2f yz + 2g x + 2h y + 2i z = 1
+      which is linear in its 9 coefficients, so each sample is one row of a linear least
+      squares problem. mag_calibrator.add() solves it recursively, O(81) per sample and
+      nothing stored, fit_ellipsoid() solves it in one call for an array of samples
+    - W is the symmetric square root of A scaled to determinant 1, so the corrected field
+          W (m - offset)
+      lies on a sphere with the magnitude of the measured field (field_strength) and the
+      heading is unchanged for an undistorted sensor
+    - With forgetting<1 old samples are forgotten only in the directions the new samples
+      measure (directional forgetting, Kulhavy 1987). Plain exponential forgetting divides
+      the whole covariance by the factor every sample, so in straight flight, where the
+      samples repeat one attitude, it grows without bound in the other directions and the
+      calibration is lost. Here the covariance stays bounded and the solution is kept until
+      the aircraft turns again. The memory is roughly 9/(1-forgetting) well spread samples
+    - The samples must cover the sphere well (rotate the aircraft through all attitudes),
+      a single plane of rotation leaves the quadric undetermined and solution() returns None
+    - Calibration file format: the hard iron offsets hix hiy hiz on the first line, then
+      the 3 rows of W. Readers of the old format use the first 3 values only
+    - Apply with comp_filt(hix,hiy,hiz,soft_iron=W). attitude3() then costs 9 multiplies
+      and 6 adds more per sample, see the example below
+
+    Requirements: numpy
+
+'''
+
+
+import numpy as np
+
+
+## Rows of the quadric regressors for samples already divided by scale
+def _regressors(x,y,z):
+    return np.stack((x*x,y*y,z*z,2*x*y,2*x*z,2*y*z,2*x,2*y,2*z),axis=-1)
+
+## Quadric coefficients to [offset, W, field_strength], None if not an ellipsoid
+def _ellipsoid(theta,scale):
+    a,b,c,d,e,f,g,h,i=theta
+    Q=np.array([[a,d,e],[d,b,f],[e,f,c]])
+    u=np.array([g,h,i])
+    eig,vec=np.linalg.eigh(Q)
+    if not np.all(eig>0):
+        return None
+    center=-np.linalg.solve(Q,u)
+    k=1.0+center@Q@center
+    if k<=0:
+        return None
+    # Symmetric square root of A=Q/k, scaled to determinant 1
+    root=np.sqrt(eig/k)
+    gm=np.prod(root)**(1.0/3.0)
+    W=(vec*(root/gm))@vec.T
+    return [center*scale,W,scale/gm]
+
+
+class mag_calibrator:
+    def __init__(self,scale=50.0,forgetting=1.0,p0=1e6):
+        self.scale=float(scale)
+        self.forgetting=forgetting
+        self.p0=p0
+        self.reset()
+
+    def reset(self):
+        self.theta=np.zeros(9)
+        self.P=np.eye(9)*self.p0
+        self.n=0
+
+    ## Add one sample, recursive least squares update with directional forgetting
+    def add(self,mx,my,mz):
+        s=self.scale
+        phi=_regressors(mx/s,my/s,mz/s)
+        Pphi=self.P@phi
+        r=phi@Pphi
+        self.theta=self.theta+Pphi*((1.0-phi@self.theta)/(1.0+r))
+        if r>1e-12:
+            # Forget only along phi, with forgetting=1 this is the standard RLS update
+            lam=self.forgetting
+            c=(lam*(1.0+r)-1.0)/(r*lam*(1.0+r))
+            self.P=self.P-np.outer(Pphi*c,Pphi)
+        self.n=self.n+1
+        return None
+
+    ## Add an array of samples, one row of mx, my, mz per sample
+    def add_batch(self,m):
+        for mx,my,mz in np.asarray(m,dtype=float):
+            self.add(mx,my,mz)
+        return None
+
+    ## Current [offset, W], None until the samples determine an ellipsoid
+    def solution(self):
+        fit=_ellipsoid(self.theta,self.scale)
+        if fit is None:
+            return None
+        return fit[0:2]
+
+    def field_strength(self):
+        fit=_ellipsoid(self.theta,self.scale)
+        if fit is None:
+            return None
+        return fit[2]
+
+    ## Write the current solution to a calibration file
+    def save(self,file_name):
+        fit=self.solution()
+        if fit is None:
+            raise ValueError('Magnetometer calibration has not converged (%d samples), rotate through more attitudes' % self.n)
+        write_calibration_file(file_name,fit[0],fit[1])
+        return None
+
+
+## Batch ellipsoid fit of an array of samples, returns [offset, W] or None
+def fit_ellipsoid(m,scale=50.0):
+    m=np.asarray(m,dtype=float)/scale
+    D=_regressors(m[:,0],m[:,1],m[:,2])
+    theta=np.linalg.lstsq(D,np.ones(len(m)),rcond=None)[0]
+    fit=_ellipsoid(theta,scale)
+    if fit is None:
+        return None
+    return fit[0:2]
+
+
+def write_calibration_file(file_name,offset,W):
+    W=np.asarray(W,dtype=float).reshape(3,3)
+    with open(file_name,'w') as f:
+        f.write('%.6f %.6f %.6f\n' % tuple(offset))
+        for row in W:
+            f.write('%.8f %.8f %.8f\n' % tuple(row))
+    return None
+
+
+## Example, fit a simulated distorted magnetometer and time the per sample costs
+if __name__ == '__main__':
+    import time
+    from Complementary_Filter2 import comp_filt
+
+    rng=np.random.default_rng(1)
+    field=48.0
+    offset_true=np.array([12.0,-7.5,20.0])
+    distortion=np.array([[1.10,0.06,-0.03],[0.06,0.92,0.04],[-0.03,0.04,1.02]])
+    W_true=np.linalg.inv(distortion)
+    W_true=W_true/np.linalg.det(W_true)**(1.0/3.0)
+
+    n=2000
+    v=rng.normal(size=(n,3))
+    v=v/np.linalg.norm(v,axis=1)[:,None]*field
+    m=v@distortion.T+offset_true+rng.normal(0,0.3,(n,3))
+
+    cal=mag_calibrator()
+    t0=time.perf_counter()
+    cal.add_batch(m)
+    t_rls=(time.perf_counter()-t0)/n
+    t0=time.perf_counter()
+    batch=fit_ellipsoid(m)
+    t_batch=time.perf_counter()-t0
+
+    print('%-10s %28s %12s' % ('fit','offset (uT)','|W-W_true|'))
+    print('%-10s %28s %12s' % ('true','%8.3f %8.3f %8.3f' % tuple(offset_true),''))
+    for name,(offset,W) in (('RLS',cal.solution()),('batch',batch)):
+        print('%-10s %28s %12.5f' % (name,'%8.3f %8.3f %8.3f' % tuple(offset),np.abs(W-W_true).max()))
+    print('field strength %.2f uT (true %.2f)' % (cal.field_strength(),field*np.linalg.det(distortion)**(1.0/3.0)))
+    print('RLS add(): %.1f us/sample, fit_ellipsoid() of %d samples: %.2f ms' % (t_rls*1e6,n,t_batch*1e3))
+
+    # Tracking calibrator through 200s of straight flight at 100Hz (one attitude)
+    tracking=mag_calibrator(forgetting=0.99)
+    tracking.add_batch(m)
+    level=np.array([0.6,0.3,0.74])*field/np.linalg.norm([0.6,0.3,0.74])
+    tracking.add_batch(level@distortion.T+offset_true+rng.normal(0,0.3,(20000,3)))
+    fit=tracking.solution()
+    print('forgetting=0.99 after 20000 samples at one attitude: offset %s, max|P| %.3g' % (
+          'lost' if fit is None else '%.3f %.3f %.3f' % tuple(fit[0]),np.abs(tracking.P).max()))
+
+    offset,W=cal.solution()
+    steps=20000
+    for name,soft_iron in (('hard iron only',None),('hard+soft iron',W)):
+        cf=comp_filt(offset[0],offset[1],offset[2],soft_iron=soft_iron)
+        t0=time.perf_counter()
+        for k in range(steps):
+            cf.attitude3(0.0,0.0,1.0,0.1,0.2,0.3,20.0,5.0,40.0)
+        print('attitude3 %-16s %.2f us/step' % (name,(time.perf_counter()-t0)/steps*1e6))
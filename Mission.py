@@ -0,0 +1,214 @@
+'''
+    Mission.py
+
+    Description: Mission leg table for path length, remaining distance and ETA queries on large missions
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    References:
+    - http://www.movable-type.co.uk/scripts/latlong.html
+
+    Inputs: init
+                - points <optional> = iterable of [lat,lon] or [lat,lon,alt] (deg, ft)
+            load_file
+                - file_name = waypoint file (see Navigation.py for format)
+            set_speed
+                - speed = ground speed (ft/s), either one value or one value per leg
+            leg_at / remaining_distance / eta
+                - s = along-track position measured from the first waypoint (ft)
+            along_track
+                - p = [lat,lon] of the vehicle (deg)
+                - leg = index of the active leg
+
+    Outputs: lat, lon, alt      - waypoint coordinates (deg, deg, ft)
+             leg_dist           - length of leg i, waypoint i to i+1 (ft)
+             leg_brng           - initial bearing of leg i (deg)
+             cum_dist           - along-track position of waypoint i (ft), cum_dist[-1] is the path length
+             cum_time           - time to reach waypoint i at the set speed (s)
+
+    NOTES:
+    - Written for python3
+    - Waypoints are streamed from the file into flat arrays, there are no per-waypoint
+      Python objects so memory stays at a few tens of bytes per waypoint
+    - The leg table is built in one vectorized pass using the same formulas and Earth
+      radius as Navigation.nav
+    - Position queries are binary searches on cum_dist, O(log n)
+
+    Requirements: numpy
+
+'''
+
+
+import math
+from array import array
+import numpy as np
+from Navigation import nav, read_waypoint_file
+
+class mission:
+    def __init__(self,points=None):
+        self.ER=nav().ER
+        self.reset()
+        if points is not None:
+            self.load(points)
+
+    ## Clear the mission
+    def reset(self):
+        self.lat=np.zeros(0)
+        self.lon=np.zeros(0)
+        self.alt=np.zeros(0)
+        self.leg_dist=np.zeros(0)
+        self.leg_brng=np.zeros(0)
+        self.cum_dist=np.zeros(1)
+        self.cum_time=None
+
+    def __len__(self):
+        return len(self.lat)
+
+    ## Load waypoints from any iterable of [lat,lon] or [lat,lon,alt]
+    def load(self,points):
+        lat=array('d')
+        lon=array('d')
+        alt=array('d')
+        for p in points:
+            lat.append(p[0])
+            lon.append(p[1])
+            alt.append(p[2] if len(p)>2 else 0.0)
+        # Wrap the arrays without copying them
+        self.lat=np.frombuffer(lat,dtype=np.float64)
+        self.lon=np.frombuffer(lon,dtype=np.float64)
+        self.alt=np.frombuffer(alt,dtype=np.float64)
+        self.build_legs()
+
+    ## Load waypoints from a waypoint file
+    def load_file(self,file_name):
+        self.load(read_waypoint_file(file_name))
+
+    ## Build the leg table in one vectorized pass
+    def build_legs(self):
+        n=len(self.lat)
+        if n<2:
+            self.leg_dist=np.zeros(0)
+            self.leg_brng=np.zeros(0)
+            self.cum_dist=np.zeros(max(n,1))
+            self.cum_time=None
+            return None
+
+        phi=np.radians(self.lat)
+        lam=np.radians(self.lon)
+        phi1=phi[:-1]
+        phi2=phi[1:]
+        dlam=lam[1:]-lam[:-1]
+        cphi1=np.cos(phi1)
+        cphi2=np.cos(phi2)
+        sphi1=np.sin(phi1)
+        sphi2=np.sin(phi2)
+
+        # Haversine leg lengths
+        a=np.sin((phi2-phi1)*0.5)**2+cphi1*cphi2*np.sin(dlam*0.5)**2
+        self.leg_dist=2*self.ER*np.arctan2(np.sqrt(a),np.sqrt(1-a)) #ft
+
+        # Initial bearings
+        brng=np.degrees(np.arctan2(np.sin(dlam)*cphi2,cphi1*sphi2-sphi1*cphi2*np.cos(dlam)))
+        self.leg_brng=np.where(brng<0,brng+360,brng) #deg
+
+        # Cumulative distance at each waypoint
+        self.cum_dist=np.empty(n)
+        self.cum_dist[0]=0
+        np.cumsum(self.leg_dist,out=self.cum_dist[1:])
+
+        self.cum_time=None
+        return None
+
+    ## Total path length (ft)
+    def path_length(self):
+        return float(self.cum_dist[-1])
+
+    ## Set the planned ground speed, one value for the whole mission or one per leg (ft/s)
+    def set_speed(self,speed):
+        speed=np.broadcast_to(np.asarray(speed,dtype=float),self.leg_dist.shape)
+        self.cum_time=np.empty(len(self.cum_dist))
+        self.cum_time[0]=0
+        np.cumsum(self.leg_dist/speed,out=self.cum_time[1:])
+        return None
+
+    ## Index of the leg containing along-track position s
+    def leg_at(self,s):
+        i=int(np.searchsorted(self.cum_dist,s,side='right'))-1
+        return min(max(i,0),max(len(self.leg_dist)-1,0))
+
+    ## Distance remaining to the last waypoint (ft)
+    def remaining_distance(self,s):
+        return max(float(self.cum_dist[-1])-s,0.0)
+
+    ## Time remaining to the last waypoint (s)
+    # Uses the planned speed table if set_speed has been called, otherwise the current ground speed
+    def eta(self,s,ground_speed=None):
+        if self.cum_time is None or ground_speed is not None:
+            if not ground_speed:
+                return float('inf')
+            return self.remaining_distance(s)/ground_speed
+        if len(self.leg_dist)==0:
+            return 0.0
+        s=min(max(s,0.0),float(self.cum_dist[-1]))
+        i=self.leg_at(s)
+        # Interpolate the time within the current leg
+        if self.leg_dist[i]>0:
+            frac=(s-self.cum_dist[i])/self.leg_dist[i]
+        else:
+            frac=1.0
+        t=self.cum_time[i]+frac*(self.cum_time[i+1]-self.cum_time[i])
+        return float(self.cum_time[-1]-t)
+
+    ## Along-track position of p when flying leg i (ft), clamped to the leg
+    def along_track(self,p,leg):
+        p1=[self.lat[leg],self.lon[leg]]
+        phi1=math.radians(p1[0])
+        phi3=math.radians(p[0])
+        dphi=phi3-phi1
+        dlam=math.radians(p[1]-p1[1])
+        a=math.sin(dphi*0.5)**2+math.cos(phi1)*math.cos(phi3)*math.sin(dlam*0.5)**2
+        d13=2*math.atan2(math.sqrt(a),math.sqrt(1-a))
+        b13=math.atan2(math.sin(dlam)*math.cos(phi3),math.cos(phi1)*math.sin(phi3)-math.sin(phi1)*math.cos(phi3)*math.cos(dlam))
+        dxt=math.asin(math.sin(d13)*math.sin(b13-math.radians(self.leg_brng[leg])))
+        cxt=math.cos(dxt)
+        dat=math.acos(max(-1.0,min(1.0,math.cos(d13)/cxt))) if cxt!=0 else 0.0
+        # Behind the start of the leg
+        if math.cos(b13-math.radians(self.leg_brng[leg]))<0:
+            dat=-dat
+        dat=min(max(dat*self.ER,0.0),float(self.leg_dist[leg]))
+        return float(self.cum_dist[leg])+dat
+
+
+## Benchmark the vectorized leg table against a loop over nav.distance and nav.bearing
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(1)
+    n=200000
+    points=[[40+random.random()*0.5,-105+random.random()*0.5] for i in range(n)]
+
+    t0=time.perf_counter()
+    m=mission(points)
+    t_table=time.perf_counter()-t0
+
+    n1=nav()
+    t0=time.perf_counter()
+    total=0
+    for i in range(n-1):
+        total=total+n1.distance(points[i],points[i+1])
+        n1.bearing(points[i],points[i+1])
+    t_loop=time.perf_counter()-t0
+
+    m.set_speed(50)
+    t0=time.perf_counter()
+    for i in range(10000):
+        m.eta(i*100.0)
+    t_eta=(time.perf_counter()-t0)/10000
+
+    print('Waypoints:          %d' % n)
+    print('Leg table:          %.3f s (includes loading)' % t_table)
+    print('nav loop:           %.3f s' % t_loop)
+    print('Path length match:  %.6f ft' % abs(total-m.path_length()))
+    print('eta query:          %.2f us' % (t_eta*1e6))
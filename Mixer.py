@@ -0,0 +1,190 @@
+'''
+    Mixer.py
+
+    Description: Motor/servo mixer converting throttle and PID outputs to PWM commands
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Throttle cut left to the RC mapper, the mixer only stops the motors at PWM_MIN
+
+    Inputs: init
+                - config = read_config_file instance after read_configuration_file()
+                           (uses PWM_MIN, PWM_MAX and sys_or)
+            mix
+                - throttle = throttle command (u_sec), e.g. from rc_mapper.throttle
+                - roll, pitch, yaw = PID controller outputs (u_sec, added to/subtracted from the throttle)
+            mix_batch
+                - throttle, roll, pitch, yaw = arrays of the above
+
+    Outputs: mix                - list of PWM commands, one per channel (u_sec)
+             mix_batch          - N x channels array of PWM commands (u_sec)
+
+    NOTES:
+    - Written for python3
+    - The layout is selected by SYS_ORIENTATION (sys_or) from MIXER_LAYOUTS:
+        1 = quad X      channels: front right (CCW), rear right (CW), rear left (CCW), front left (CW)
+        2 = quad +      channels: front (CCW), right (CW), rear (CCW), left (CW)
+        3 = fixed wing  channels: aileron, elevator, throttle, rudder
+        4 = flying wing channels: left elevon, right elevon, throttle
+    - Each channel is a row of [roll, pitch, yaw] mixing factors and a type, motor channels
+      ride on the throttle, servo channels are centred at (PWM_MIN+PWM_MAX)/2
+    - Sign convention: +roll = right wing down, +pitch = nose up, +yaw = nose right,
+      positive servo output = trailing edge down
+    - Motor desaturation: if the roll/pitch/yaw demand spans more than PWM_MIN..PWM_MAX it is
+      scaled down to fit, then the throttle is shifted so no motor saturates. Attitude
+      authority is kept at the cost of throttle
+    - Throttle cut (thr_cut) is applied once, by the RC mapper against the recorded stick
+      minimum Tmin, which then commands PWM_MIN. The mixer only clamps the throttle to
+      PWM_MIN..PWM_MAX, and at PWM_MIN sets every motor to PWM_MIN instead of letting the
+      desaturation raise them, so the motors stay off. Servos keep responding
+
+    Requirements: numpy (mix_batch only)
+
+'''
+
+
+MOTOR=0
+SERVO=1
+
+## Mixer layouts, sys_or : list of (channel type, [roll, pitch, yaw])
+MIXER_LAYOUTS={
+    1: [(MOTOR,[-1, 1, 1]),
+        (MOTOR,[-1,-1,-1]),
+        (MOTOR,[ 1,-1, 1]),
+        (MOTOR,[ 1, 1,-1])],
+    2: [(MOTOR,[ 0, 1, 1]),
+        (MOTOR,[-1, 0,-1]),
+        (MOTOR,[ 0,-1, 1]),
+        (MOTOR,[ 1, 0,-1])],
+    3: [(SERVO,[ 1, 0, 0]),
+        (SERVO,[ 0,-1, 0]),
+        (MOTOR,[ 0, 0, 0]),
+        (SERVO,[ 0, 0, 1])],
+    4: [(SERVO,[ 1,-1, 0]),
+        (SERVO,[-1,-1, 0]),
+        (MOTOR,[ 0, 0, 0])],
+}
+
+class mixer:
+    def __init__(self,config):
+        self.PWM_MIN=config.PWM_MIN
+        self.PWM_MAX=config.PWM_MAX
+        self.sys_or=int(config.sys_or)
+        if self.sys_or not in MIXER_LAYOUTS:
+            raise ValueError('No mixer layout for SYS_ORIENTATION %d' % self.sys_or)
+        self.layout=MIXER_LAYOUTS[self.sys_or]
+        self.n=len(self.layout)
+        self.center=0.5*(self.PWM_MIN+self.PWM_MAX)
+        self.motors=[i for i in range(self.n) if self.layout[i][0]==MOTOR]
+        self.servos=[i for i in range(self.n) if self.layout[i][0]==SERVO]
+        self.rows=[tuple(self.layout[i][1]) for i in range(self.n)]
+        # Preallocated outputs for the loop
+        self.out=[self.PWM_MIN]*self.n
+        self._mix=[0.0]*self.n
+        self._matrix=None
+
+    ## Mix a single set of commands, returns the preallocated output list
+    def mix(self,throttle,roll,pitch,yaw):
+        lo=self.PWM_MIN
+        hi=self.PWM_MAX
+        out=self.out
+        m=self._mix
+        rows=self.rows
+        for i in range(self.n):
+            r=rows[i]
+            m[i]=r[0]*roll+r[1]*pitch+r[2]*yaw
+
+        # Servos
+        for i in self.servos:
+            v=self.center+m[i]
+            out[i]=lo if v<lo else (hi if v>hi else v)
+
+        # Motors
+        motors=self.motors
+        if throttle<=lo:
+            for i in motors:
+                out[i]=lo
+            return out
+        if throttle>hi:
+            throttle=hi
+        mmax=max(m[i] for i in motors)
+        mmin=min(m[i] for i in motors)
+        scale=1.0
+        if mmax-mmin>hi-lo:
+            scale=(hi-lo)/(mmax-mmin)
+            mmax=mmax*scale
+            mmin=mmin*scale
+        if throttle+mmax>hi:
+            throttle=hi-mmax
+        if throttle+mmin<lo:
+            throttle=lo-mmin
+        for i in motors:
+            out[i]=throttle+m[i]*scale
+        return out
+
+    ## Mix arrays of commands in one step, e.g. for batch simulation
+    def mix_batch(self,throttle,roll,pitch,yaw):
+        import numpy as np
+        if self._matrix is None:
+            self._matrix=np.array([self.layout[i][1] for i in range(self.n)],dtype=float).T
+            self._motor_mask=np.array([self.layout[i][0]==MOTOR for i in range(self.n)])
+        lo=self.PWM_MIN
+        hi=self.PWM_MAX
+        thr,roll,pitch,yaw=np.broadcast_arrays(*[np.array(a,dtype=float,ndmin=1) for a in (throttle,roll,pitch,yaw)])
+        cut=thr<=lo
+        thr=thr.copy()
+        u=np.column_stack((roll,pitch,yaw))
+        m=u@self._matrix
+        out=np.empty_like(m)
+
+        # Servos
+        s=~self._motor_mask
+        out[:,s]=np.clip(self.center+m[:,s],lo,hi)
+
+        # Motors
+        k=self._motor_mask
+        mm=m[:,k]
+        mmax=mm.max(axis=1)
+        mmin=mm.min(axis=1)
+        span=mmax-mmin
+        scale=np.where(span>hi-lo,(hi-lo)/np.where(span>0,span,1),1.0)
+        mm=mm*scale[:,None]
+        mmax=mmax*scale
+        mmin=mmin*scale
+        np.minimum(thr,hi,out=thr)
+        thr=np.where(thr+mmax>hi,hi-mmax,thr)
+        thr=np.where(thr+mmin<lo,lo-mmin,thr)
+        motors=thr[:,None]+mm
+        motors[cut]=lo
+        out[:,k]=motors
+        return out
+
+
+## Benchmark
+if __name__ == '__main__':
+    import random
+    import time
+
+    class config:
+        PWM_MIN=1000; PWM_MAX=2000; sys_or=1
+
+    random.seed(1)
+    n=100000
+    cmds=[(random.uniform(1000,2000),random.uniform(-300,300),random.uniform(-300,300),random.uniform(-100,100)) for i in range(n)]
+    m=mixer(config())
+
+    t0=time.perf_counter()
+    for c in cmds:
+        m.mix(*c)
+    t_loop=(time.perf_counter()-t0)/n
+
+    import numpy as np
+    arr=np.array(cmds)
+    t0=time.perf_counter()
+    out=m.mix_batch(arr[:,0],arr[:,1],arr[:,2],arr[:,3])
+    t_batch=(time.perf_counter()-t0)/n
+
+    worst=max(abs(out[i]-np.array(m.mix(*cmds[i]))).max() for i in range(0,n,97))
+    print('mix:             %.2f us/cycle' % (t_loop*1e6))
+    print('mix_batch:       %.4f us/cycle' % (t_batch*1e6))
+    print('Max difference:  %.2e u_sec' % worst)
@@ -0,0 +1,305 @@
+'''
+    Monte_Carlo.py
+
+    Description: Parallel Monte Carlo study of sensor noise, bias and dropout effects on the
+                 attitude/control and altitude estimation chains
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    References:
+    - Welford, B.P., "Note on a Method for Calculating Corrected Sums of Squares and Products",
+      Technometrics, vol. 4, no. 3, 1962
+    - Chan, T.F., Golub, G.H., LeVeque, R.J., "Updating Formulae and a Pairwise Algorithm for
+      Computing Sample Variances", 1979 (merging accumulators)
+
+    Inputs: monte_carlo
+                - runs = number of noise realisations
+                - params <optional> = dictionary overriding MC_DEFAULTS
+                - processes <optional> = worker processes, defaults to the number of CPUs
+                - batch_size <defaults to 200> = runs per task sent to a worker
+                - seed <defaults to 0> = base seed, run k always uses the noise of (seed, k)
+
+    Outputs: monte_carlo        - dictionary of metric name : welford accumulator over the runs
+                                  (see METRICS), welford.summary() gives n, mean, std, min, max
+
+    NOTES:
+    - Written for python3
+    - Each run flies the same truth trajectory (a roll/pitch manoeuvre and a climb) and
+      simulates the sensors from it with the noise, biases and dropouts in params:
+        IMU 100Hz   -> comp_filt.attitude2 -> roll PID (type 2, roll rate as derivative)
+        baro 25Hz, sonar 10Hz, GPS 5Hz    -> alt_kalman.alt_kf at the baro rate, sonar
+                                             and GPS are used only when a fresh sample arrived
+      Errors are measured against the truth, the PID against the same PID fed the truth
+    - Noise is drawn from NumPy generators seeded with (seed, run), so results do not depend
+      on the number of processes or the batch size
+    - Each worker process builds its filters once and resets them between runs,
+      alt_kalman is returned to its initial state with restore()
+    - Every run is reduced to a few numbers (METRICS) which are added to Welford
+      accumulators, batches are merged in order. Memory does not grow with the number
+      of runs, 10^5 runs never hold more than one trajectory per worker
+
+    Calls: Complementary_Filter2, PID, Kalman_Altitude, Replay (virtual_clock)
+
+    Requirements: numpy
+
+'''
+
+
+import math
+import time
+import multiprocessing
+import numpy as np
+from Complementary_Filter2 import comp_filt
+from PID import PID
+from Kalman_Altitude import alt_kalman
+from Replay import virtual_clock
+
+## Default scenario and sensor error parameters
+MC_DEFAULTS={
+    'duration':     20.0,               # s
+    'settle':       2.0,                # s, errors before this are not counted
+    'roll_amp':     15.0,               # deg
+    'pitch_amp':    8.0,                # deg
+    'climb':        60.0,               # ft
+    'gyro_noise':   0.5,                # deg/s
+    'gyro_bias':    0.2,                # deg/s, std of the per run bias
+    'accel_noise':  0.02,               # g
+    'baro_noise':   1.5,                # ft
+    'baro_bias':    3.0,                # ft, std of the per run bias
+    'sonar_noise':  0.1,                # ft
+    'sonar_max':    20.0,               # ft, no sonar readings above this
+    'sonar_dropout':0.05,               # probability a sonar reading is missing
+    'gps_noise':    8.0,                # ft
+    'gps_vz_noise': 0.5,                # ft/s
+    'gps_dropout':  0.1,                # probability a GPS fix is missing
+    'roll_pid':     (1.0,0.1,0.05,10.0),
+    'kf_p':         [1.0,0.0,0.0,1.0],
+    'kf_q':         [0.01,0.1],
+    'kf_r':         [0.5,4.0,25.0,1.0],
+}
+
+## Per run metrics
+METRICS=('roll_rms','roll_max','pitch_rms','pitch_max','pid_rms','alt_rms','alt_max','vz_rms')
+
+IMU_RATE=100
+BARO_DIV=4      # baro every 4th IMU sample (25Hz)
+SONAR_DIV=10    # 10Hz
+GPS_DIV=20      # 5Hz
+
+
+class welford:
+    __slots__=('n','mean','m2','min','max')
+
+    def __init__(self):
+        self.n=0
+        self.mean=0.0
+        self.m2=0.0
+        self.min=math.inf
+        self.max=-math.inf
+
+    def add(self,x):
+        self.n=self.n+1
+        d=x-self.mean
+        self.mean=self.mean+d/self.n
+        self.m2=self.m2+d*(x-self.mean)
+        if x<self.min:
+            self.min=x
+        if x>self.max:
+            self.max=x
+
+    ## Combine with the accumulator of another set of samples
+    def merge(self,other):
+        if other.n==0:
+            return None
+        n=self.n+other.n
+        d=other.mean-self.mean
+        self.mean=self.mean+d*other.n/n
+        self.m2=self.m2+other.m2+d*d*self.n*other.n/n
+        self.n=n
+        self.min=min(self.min,other.min)
+        self.max=max(self.max,other.max)
+
+    def variance(self):
+        return self.m2/(self.n-1) if self.n>1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def summary(self):
+        return {'n':self.n,'mean':self.mean,'std':self.std(),'min':self.min,'max':self.max}
+
+
+## Noise free trajectory and sensor values, the same for every run
+def truth(p):
+    n=int(p['duration']*IMU_RATE)
+    t=np.arange(n)/IMU_RATE
+    w_roll=2*math.pi*0.2
+    w_pitch=2*math.pi*0.1
+    roll=np.radians(p['roll_amp'])*np.sin(w_roll*t)
+    pitch=np.radians(p['pitch_amp'])*np.sin(w_pitch*t)
+    roll_dot=np.radians(p['roll_amp'])*w_roll*np.cos(w_roll*t)
+    pitch_dot=np.radians(p['pitch_amp'])*w_pitch*np.cos(w_pitch*t)
+
+    # Gravity in the body frame (comp_filt's sign convention) and body rates for zero yaw rate
+    ax=np.sin(pitch)
+    ay=-np.sin(roll)*np.cos(pitch)
+    az=np.cos(roll)*np.cos(pitch)
+    gx=np.degrees(roll_dot)
+    gy=np.degrees(np.cos(roll)*pitch_dot)
+    gz=np.degrees(-np.sin(roll)*pitch_dot)
+
+    # Smooth climb and its vertical speed
+    T=p['duration']
+    h=p['climb']*(1-np.cos(math.pi*t/T))/2
+    vz=p['climb']*math.pi/T*np.sin(math.pi*t/T)/2
+
+    # Reference PID output, the controller fed the true roll and roll rate
+    clock=virtual_clock()
+    pid=PID(*p['roll_pid'],clock=clock)
+    pid_ref=np.zeros(n)
+    for k in range(n):
+        clock.t=t[k]
+        pid_ref[k]=pid.control(0.0,math.degrees(roll[k]),2,gx[k])
+
+    return {'t':t,'roll':np.degrees(roll),'pitch':np.degrees(pitch),'accel':np.stack([ax,ay,az],1),
+            'gyro':np.stack([gx,gy,gz],1),'h':h,'vz':vz,'pid':pid_ref}
+
+
+class _worker:
+    def __init__(self,params):
+        p=dict(MC_DEFAULTS)
+        p.update(params or {})
+        self.p=p
+        self.truth=truth(p)
+        self.clock=virtual_clock()
+        self.cf=comp_filt(clock=self.clock)
+        self.pid=PID(*p['roll_pid'],clock=self.clock)
+        self.kf=alt_kalman(p['kf_p'],p['kf_q'],p['kf_r'],[0.0,0.0])
+        self.kf_initial=self.kf.snapshot()
+
+    ## One noise realisation, returns the METRICS values
+    def run(self,seed,k):
+        p=self.p
+        tr=self.truth
+        n=len(tr['t'])
+        rng=np.random.default_rng([seed,k])
+
+        # Sensor samples
+        accel=(tr['accel']+rng.normal(0,p['accel_noise'],(n,3))).tolist()
+        gyro=(tr['gyro']+rng.normal(0,p['gyro_noise'],(n,3))+rng.normal(0,p['gyro_bias'],3)).tolist()
+        baro=(tr['h'][::BARO_DIV]+rng.normal(0,p['baro_noise'],len(tr['h'][::BARO_DIV]))+rng.normal(0,p['baro_bias'])).tolist()
+        h_s=tr['h'][::SONAR_DIV]
+        sonar=(h_s+rng.normal(0,p['sonar_noise'],len(h_s))).tolist()
+        sonar_ok=((rng.random(len(h_s))>=p['sonar_dropout']) & (h_s<=p['sonar_max'])).tolist()
+        h_g=tr['h'][::GPS_DIV]
+        gps_alt=(h_g+rng.normal(0,p['gps_noise'],len(h_g))).tolist()
+        gps_vz=(tr['vz'][::GPS_DIV]+rng.normal(0,p['gps_vz_noise'],len(h_g))).tolist()
+        gps_ok=(rng.random(len(h_g))>=p['gps_dropout']).tolist()
+
+        cf=self.cf
+        pid=self.pid
+        kf=self.kf
+        clock=self.clock
+        cf.reset()
+        pid.reset()
+        kf.restore(self.kf_initial)
+
+        t=tr['t'].tolist()
+        start=int(p['settle']*IMU_RATE)
+        att_err=np.zeros((n,3))
+        alt_err=np.zeros((n//BARO_DIV+1,2))
+        m=0
+        sonar_z=0.0
+        gps_z=[0.0,0.0]
+        h_sonar=0.0
+        h_gps=0.0
+        dt_kf=1.0/IMU_RATE*BARO_DIV
+        for k in range(n):
+            clock.t=t[k]
+            a=accel[k]
+            g=gyro[k]
+            cf.attitude2(a[0],a[1],a[2],g[0],g[1],g[2])
+            att_err[k,0]=cf.roll_d
+            att_err[k,1]=cf.pitch_d
+            att_err[k,2]=pid.control(0.0,cf.roll_d,2,cf.phid_d)
+
+            if k%SONAR_DIV==0:
+                j=k//SONAR_DIV
+                h_sonar=1.0 if sonar_ok[j] else 0.0
+                sonar_z=sonar[j]
+            if k%GPS_DIV==0:
+                j=k//GPS_DIV
+                h_gps=1.0 if gps_ok[j] else 0.0
+                gps_z=[gps_alt[j],gps_vz[j]]
+            if k%BARO_DIV==0:
+                xest=kf.alt_kf([h_sonar,1.0,h_gps,h_gps],[sonar_z,baro[k//BARO_DIV],gps_z[0],gps_z[1]],dt_kf)
+                alt_err[m,0]=xest[0]
+                alt_err[m,1]=xest[1]
+                m=m+1
+                # Sonar and GPS samples are used once
+                h_sonar=0.0
+                h_gps=0.0
+
+        att=att_err[start:]
+        roll_e=att[:,0]-tr['roll'][start:]
+        pitch_e=att[:,1]-tr['pitch'][start:]
+        pid_e=att[:,2]-tr['pid'][start:]
+        kf_start=start//BARO_DIV
+        alt_e=alt_err[kf_start:m,0]-tr['h'][::BARO_DIV][kf_start:m]
+        vz_e=alt_err[kf_start:m,1]-tr['vz'][::BARO_DIV][kf_start:m]
+        rms=lambda e: math.sqrt(float(np.mean(e*e)))
+        return (rms(roll_e),float(np.max(np.abs(roll_e))),rms(pitch_e),float(np.max(np.abs(pitch_e))),
+                rms(pid_e),rms(alt_e),float(np.max(np.abs(alt_e))),rms(vz_e))
+
+
+_state=None
+
+def _init_worker(params):
+    global _state
+    _state=_worker(params)
+
+## Run runs first..first+count-1, returns one accumulator per metric
+def _run_batch(args):
+    seed,first,count=args
+    acc=[welford() for name in METRICS]
+    for k in range(first,first+count):
+        values=_state.run(seed,k)
+        for a,v in zip(acc,values):
+            a.add(v)
+    return acc
+
+
+## Run the study, returns a dictionary of metric name : welford accumulator
+def monte_carlo(runs,params=None,processes=None,batch_size=200,seed=0):
+    batches=[(seed,first,min(batch_size,runs-first)) for first in range(0,runs,batch_size)]
+    totals=[welford() for name in METRICS]
+    if processes==1:
+        _init_worker(params)
+        results=map(_run_batch,batches)
+        pool=None
+    else:
+        pool=multiprocessing.Pool(processes,_init_worker,(params,))
+        results=pool.imap(_run_batch,batches)
+    try:
+        for acc in results:
+            for total,a in zip(totals,acc):
+                total.merge(a)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return dict(zip(METRICS,totals))
+
+
+if __name__ == '__main__':
+    import sys
+    runs=int(sys.argv[1]) if len(sys.argv)>1 else 1000
+    t0=time.perf_counter()
+    stats=monte_carlo(runs)
+    dt=time.perf_counter()-t0
+    print('%d runs in %.1fs (%.1f ms/run)' % (runs,dt,dt/runs*1e3))
+    print('%-10s %10s %10s %10s %10s' % ('metric','mean','std','min','max'))
+    for name in METRICS:
+        s=stats[name].summary()
+        print('%-10s %10.3f %10.3f %10.3f %10.3f' % (name,s['mean'],s['std'],s['min'],s['max']))
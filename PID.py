@@ -8,6 +8,8 @@
     18 Apr 2016 - Updated, added second PID controller to used measured rate for derivative instead of estimated error rate
     28 Apr 2016 - Added additional functions to allow gains to be changed on the fly
     12 Apr 2017 - Refactored and added controller seeding and integrator freezing
+    19 Oct 2026 - Clock can be passed in for replay and simulation
+    19 Oct 2026 - __slots__, state snapshot/restore and clone
 
     Author: Lars Soltmann
     
@@ -17,6 +19,7 @@
     
     Inputs: initialization      - kp,kd,ki = Proportional, derivative, integral gains
                                 - I_L = integrator limit
+                                - clock <defaults to time.time> = function returning the current time (s)
                                 
             seed_controller     - seed_value = user specified value to set the integrator term to
             
@@ -33,14 +36,32 @@
                                 - type <defaults to 1> = determines whether to estimate the derivative of the error use a user specified rate [1=estimate d(error)/dt, 2=use a rate]
                                 - dadt <defaults to 0> = user specified rate for derivative term
     
+            snapshot            - buf <optional> = writable buffer to save the controller state to (STATE_FIELDS as doubles),
+                                                   a new bytearray if not given
+                                - offset <defaults to 0> = byte offset in buf
+
+            restore             - buf, offset = buffer and offset written by snapshot
+    
     Outputs: control            - controller_output = PID controller ouput
+             snapshot           - buf
+             clone              - independent copy of the controller with the same gains and state
 '''
 
 
 import time
+import struct
 
 class PID:
-    def __init__(self,kp,kd,ki,I_L):
+    __slots__=('clock','kp','kd','ki','I_L',
+               'error_sum','error_previous','t_previous','seed_flag','freeze','first_time','I_TERM')
+
+    ## Dynamic state saved by snapshot(), one double each
+    STATE_FIELDS=__slots__[5:]
+    STATE=struct.Struct('<7d')
+    STATE_SIZE=STATE.size
+
+    def __init__(self,kp,kd,ki,I_L,clock=time.time):
+        self.clock=clock
         self.kp=kp
         self.kd=kd
         self.ki=ki
@@ -77,6 +98,26 @@ class PID:
     def set_ki(self,new_ki):
         self.ki=new_ki
 
+    # Save the controller state to a buffer
+    def snapshot(self,buf=None,offset=0):
+        if buf is None:
+            buf=bytearray(self.STATE_SIZE)
+        self.STATE.pack_into(buf,offset,self.error_sum,self.error_previous,self.t_previous,self.seed_flag,
+                             self.freeze,self.first_time,self.I_TERM)
+        return buf
+
+    # Load the controller state from a buffer written by snapshot()
+    def restore(self,buf,offset=0):
+        (self.error_sum,self.error_previous,self.t_previous,self.seed_flag,
+         self.freeze,self.first_time,self.I_TERM)=self.STATE.unpack_from(buf,offset)
+
+    # Independent copy with the same gains and state
+    def clone(self):
+        new=PID.__new__(PID)
+        for name in PID.__slots__:
+            setattr(new,name,getattr(self,name))
+        return new
+
 
     ## PID CONTROLLER
     # Type is either 1 or 2
@@ -84,7 +125,7 @@ class PID:
     #   2 = use provided rate for derivative term
     def control(self, target, actual, type=1, dadt=0):
         if self.first_time==1:
-            self.t_previous=time.time()
+            self.t_previous=self.clock()
             if self.I_TERM!=0:
                 controller_output=self.I_TERM
             else:
@@ -92,7 +133,7 @@ class PID:
             self.first_time=0
         else:
             ## Get the current time and find differential time element
-            t=time.time()
+            t=self.clock()
             dt=t-self.t_previous
 
             ## Calculate current error
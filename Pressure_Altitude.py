@@ -0,0 +1,147 @@
+'''
+    Pressure_Altitude.py
+
+    Description: Barometric altitude from static pressure with cached reference constants and an interpolation table
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    References:
+    - U.S. Standard Atmosphere, 1976
+    - https://en.wikipedia.org/wiki/Pressure_altitude
+
+    Inputs: init
+                - qnh <defaults to 1013.25> = reference (sea level or field) pressure (mbar)
+                - temp_c <defaults to 15> = temperature at the reference level (degC)
+                - n <defaults to 1024> = number of table intervals
+            set_reference
+                - qnh, temp_c = as above, either can be left out to keep the current value
+            altitude / altitude_table
+                - press = static pressure (mbar), e.g. MS5805.getPressure_mbar()
+            altitude_batch
+                - press = array of static pressures (mbar)
+                - table <defaults to 0> = 1 to use the interpolation table
+
+    Outputs: altitude           - height above the reference level (ft)
+
+    NOTES:
+    - Written for python3
+    - Troposphere model: h = T/L*(1-(P/QNH)^(R*L/g)), valid up to 36,000ft
+    - The table holds 1-(P/QNH)^(R*L/g) over pressure ratios 0.2 to 1.2, so changing the
+      reference pressure or temperature in flight only updates two scale factors and the
+      table itself is never rebuilt
+    - altitude() evaluates the formula with the reference constants cached, altitude_table()
+      is one table lookup and one linear interpolation. In CPython pow() is a single C call,
+      and on x86-64 the cached formula measured faster than the table (0.33us vs 0.58us,
+      10ns vs 20ns per sample in batch). The table is kept for targets where pow() is slow,
+      run this file on the target to compare
+    - Interpolation error versus altitude() with the default n=1024, standard day:
+        sea level to 10,000ft       < 0.01ft
+        10,000ft to 36,000ft        < 0.05ft
+      The error scales with 1/n^2
+    - Pressures outside the table are extrapolated from the end intervals
+    - For the SSC005D differential sensor use the static port pressure, not the dynamic pressure
+
+    Requirements: numpy (altitude_batch only)
+
+'''
+
+
+## Standard atmosphere constants
+L=0.0065                # Temperature lapse rate (K/m)
+EXPONENT=0.190263       # R*L/g for dry air
+M_TO_FT=3.280839895
+
+class pressure_altitude:
+    def __init__(self,qnh=1013.25,temp_c=15.0,n=1024):
+        self.x_min=0.2
+        self.x_max=1.2
+        self.n=int(n)
+        self.dx=(self.x_max-self.x_min)/self.n
+        self.inv_dx=1/self.dx
+        # Table of 1-x^EXPONENT and the slope of each interval
+        x=[self.x_min+i*self.dx for i in range(self.n+1)]
+        self.f=[1-xi**EXPONENT for xi in x]
+        self.df=[self.f[i+1]-self.f[i] for i in range(self.n)]
+        self._arrays=None
+        self.qnh=qnh
+        self.temp_c=temp_c
+        self.set_reference()
+
+    ## Update the reference pressure and/or temperature, only the scale factors change
+    def set_reference(self,qnh=None,temp_c=None):
+        if qnh is not None:
+            self.qnh=qnh
+        if temp_c is not None:
+            self.temp_c=temp_c
+        self.inv_qnh=1/self.qnh
+        self.scale=(self.temp_c+273.15)/L*M_TO_FT #ft
+        return None
+
+    ## Altitude from pressure
+    def altitude(self,press):
+        return self.scale*(1-(press*self.inv_qnh)**EXPONENT) #ft
+
+    ## Altitude from pressure using the table
+    def altitude_table(self,press):
+        u=(press*self.inv_qnh-self.x_min)*self.inv_dx
+        i=int(u)
+        if i<0:
+            i=0
+        elif i>=self.n:
+            i=self.n-1
+        return self.scale*(self.f[i]+self.df[i]*(u-i)) #ft
+
+    ## Altitude for an array of pressures
+    def altitude_batch(self,press,table=0):
+        import numpy as np
+        if table==0:
+            return self.scale*(1-(np.asarray(press,dtype=float)*self.inv_qnh)**EXPONENT) #ft
+        if self._arrays is None:
+            self._arrays=(np.asarray(self.f),np.asarray(self.df))
+        f,df=self._arrays
+        u=(np.asarray(press,dtype=float)*self.inv_qnh-self.x_min)*self.inv_dx
+        i=np.clip(u.astype(np.int64),0,self.n-1)
+        return self.scale*(f[i]+df[i]*(u-i)) #ft
+
+
+## Accuracy and speed of the table compared to the formula
+if __name__ == '__main__':
+    import time
+    import numpy as np
+
+    pa=pressure_altitude()
+    # Pressure from sea level to 36,000ft in 0.01mbar steps
+    press=[1013.25-0.01*i for i in range(78880)]
+    worst_low=0
+    worst_high=0
+    for p in press:
+        h=pa.altitude(p)
+        e=abs(pa.altitude_table(p)-h)
+        if h<10000:
+            worst_low=max(worst_low,e)
+        else:
+            worst_high=max(worst_high,e)
+
+    results=[]
+    for name,fn in (('altitude',pa.altitude),('altitude_table',pa.altitude_table)):
+        t0=time.perf_counter()
+        for p in press:
+            fn(p)
+        results.append((name,(time.perf_counter()-t0)/len(press)))
+
+    log=np.array(press)
+    for table in (0,1):
+        t0=time.perf_counter()
+        pa.altitude_batch(log,table)
+        results.append(('altitude_batch(table=%d)' % table,(time.perf_counter()-t0)/len(press)))
+
+    t0=time.perf_counter()
+    for i in range(10000):
+        pa.set_reference(qnh=1000+i*0.001)
+    results.append(('set_reference',(time.perf_counter()-t0)/10000))
+
+    print('Table error 0-10,000ft:       %.4f ft' % worst_low)
+    print('Table error 10,000-36,000ft:  %.4f ft' % worst_high)
+    for name,t in results:
+        print('%-30s%.4f us' % (name+':',t*1e6))
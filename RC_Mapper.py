@@ -0,0 +1,170 @@
+'''
+    RC_Mapper.py
+
+    Description: Lookup tables converting RC stick PWM values to pitch/roll angle, yaw rate and throttle setpoints
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    Inputs: init
+                - config = read_config_file instance after read_configuration_file() and read_calibration_file()
+                - pwm_lo <defaults to 0> = lowest PWM value in the tables (u_sec)
+                - pwm_hi <defaults to 3000> = highest PWM value in the tables (u_sec)
+            pitch, roll, yaw_rate, throttle
+                - pwm = stick PWM value (u_sec)
+            convert_batch
+                - axis = 'pitch', 'roll', 'yaw' or 'throttle'
+                - pwm = array of stick PWM values (u_sec)
+
+    Outputs: pitch              - pitch angle setpoint (deg)
+             roll               - roll angle setpoint (deg)
+             yaw_rate           - yaw rate setpoint (deg/s)
+             throttle           - throttle PWM command (u_sec), PWM_MIN while in the throttle cut range
+
+    NOTES:
+    - Written for python3
+    - Stick mapping, evaluated once per PWM value when the tables are built:
+        pwm > cn+dead_band          setpoint = m*pwm+bh
+        pwm < cn-dead_band          setpoint = m*pwm+bl
+        otherwise                   setpoint = 0
+      and the setpoint is limited to +/-max_p, max_r or max_dy
+    - Throttle at or below Tmin+thr_cut is set to PWM_MIN so all motors remain off,
+      above that it is limited to PWM_MIN..PWM_MAX
+    - PWM values are truncated to whole microseconds, values outside pwm_lo..pwm_hi
+      use the end of the table
+    - Call build() again after the calibration or configuration values change
+
+    Requirements: numpy (convert_batch only)
+
+'''
+
+
+## Piecewise stick mapping for a single PWM value
+def stick_to_setpoint(pwm,m,bl,bh,cn,dead_band,limit):
+    if pwm>cn+dead_band:
+        setpoint=m*pwm+bh
+    elif pwm<cn-dead_band:
+        setpoint=m*pwm+bl
+    else:
+        setpoint=0.0
+    if setpoint>limit:
+        setpoint=limit
+    elif setpoint<-limit:
+        setpoint=-limit
+    return setpoint
+
+## Throttle command for a single PWM value
+def stick_to_throttle(pwm,Tmin,thr_cut,PWM_MIN,PWM_MAX):
+    if pwm<=Tmin+thr_cut:
+        return PWM_MIN
+    if pwm<PWM_MIN:
+        return PWM_MIN
+    if pwm>PWM_MAX:
+        return PWM_MAX
+    return float(pwm)
+
+
+class rc_mapper:
+    def __init__(self,config,pwm_lo=0,pwm_hi=3000):
+        self.config=config
+        self.pwm_lo=int(pwm_lo)
+        self.pwm_hi=int(pwm_hi)
+        self.build()
+
+    ## Build the lookup tables from the current calibration and configuration values
+    def build(self):
+        c=self.config
+        pwm=range(self.pwm_lo,self.pwm_hi+1)
+        self.n=len(pwm)
+        self.pitch_table=[stick_to_setpoint(x,c.Pm,c.Pbl,c.Pbh,c.Pcn,c.dead_band,c.max_p) for x in pwm]
+        self.roll_table=[stick_to_setpoint(x,c.Rm,c.Rbl,c.Rbh,c.Rcn,c.dead_band,c.max_r) for x in pwm]
+        self.yaw_table=[stick_to_setpoint(x,c.Ym,c.Ybl,c.Ybh,c.Ycn,c.dead_band,c.max_dy) for x in pwm]
+        self.throttle_table=[stick_to_throttle(x,c.Tmin,c.thr_cut,c.PWM_MIN,c.PWM_MAX) for x in pwm]
+        self._arrays=None
+        return None
+
+    ## Table index for a PWM value
+    def index(self,pwm):
+        i=int(pwm)-self.pwm_lo
+        if i<0:
+            return 0
+        if i>=self.n:
+            return self.n-1
+        return i
+
+    def pitch(self,pwm):
+        i=int(pwm)-self.pwm_lo
+        if 0<=i<self.n:
+            return self.pitch_table[i] #deg
+        return self.pitch_table[self.index(pwm)]
+
+    def roll(self,pwm):
+        i=int(pwm)-self.pwm_lo
+        if 0<=i<self.n:
+            return self.roll_table[i] #deg
+        return self.roll_table[self.index(pwm)]
+
+    def yaw_rate(self,pwm):
+        i=int(pwm)-self.pwm_lo
+        if 0<=i<self.n:
+            return self.yaw_table[i] #deg/s
+        return self.yaw_table[self.index(pwm)]
+
+    def throttle(self,pwm):
+        i=int(pwm)-self.pwm_lo
+        if 0<=i<self.n:
+            return self.throttle_table[i] #u_sec
+        return self.throttle_table[self.index(pwm)]
+
+    ## Convert an array of logged PWM values for one axis
+    def convert_batch(self,axis,pwm):
+        import numpy as np
+        if self._arrays is None:
+            self._arrays={'pitch':np.asarray(self.pitch_table),
+                          'roll':np.asarray(self.roll_table),
+                          'yaw':np.asarray(self.yaw_table),
+                          'throttle':np.asarray(self.throttle_table)}
+        i=np.clip(np.asarray(pwm).astype(np.int64)-self.pwm_lo,0,self.n-1)
+        return self._arrays[axis][i]
+
+
+## Benchmark against evaluating the piecewise mapping every cycle
+if __name__ == '__main__':
+    import random
+    import time
+
+    class calibration:
+        Pm=0.06; Pbl=-88.5; Pbh=-91.5; Pcn=1500
+        Rm=0.06; Rbl=-88.5; Rbh=-91.5; Rcn=1500
+        Ym=0.2; Ybl=-295; Ybh=-305; Ycn=1500
+        dead_band=10; max_p=30; max_r=30; max_dy=90
+        Tmin=1100; thr_cut=50; PWM_MIN=1000; PWM_MAX=2000
+
+    c=calibration()
+    random.seed(1)
+    sticks=[random.randint(1000,2000) for i in range(100000)]
+
+    t0=time.perf_counter()
+    mapper=rc_mapper(c)
+    t_build=time.perf_counter()-t0
+
+    t0=time.perf_counter()
+    for x in sticks:
+        stick_to_setpoint(x,c.Pm,c.Pbl,c.Pbh,c.Pcn,c.dead_band,c.max_p)
+    t_direct=(time.perf_counter()-t0)/len(sticks)
+
+    t0=time.perf_counter()
+    for x in sticks:
+        mapper.pitch(x)
+    t_table=(time.perf_counter()-t0)/len(sticks)
+
+    import numpy as np
+    stick_log=np.asarray(sticks)
+    t0=time.perf_counter()
+    mapper.convert_batch('pitch',stick_log)
+    t_batch=(time.perf_counter()-t0)/len(sticks)
+
+    print('Table build:     %.2f ms' % (t_build*1e3))
+    print('Direct:          %.3f us/sample' % (t_direct*1e6))
+    print('Table:           %.3f us/sample' % (t_table*1e6))
+    print('Batch:           %.4f us/sample' % (t_batch*1e6))
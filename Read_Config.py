@@ -7,6 +7,9 @@
     17 Mar 2016 - Created and debugged
     14 Apr 2016 - Updated
     28 Apr 2016 - Added reading of magnetometer calibration file
+    19 Oct 2026 - Table driven configuration parser with compiled cache
+    19 Oct 2026 - Soft iron matrix in the magnetometer calibration file
+    19 Oct 2026 - Cache header refreshed after a touch, value types included in the table CRC
     
     Author: Lars Soltmann
     
@@ -22,15 +25,25 @@
     #For PID variables the value line format is:
     #kp kd ki abs(integral_limit)
     
-    Pitch PID
+    PITCH_PID
     1.1 2.2 3.3 1.2
 
-    Roll PID
+    ROLL_PID
     4.4 5.5 6.6 4.5
 
-    Yaw PID
+    YAW_PID
     7.7 8.8 9.9 7.8
     ______________________________
+
+    Keywords and their values are defined in CONFIG_SECTIONS, adding a new section
+    only needs a new entry there. All errors in the file are reported together.
+
+    A compiled copy of the parsed values is written to '<config file>.cache'. It is used
+    in place of parsing while the config file's modification time and size (or, if those
+    changed, its SHA1 hash) still match. When only the hash matches (the file was touched
+    or copied) the cache header is updated, so the hash is computed once. Caches written
+    with different keywords, attribute names or value types in CONFIG_SECTIONS are not
+    used. Pass use_cache=0 to always parse the file.
     
     
     Output:
@@ -88,234 +101,144 @@
         Ycn             = center PWM value of rudder stick (u_sec)
     
         Tmin            = minimum recorded throttle value
+
+        hix,hiy,hiz     = magnetometer hard iron offsets (uT)
+        mag_matrix      = magnetometer soft iron matrix, 3 rows of 3 values, None if the
+                          calibration file has only the hard iron offsets
     
 '''
 
 import sys
+import os
+import struct
+import hashlib
+import zlib
+
+## Configuration file sections
+# keyword : (attribute names in the order they appear on the values line, value type)
+# The number of values expected on the line is the number of attribute names
+CONFIG_SECTIONS={
+    'PITCH_PID':              (('p_pitch','d_pitch','i_pitch','il_pitch'),float),
+    'ROLL_PID':               (('p_roll','d_roll','i_roll','il_roll'),float),
+    'YAW_PID':                (('p_yaw','d_yaw','i_yaw','il_yaw'),float),
+    'ALT_PID':                (('p_alt','d_alt','i_alt','il_alt'),float),
+    'MAX_PITCH':              (('max_p',),float),
+    'MAX_ROLL':               (('max_r',),float),
+    'MAX_YAWRATE':            (('max_dy',),float),
+    'PWM_RANGE':              (('PWM_MIN','PWM_MAX'),float),
+    'PWM_FREQ':               (('PWM_FREQ',),float),
+    'DEAD_BAND':              (('dead_band',),float),
+    'THR_CUT':                (('thr_cut',),float),
+    'SYS_ORIENTATION':        (('sys_or',),float),
+    'SYS_ORIENTATION_OFFSET': (('sys_offset_x','sys_offset_y'),float),
+}
+
+## Compiled configuration cache layout
+# header: magic, config mtime (ns), config size (bytes), config sha1, section table crc, section present mask
+# body:   one double per attribute in CONFIG_SECTIONS order
+CACHE_MAGIC=b'APC1'
+CACHE_HEADER=struct.Struct('<4sqq20sII')
 
 class read_config_file:
-    def __init__(self,file_name1,file_name2,file_name3):
+    def __init__(self,file_name1,file_name2,file_name3,use_cache=1):
         self.file_name1=file_name1
         self.file_name2=file_name2
         self.file_name3=file_name3
-        self.flag=0
+        self.use_cache=use_cache
+        self.cache_file=file_name1+'.cache'
+        self.errors=[]
 
     def read_configuration_file(self):
+        #Use the compiled cache if it matches the config file
+        if self.use_cache==1 and self.load_config_cache()==1:
+            return None
+
         #Open the config file
-        file1 = open(self.file_name1, 'r')
-        for line in file1:
-            #Skip lines that are blank or start with
-            if (line[0]=='#' or line=='\n'):
-                pass
-            
-            #### PITCH_PID INFORMATION (1)
-            #If this phrase is found, set a flag so that the next time around the line is read into the appropriate variables
-            elif line=='PITCH_PID\n' or self.flag==1:
-                if self.flag==1:
-                    current_line=[float(s) for s in line.split()]
-                    #The values line should be 4 numbers following the format above, if not, then exit with error
-                    if len(current_line)==4:
-                        self.p_pitch,self.d_pitch,self.i_pitch,self.il_pitch=[float(s) for s in line.split()]
-                        #DEBUG
-                        #print(self.p_pitch)
-                        #print(self.d_pitch)
-                        #print(self.i_pitch)
-                        #print(self.il_pitch)
-                    else:
-                        sys.exit('Error reading PITCH_PID values!')
-                    self.flag=0
-                else:
-                    self.flag=1
-        
-            #### ROLL_PID INFORMATION (2)
-            elif line=='ROLL_PID\n' or self.flag==2:
-                 if self.flag==2:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==4:
-                         self.p_roll,self.d_roll,self.i_roll,self.il_roll=[float(s) for s in line.split()]
-                         #DEBUG
-                         #print(self.p_roll)
-                         #print(self.d_roll)
-                         #print(self.i_roll)
-                         #print(self.il_roll)
-                     else:
-                         sys.exit('Error reading ROLL_PID values!')
-                     self.flag=0
-                 else:
-                     self.flag=2
-                         
-            #### YAW_PID INFORMATION (3)
-            elif line=='YAW_PID\n' or self.flag==3:
-                 if self.flag==3:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==4:
-                         self.p_yaw,self.d_yaw,self.i_yaw,self.il_yaw=[float(s) for s in line.split()]
-                         #DEBUG
-                         #print(self.p_yaw)
-                         #print(self.d_yaw)
-                         #print(self.i_yaw)
-                         #print(self.il_yaw)
-                     else:
-                         sys.exit('Error reading YAW_PID values!')
-                     self.flag=0
-                 else:
-                     self.flag=3
-                     
-            #### MAX_PITCH INFORMATION (4)
-            elif line=='MAX_PITCH\n' or self.flag==4:
-                if self.flag==4:
-                    current_line=[float(s) for s in line.split()]
-                    if len(current_line)==1:
-                        self.max_p=current_line[0]
-                        #DEBUG
-                        #print(self.max_p)
-                    else:
-                        sys.exit('Error reading MAX_PITCH value!')
-                    self.flag=0
-                else:
-                    self.flag=4
-
-            #### MAX_ROLL INFORMATION (5)
-            elif line=='MAX_ROLL\n' or self.flag==5:
-                if self.flag==5:
-                    current_line=[float(s) for s in line.split()]
-                    if len(current_line)==1:
-                        self.max_r=current_line[0]
-                        #DEBUG
-                        #print(self.max_r)
-                    else:
-                        sys.exit('Error reading MAX_ROLL value!')
-                    self.flag=0
-                else:
-                    self.flag=5
-
-            #### MAX_YAWRATE INFORMATION (6)
-            elif line=='MAX_YAWRATE\n' or self.flag==6:
-                if self.flag==6:
-                    current_line=[float(s) for s in line.split()]
-                    if len(current_line)==1:
-                        self.max_dy=current_line[0]
-                        #DEBUG
-                        #print(self.max_dy)
-                    else:
-                        sys.exit('Error reading MAX_YAWRATE value!')
-                    self.flag=0
-                else:
-                    self.flag=6
-            
-
-            #### PWM_RANGE INFORMATION (7)
-            elif line=='PWM_RANGE\n' or self.flag==7:
-                 if self.flag==7:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==2:
-                         self.PWM_MIN,self.PWM_MAX=[float(s) for s in line.split()]
-                         #DEBUG
-                         #print(self.PWM_MIN)
-                         #print(self.PWM_MAX)
-                     else:
-                         sys.exit('Error reading PWM_RANGE value!')
-                     self.flag=0
-                 else:
-                     self.flag=7
-        
-            #### PWM_FREQ INFORMATION (8)
-            elif line=='PWM_FREQ\n' or self.flag==8:
-                 if self.flag==8:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==1:
-                         self.PWM_FREQ=current_line[0]
-                         #DEBUG
-                         #print(self.PWM_FREQ)
-                     else:
-                         sys.exit('Error reading PWM_FREQ value!')
-                     self.flag=0
-                 else:
-                     self.flag=8
-                         
-            #### DEAD_BAND INFORMATION (9)
-            elif line=='DEAD_BAND\n' or self.flag==9:
-                 if self.flag==9:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==1:
-                         self.dead_band=current_line[0]
-                         #DEBUG
-                         #print(self.dead_band)
-                     else:
-                         sys.exit('Error reading DEAD_BAND value!')
-                     self.flag=0
-                 else:
-                     self.flag=9
-                     
-            #### DEAD_BAND INFORMATION (10)
-            elif line=='THR_CUT\n' or self.flag==10:
-                 if self.flag==10:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==1:
-                         self.thr_cut=current_line[0]
-                         #DEBUG
-                         #print(self.thr_cut)
-                     else:
-                         sys.exit('Error reading THR_CUT value!')
-                     self.flag=0
-                 else:
-                     self.flag=10
-                     
-            #### SYS_ORIENTATION INFORMATION (11)
-            elif line=='SYS_ORIENTATION\n' or self.flag==11:
-                 if self.flag==11:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==1:
-                         self.sys_or=current_line[0]
-                         #DEBUG
-                         #print(self.sys_or)
-                     else:
-                         sys.exit('Error reading SYS_ORIENTATION value!')
-                     self.flag=0
-                 else:
-                     self.flag=11
-                     
-            #### ALT_PID INFORMATION (12)
-            elif line=='ALT_PID\n' or self.flag==12:
-                 if self.flag==12:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==4:
-                         self.p_alt,self.d_alt,self.i_alt,self.il_alt=[float(s) for s in line.split()]
-                         #DEBUG
-                         #print(self.p_alt)
-                         #print(self.d_alt)
-                         #print(self.i_alt)
-                         #print(self.il_alt)
-                     else:
-                         sys.exit('Error reading ALT_PID values!')
-                     self.flag=0
-                 else:
-                     self.flag=12
-                     
-            #### SYS_ORIENTATION_OFFSET INFORMATION (13)
-            elif line=='SYS_ORIENTATION_OFFSET\n' or self.flag==13:
-                 if self.flag==13:
-                     current_line=[float(s) for s in line.split()]
-                     if len(current_line)==2:
-                         self.sys_offset_x,self.sys_offset_y=[float(s) for s in line.split()]
-                         #DEBUG
-                         #print(self.sys_offset_x)
-                         #print(self.sys_offset_y)
-                     else:
-                         sys.exit('Error reading SYS_ORIENTATION_OFFSET values!')
-                     self.flag=0
-                 else:
-                     self.flag=13                     
-                     
-                     
-#---------------------------------------------------------------------------                     
+        with open(self.file_name1,'rb') as file1:
+            raw=file1.read()
 
+        values,self.errors=parse_configuration(raw.decode())
+        if self.errors:
+            sys.exit('Error reading configuration file!\n'+'\n'.join(self.errors))
+
+        for key in values:
+            setattr(self,key,values[key])
+
+        if self.use_cache==1:
+            self.write_config_cache(raw,values)
+        return None
+
+    ## Load configuration values from the cache, returns 1 on success
+    def load_config_cache(self):
+        try:
+            st=os.stat(self.file_name1)
+            with open(self.cache_file,'rb') as f:
+                data=f.read()
+            magic,mtime,size,digest,table_crc,mask=CACHE_HEADER.unpack_from(data,0)
+            if magic!=CACHE_MAGIC or table_crc!=config_table_crc():
+                return 0
+            if mtime!=st.st_mtime_ns or size!=st.st_size:
+                # The file was touched, only reparse if the contents changed
+                with open(self.file_name1,'rb') as file1:
+                    raw=file1.read()
+                if hashlib.sha1(raw).digest()!=digest:
+                    return 0
+                # Same contents, record the new mtime and size so later starts skip the hash
+                self.rewrite_cache_header(data,st)
+            flat=struct.unpack_from('<%dd' % config_field_count(),data,CACHE_HEADER.size)
+        except (OSError,struct.error):
+            return 0
+
+        k=0
+        for s,keyword in enumerate(CONFIG_SECTIONS):
+            fields,vtype=CONFIG_SECTIONS[keyword]
+            if mask & (1<<s):
+                for name in fields:
+                    setattr(self,name,vtype(flat[k]))
+                    k=k+1
             else:
-                sys.exit('Unknown error reading configuration file!')
-        
-        file1.close()
+                k=k+len(fields)
+        return 1
+
+    ## Rewrite a cache's header with the config file's current mtime and size, failures are ignored
+    def rewrite_cache_header(self,data,st):
+        magic,mtime,size,digest,table_crc,mask=CACHE_HEADER.unpack_from(data,0)
+        data=bytearray(data)
+        CACHE_HEADER.pack_into(data,0,magic,st.st_mtime_ns,st.st_size,digest,table_crc,mask)
+        self.replace_cache(data)
         return None
 
+    ## Write the cache file through a temporary file so a partial cache is never read
+    def replace_cache(self,data):
+        try:
+            tmp=self.cache_file+'.tmp'
+            with open(tmp,'wb') as f:
+                f.write(data)
+            os.replace(tmp,self.cache_file)
+        except OSError:
+            pass
+        return None
+
+    ## Write the compiled cache next to the config file, failures are ignored
+    def write_config_cache(self,raw,values):
+        try:
+            st=os.stat(self.file_name1)
+            mask=0
+            flat=[]
+            for s,keyword in enumerate(CONFIG_SECTIONS):
+                fields=CONFIG_SECTIONS[keyword][0]
+                if fields[0] in values:
+                    mask=mask|(1<<s)
+                for name in fields:
+                    flat.append(float(values.get(name,0.0)))
+            data=CACHE_HEADER.pack(CACHE_MAGIC,st.st_mtime_ns,st.st_size,hashlib.sha1(raw).digest(),config_table_crc(),mask)
+            data=data+struct.pack('<%dd' % len(flat),*flat)
+            self.replace_cache(data)
+        except OSError:
+            pass
+        return None
+
+
     def read_calibration_file(self):
         #Open the config file
         try:
@@ -363,8 +286,65 @@ class read_config_file:
             self.hix=data[0]
             self.hiy=data[1]
             self.hiz=data[2]
+            #Soft iron matrix, only in files written by Mag_Calibration.py
+            if len(data)>=12:
+                self.mag_matrix=[data[3:6],data[6:9],data[9:12]]
+            else:
+                self.mag_matrix=None
             file3.close()
             return None
 
         except:
             sys.exit('No magnetometer calibration file found! Run mangetometer calibration script.')
+
+
+## Parse configuration file text in a single pass
+# Returns a dictionary of attribute values and a list of error messages
+def parse_configuration(text):
+    values={}
+    errors=[]
+    pending=None
+    line_number=0
+    for line in text.splitlines():
+        line_number=line_number+1
+        line=line.strip()
+        #Skip lines that are blank or start with #
+        if line=='' or line[0]=='#':
+            continue
+
+        #The line after a keyword holds its values
+        if pending is not None:
+            keyword,fields,vtype=pending
+            pending=None
+            items=line.split()
+            if len(items)!=len(fields):
+                errors.append('Line %d: %s expects %d value(s), found %d' % (line_number,keyword,len(fields),len(items)))
+                continue
+            try:
+                parsed=[vtype(s) for s in items]
+            except ValueError:
+                errors.append('Line %d: invalid %s value(s) "%s"' % (line_number,keyword,line))
+                continue
+            for name,value in zip(fields,parsed):
+                values[name]=value
+            continue
+
+        section=CONFIG_SECTIONS.get(line)
+        if section is None:
+            errors.append('Line %d: unknown keyword "%s"' % (line_number,line))
+        else:
+            pending=(line,section[0],section[1])
+
+    if pending is not None:
+        errors.append('%s is missing its values line' % pending[0])
+    return values,errors
+
+## Total number of attributes in the section table
+def config_field_count():
+    return sum(len(CONFIG_SECTIONS[k][0]) for k in CONFIG_SECTIONS)
+
+## Checksum of the section table (keywords, attribute names and value types),
+# invalidates caches written with a different table
+def config_table_crc():
+    return zlib.crc32(';'.join(k+':'+','.join(CONFIG_SECTIONS[k][0])+':'+CONFIG_SECTIONS[k][1].__name__
+                               for k in CONFIG_SECTIONS).encode())
@@ -0,0 +1,309 @@
+'''
+    Replay.py
+
+    Description: Replay recorded sensor logs through the estimators and controllers at full speed
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Records with repeated time stamps are skipped instead of dividing by zero
+
+    Inputs: add_record_streams
+                - logger = telemetry_logger to record the sensor streams in RECORD_STREAMS with
+            replay_flight
+                - prefix = log prefix the flight was recorded with (see Telemetry_Log.py)
+                - params <optional> = dictionary overriding REPLAY_DEFAULTS
+                - pipeline <optional> = pipeline class, defaults to replay_pipeline
+            replay_flights
+                - prefixes = list of log prefixes, one per flight
+                - processes <optional> = number of worker processes, defaults to the number of CPUs
+
+    Outputs: replay_flight      - dictionary of output name : NumPy array (see replay_pipeline),
+                                  plus 'samples' (sensor samples processed), 'seconds' (wall time)
+                                  and 'skipped' (records skipped per stream, see NOTES)
+             replay_flights     - list of replay_flight results in the order of prefixes, and the
+                                  overall samples per second
+
+    NOTES:
+    - Written for python3
+    - Recorded streams (RECORD_STREAMS):
+        imu     t, ax, ay, az [g], gx, gy, gz [deg/s], mx, my, mz [uT]
+        baro    t, press [mbar], temp [degC] (MS5805)
+        pitot   t, pdata [counts] (HWSSC)
+        sonar   t, dist [cm] (MB1242)
+        gps     t and the Ublox fields, as in Telemetry_Log.STANDARD_STREAMS
+    - All samples of a flight are merged into one time ordered sequence (ties keep the
+      stream order above) and fed to the pipeline under a virtual clock. comp_filt and PID
+      read the virtual clock, so results do not depend on the wall clock and are identical
+      from run to run
+    - replay_pipeline runs comp_filt.attitude3 and the roll/pitch PIDs on every IMU sample,
+      the baro altitude alpha-beta tracker and alt_kalman on every baro sample (using the
+      latest sonar and GPS values), a sonar tracker, the pitot sensor conversion, and
+      distance/bearing to the first GPS fix with nav. Subclass it to change the processing
+    - Baro, sonar and GPS records whose time stamp is not later than the previous record of
+      the same stream (duplicates from logs with millisecond resolution) are skipped and
+      counted in pipeline.skipped, the trackers and alt_kalman need dt>0
+    - Flights are independent, replay_flights runs them in separate processes
+
+    Calls: Complementary_Filter2, PID, Kalman_Altitude, Alpha_Beta_Filter, Navigation,
+           Pressure_Altitude, SSC005D, Telemetry_Log
+
+    Requirements: numpy
+
+'''
+
+
+import os
+import time
+import multiprocessing
+import numpy as np
+from Complementary_Filter2 import comp_filt
+from PID import PID
+from Kalman_Altitude import alt_kalman
+from Alpha_Beta_Filter import trackfilt
+from Navigation import nav
+from Pressure_Altitude import pressure_altitude
+from SSC005D import calibration_coefficients
+from Telemetry_Log import STANDARD_STREAMS, read_log
+
+## Sensor streams recorded in flight, name : (fields, format)
+RECORD_STREAMS={
+    'imu':   (('t','ax','ay','az','gx','gy','gz','mx','my','mz'),'d9f'),
+    'baro':  (('t','press','temp'),'d2f'),
+    'pitot': (('t','pdata'),'dH'),
+    'sonar': (('t','dist'),'df'),
+    'gps':   STANDARD_STREAMS['gps'],
+}
+
+## Default estimator and controller parameters
+REPLAY_DEFAULTS={
+    'hard_iron':  (0.0,0.0,0.0),
+    'roll_pid':   (1.0,0.1,0.0,10.0),   # kp, kd, ki, integral limit
+    'pitch_pid':  (1.0,0.1,0.0,10.0),
+    'kf_p':       [1.0,0.0,0.0,1.0],
+    'kf_q':       [0.01,0.1],
+    'kf_r':       [0.5,4.0,25.0,1.0],   # sonar, baro, GPS altitude, GPS vertical velocity
+    'baro_track': (0.5,0.1),            # alpha, beta
+    'sonar_track':(0.5,0.1),
+    'sonar_max':  700.0,                # sonar readings above this are out of range (cm)
+    'stale':      0.5,                  # sonar and GPS older than this are not used (s)
+    'pitot_cal':  (1,5.0),              # calRange, sensRange
+}
+
+## Add the sensor streams to a telemetry_logger for recording a flight
+def add_record_streams(logger):
+    for name in RECORD_STREAMS:
+        fields,fmt=RECORD_STREAMS[name]
+        logger.add_stream(name,fields,fmt)
+    return None
+
+
+class virtual_clock:
+    def __init__(self,t=0.0):
+        self.t=t
+
+    def __call__(self):
+        return self.t
+
+
+class replay_pipeline:
+    def __init__(self,params,counts):
+        p=dict(REPLAY_DEFAULTS)
+        p.update(params or {})
+        self.p=p
+        self.clock=virtual_clock()
+        self.cf=comp_filt(p['hard_iron'][0],p['hard_iron'][1],p['hard_iron'][2],clock=self.clock)
+        self.pid_roll=PID(*p['roll_pid'],clock=self.clock)
+        self.pid_pitch=PID(*p['pitch_pid'],clock=self.clock)
+        self.kf=alt_kalman(p['kf_p'],p['kf_q'],p['kf_r'],[0.0,0.0])
+        self.baro_track=trackfilt(*p['baro_track'])
+        self.sonar_track=trackfilt(*p['sonar_track'])
+        self.nav=nav()
+        self.pa=None
+        m,b=calibration_coefficients(p['pitot_cal'][0])
+        self.pitot_gain=m*p['pitot_cal'][1]
+        self.pitot_offset=b*p['pitot_cal'][1]
+
+        # Latest values
+        self.t_baro=None
+        self.t_kf=None
+        self.t_sonar=-1e9
+        self.sonar_ft=0.0
+        self.t_gps=-1e9
+        self.gps_alt=0.0
+        self.gps_vz=0.0
+        self.home=None
+        self.hmsl0=None
+        self.skipped={'baro':0,'sonar':0,'gps':0}
+
+        # Preallocated outputs
+        self.out={'attitude':np.zeros((counts['imu'],4)),      # t, roll, pitch, yaw (deg)
+                  'control':np.zeros((counts['imu'],3)),       # t, roll PID, pitch PID
+                  'baro_alt':np.zeros((counts['baro'],3)),     # t, filtered altitude (ft), rate (ft/s)
+                  'altitude':np.zeros((counts['baro'],3)),     # t, Kalman altitude (ft), vertical speed (ft/s)
+                  'sonar':np.zeros((counts['sonar'],3)),       # t, filtered height (ft), rate (ft/s)
+                  'pitot':np.zeros((counts['pitot'],2)),       # t, differential pressure
+                  'gps':np.zeros((counts['gps'],3))}           # t, distance (ft) and bearing (deg) from the first fix
+        self.n={name:0 for name in self.out}
+
+    def record(self,name,values):
+        i=self.n[name]
+        self.out[name][i]=values
+        self.n[name]=i+1
+
+    def on_imu(self,r):
+        cf=self.cf
+        cf.attitude3(r[1],r[2],r[3],r[4],r[5],r[6],r[7],r[8],r[9])
+        self.record('attitude',(r[0],cf.roll_d,cf.pitch_d,cf.yaw_d))
+        roll_out=self.pid_roll.control(0.0,cf.roll_d,2,cf.phid_d)
+        pitch_out=self.pid_pitch.control(0.0,cf.pitch_d,2,cf.thetad_d)
+        self.record('control',(r[0],roll_out,pitch_out))
+
+    def on_baro(self,r):
+        t=r[0]
+        if self.t_baro is not None and t<=self.t_baro:
+            self.skipped['baro']=self.skipped['baro']+1
+            return None
+        # Altitude is measured from the first baro sample
+        if self.pa is None:
+            self.pa=pressure_altitude(r[1],r[2])
+        alt=self.pa.altitude(r[1])
+        dt=t-self.t_baro if self.t_baro is not None else 0.0
+        self.t_baro=t
+        x,v=self.baro_track.track(alt,dt if dt>0 else 1e-3)
+        self.record('baro_alt',(t,x,v))
+
+        # Kalman filter, sonar and GPS are only used while they are fresh
+        stale=self.p['stale']
+        h1=1.0 if t-self.t_sonar<stale else 0.0
+        h3=1.0 if t-self.t_gps<stale else 0.0
+        dt=t-self.t_kf if self.t_kf is not None else 0.0
+        self.t_kf=t
+        xest=self.kf.alt_kf([h1,1.0,h3,h3],[self.sonar_ft,alt,self.gps_alt,self.gps_vz],dt)
+        self.record('altitude',(t,xest[0],xest[1]))
+
+    def on_sonar(self,r):
+        if r[1]>self.p['sonar_max']:
+            return None
+        t=r[0]
+        dt=t-self.t_sonar
+        if dt<=0:
+            self.skipped['sonar']=self.skipped['sonar']+1
+            return None
+        self.t_sonar=t
+        x,v=self.sonar_track.track(r[1]/30.48,dt if dt<1e3 else 1.0)
+        self.sonar_ft=x
+        self.record('sonar',(t,x,v))
+
+    def on_pitot(self,r):
+        self.record('pitot',(r[0],self.pitot_gain*(r[1] & 0x3fff)+self.pitot_offset))
+
+    def on_gps(self,r):
+        t=r[0]
+        if t<=self.t_gps:
+            self.skipped['gps']=self.skipped['gps']+1
+            return None
+        p=[r[1],r[2]]
+        if self.home is None:
+            self.home=p
+            self.hmsl0=r[4]
+        self.t_gps=t
+        self.gps_alt=r[4]-self.hmsl0
+        self.gps_vz=-r[7]
+        self.record('gps',(t,self.nav.distance(self.home,p),self.nav.bearing(self.home,p)))
+
+    def results(self):
+        return {name:self.out[name][:self.n[name]] for name in self.out}
+
+
+## Replay one flight
+def replay_flight(prefix,params=None,pipeline=replay_pipeline):
+    t_start=time.perf_counter()
+    names=list(RECORD_STREAMS)
+    data={}
+    for name in names:
+        file_name=prefix+'_'+name+'.bin'
+        if os.path.exists(file_name):
+            data[name]=read_log(file_name)
+        else:
+            data[name]=np.zeros(0,dtype=[(f,'<f8') for f in RECORD_STREAMS[name][0]])
+
+    # Merge all samples into one time ordered sequence, ties keep the stream order
+    t=np.concatenate([data[name]['t'] for name in names])
+    stream=np.concatenate([np.full(len(data[name]),k) for k,name in enumerate(names)])
+    index=np.concatenate([np.arange(len(data[name])) for name in names])
+    order=np.argsort(t,kind='stable')
+
+    counts={name:len(data[name]) for name in names}
+    pipe=pipeline(params,counts)
+    clock=pipe.clock
+    rows=[data[name].tolist() for name in names]
+    handlers=[getattr(pipe,'on_'+name) for name in names]
+    for k in order.tolist():
+        s=stream[k]
+        r=rows[s][index[k]]
+        clock.t=r[0]
+        handlers[s](r)
+
+    result=pipe.results()
+    result['samples']=len(order)
+    result['skipped']=dict(getattr(pipe,'skipped',{}))
+    result['seconds']=time.perf_counter()-t_start
+    return result
+
+
+def _replay_one(args):
+    return replay_flight(*args)
+
+## Replay several flights in parallel, returns the results and the overall samples per second
+def replay_flights(prefixes,params=None,processes=None,pipeline=replay_pipeline):
+    t_start=time.perf_counter()
+    args=[(prefix,params,pipeline) for prefix in prefixes]
+    if processes==1 or len(prefixes)<2:
+        results=[_replay_one(a) for a in args]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results=pool.map(_replay_one,args)
+    total=sum(r['samples'] for r in results)
+    return results,total/(time.perf_counter()-t_start)
+
+
+## Record synthetic flights and replay them
+if __name__ == '__main__':
+    import math
+    import random
+    import tempfile
+    from Telemetry_Log import telemetry_logger
+
+    folder=tempfile.mkdtemp()
+    prefixes=[]
+    for flight in range(4):
+        random.seed(flight)
+        prefix=os.path.join(folder,'flight%d' % flight)
+        log=telemetry_logger(prefix,wait_when_full=1)
+        add_record_streams(log)
+        s=log.streams
+        for i in range(60000):      # 60s at 1kHz
+            t=i*0.001
+            roll=0.2*math.sin(t)
+            s['imu'].write(t,0.0,math.sin(roll),math.cos(roll),random.gauss(0,0.5),random.gauss(0,0.5),random.gauss(0,0.5),20.0,5.0,40.0)
+            alt=10*t
+            if i%40==0:
+                s['baro'].write(t,1013.25*(1-alt/145366.45)**5.2559+random.gauss(0,0.02),20.0)
+            if i%100==0:
+                s['sonar'].write(t,alt*30.48+random.gauss(0,2))
+                s['pitot'].write(t,8192+random.randint(-50,50))
+            if i%200==0:
+                s['gps'].write(t,40+t*1e-5,-105.0,alt,alt,0.0,3.0,-10.0,90.0,12,3,1.2,5.0,8.0,0.5)
+        log.close()
+        prefixes.append(prefix)
+
+    serial,rate_serial=replay_flights(prefixes,processes=1)
+    parallel,rate_parallel=replay_flights(prefixes)
+    repeat=replay_flight(prefixes[0])
+    same=all(np.array_equal(repeat[name],serial[0][name]) for name in repeat if name not in ('samples','seconds','skipped'))
+
+    print('Flights:                   %d x %d samples' % (len(prefixes),serial[0]['samples']))
+    print('Serial:                    %.0f samples/s' % rate_serial)
+    print('Parallel (%d processes):    %.0f samples/s' % (os.cpu_count(),rate_parallel))
+    print('Deterministic:             %s' % same)
+    print('Final altitude estimate:   %.1f ft' % serial[0]['altitude'][-1,1])
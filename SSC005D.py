@@ -6,6 +6,8 @@
     
     Revision History
     05 May 2017 - Created and debugged
+    19 Oct 2026 - Bus can be passed in (see I2C_Bus.py)
+    19 Oct 2026 - Added status decoding, oversampling ring buffer and batch conversion
     
     Author: Lars Soltmann
     
@@ -13,6 +15,15 @@
     
     Notes:
     - Written for Python3
+    - bus <optional> = shared i2c_bus or fake_i2c_bus, otherwise opened with Hardware.open_i2c
+    - Status bits (two MSBs): 0 = normal, 1 = command mode, 2 = stale data, 3 = diagnostic fault
+    - calRange: 1 = 10 to 90%, 2 = 5 to 95%, 3 = 5 to 85%, 4 = 4 to 94% calibration,
+      any other value raises ValueError
+    - ssc_sampler reads the sensor as fast as it is called (e.g. from Scheduler.py at the
+      sensor's update rate), drops stale and faulty samples, keeps the most recent counts in
+      a preallocated ring buffer and returns the average pressure of the samples taken since
+      the consumer last asked
+    - convert_pressure_batch() converts arrays of logged raw counts with NumPy
     
     
     Hardware Requirements:
@@ -26,21 +37,23 @@
     
 '''
 
-import smbus
 import time
 import math
 
 class HWSSC:
-    def __init__(self,devAddr):
+    def __init__(self,devAddr,bus=None):
         self.devAddr=devAddr
-        self.bus=smbus.SMBus(1)
+        if bus is None:
+            from Hardware import open_i2c
+            bus=open_i2c(1)
+        self.bus=bus
 
 
     def readPressure_raw(self):
         # Read two bytes of data
         pdata=self.bus.read_i2c_block_data(self.devAddr, 0,2)
         # The status byte is the first two bits of the MSB
-        #status=pdata_arr[0] >> 6
+        self.status=pdata[0] >> 6
         # Combine the two bytes
         pdata=((pdata[0]<<8)+pdata[1])
         # Set the status bits equal to zero
@@ -48,16 +61,91 @@ class HWSSC:
         return None
 
     def convertPressure(self,calRange,sensRange):
-        if (calRange == 1): # 10 to 90% calibration
-            press=(1.525878906e-4*self.pdata-1.25)*sensRange
-        
-        elif (calRange == 2): # 5 to 95% calibration
-            press=(1.356336806e-4*self.pdata-1.111111111)*sensRange
-
-        elif (calRange == 3): # 5 to 85% calibration
-            press=(1.525878906e-4*self.pdata-1.125)*sensRange
-
-        elif (calRange == 4): # 4 to 94% calibration
-            press=(1.356336806e-4*self.pdata-1.088888889)*sensRange
-        
+        m,b=calibration_coefficients(calRange)
+        press=(m*self.pdata+b)*sensRange
         return press
+
+
+## Transfer function coefficients for each calibration range, press = (m*counts+b)*sensRange
+CAL_RANGES={
+    1: (1.525878906e-4,-1.25),          # 10 to 90% calibration
+    2: (1.356336806e-4,-1.111111111),   # 5 to 95% calibration
+    3: (1.525878906e-4,-1.125),         # 5 to 85% calibration
+    4: (1.356336806e-4,-1.088888889),   # 4 to 94% calibration
+}
+
+def calibration_coefficients(calRange):
+    try:
+        return CAL_RANGES[calRange]
+    except KeyError:
+        raise ValueError('Unknown calibration range %r, must be 1-4' % (calRange,))
+
+## Convert an array of raw 16-bit readings (status bits are ignored)
+def convert_pressure_batch(counts,calRange,sensRange):
+    import numpy as np
+    m,b=calibration_coefficients(calRange)
+    counts=np.asarray(counts,dtype=np.int64) & 0x3fff
+    return (m*counts+b)*sensRange
+
+
+class ssc_sampler:
+    def __init__(self,sensor,calRange,sensRange,size=64):
+        from array import array
+        self.sensor=sensor
+        m,b=calibration_coefficients(calRange)
+        # Precomputed conversion, press = gain*counts+offset
+        self.gain=m*sensRange
+        self.offset=b*sensRange
+        self.size=size
+        self.buffer=array('H',[0])*size
+        self.index=0        # Position of the next sample in the buffer
+        self.count=0        # Number of valid samples in the buffer
+        self.sum=0          # Sum of the counts taken since the last read
+        self.n=0            # Number of samples taken since the last read
+        self.stale=0
+        self.faults=0
+        self.press=None
+
+    ## Read n samples from the sensor, returns the number of valid samples
+    def sample(self,n=1):
+        bus=self.sensor.bus
+        addr=self.sensor.devAddr
+        buffer=self.buffer
+        valid=0
+        for k in range(n):
+            data=bus.read_i2c_block_data(addr,0,2)
+            status=data[0]>>6
+            if status==2:
+                self.stale=self.stale+1
+                continue
+            if status!=0:
+                self.faults=self.faults+1
+                continue
+            counts=((data[0]&0x3f)<<8)|data[1]
+            buffer[self.index]=counts
+            self.index=self.index+1
+            if self.index==self.size:
+                self.index=0
+            self.sum=self.sum+counts
+            valid=valid+1
+        self.n=self.n+valid
+        self.count=min(self.count+valid,self.size)
+        if valid:
+            self.sensor.pdata=counts
+            self.sensor.status=0
+        return valid
+
+    ## Average pressure of the samples taken since the last call
+    # Returns the previous value if no new valid samples were taken, None if there never were any
+    def read(self):
+        if self.n>0:
+            self.press=self.gain*(self.sum/self.n)+self.offset
+            self.sum=0
+            self.n=0
+        return self.press
+
+    ## Most recent valid counts in the ring buffer, oldest first
+    def recent(self):
+        if self.count<self.size:
+            return self.buffer[:self.count]
+        return self.buffer[self.index:]+self.buffer[:self.index]
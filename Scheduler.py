@@ -0,0 +1,194 @@
+'''
+    Scheduler.py
+
+    Description: Multi-rate cooperative scheduler for sensors, estimators and controllers
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    References:
+    - https://en.wikipedia.org/wiki/Rate-monotonic_scheduling
+
+    Inputs: add_task
+                - name = task name used in the statistics
+                - fn = function called with no arguments
+                - rate = task rate (Hz)
+            run
+                - duration <optional> = seconds to run for, runs until stop() if not given
+            set_realtime (Linux only)
+                - priority <defaults to 50> = SCHED_FIFO priority (1-99)
+                - cpus <optional> = list of CPUs to pin the process to
+
+    Outputs: statistics         - dictionary of task name : dictionary of
+                                  runs, overruns, skipped, max_exec (s), mean_jitter (s), max_jitter (s)
+
+    NOTES:
+    - Written for python3
+    - Tasks are released on one time.monotonic() timeline. Release k of a task is at
+      start+k/rate, so periods do not drift no matter how long the tasks take
+    - When several tasks are due the one with the highest rate runs first (rate monotonic).
+      Tasks are never preempted, after each task the due list is checked again
+    - Jitter is the delay between a task's release time and the time it starts
+    - A task that is still running at its next release is counted as an overrun. If releases
+      are missed completely they are skipped (counted in skipped) instead of run back to back
+    - Between releases the scheduler sleeps, and busy waits the last spin seconds to reduce
+      wake up jitter
+    - Example:
+          s=scheduler()
+          s.add_task('attitude',attitude_step,1000)
+          s.add_task('control',control_step,100)
+          s.add_task('baro',baro.poll,25)
+          s.add_task('sonar',sonar_step,10)
+          s.add_task('gps',gps_step,5)
+          s.run()
+
+'''
+
+
+import os
+import sys
+import time
+
+class scheduler:
+    def __init__(self,spin=0.0002):
+        self.spin=spin
+        self.names=[]
+        self.fns=[]
+        self.periods=[]
+        self.running=0
+        self.reset_statistics()
+
+    ## Register a task, tasks are kept in rate monotonic order (highest rate first)
+    def add_task(self,name,fn,rate):
+        tasks=list(zip(self.names,self.fns,self.periods))
+        tasks.append((name,fn,1.0/rate))
+        tasks.sort(key=lambda t: t[2])
+        self.names=[t[0] for t in tasks]
+        self.fns=[t[1] for t in tasks]
+        self.periods=[t[2] for t in tasks]
+        self.reset_statistics()
+        return None
+
+    def reset_statistics(self):
+        n=len(self.names)
+        self.runs=[0]*n
+        self.overruns=[0]*n
+        self.skipped=[0]*n
+        self.max_exec=[0.0]*n
+        self.sum_jitter=[0.0]*n
+        self.max_jitter=[0.0]*n
+        self.dispatch_time=0.0
+        self.dispatches=0
+
+    ## Use SCHED_FIFO and optionally pin to CPUs, returns 1 on success
+    def set_realtime(self,priority=50,cpus=None):
+        if not sys.platform.startswith('linux'):
+            return 0
+        try:
+            if cpus is not None:
+                os.sched_setaffinity(0,cpus)
+            os.sched_setscheduler(0,os.SCHED_FIFO,os.sched_param(priority))
+            return 1
+        except (OSError,AttributeError):
+            return 0
+
+    def stop(self):
+        self.running=0
+
+    ## Run the tasks
+    def run(self,duration=None):
+        n=len(self.fns)
+        fns=self.fns
+        periods=self.periods
+        release=[0]*n   # Release number of the next run of each task
+        clock=time.monotonic
+        start=clock()
+        end=start+duration if duration is not None else float('inf')
+        due=[start]*n   # Release time of the next run of each task
+        self.running=1
+
+        while self.running==1:
+            now=clock()
+            if now>=end:
+                break
+            # Highest rate task that is due
+            i=0
+            while i<n and now<due[i]:
+                i=i+1
+            if i==n:
+                # Nothing due, wait for the next release
+                wait=min(due)-now
+                if wait>self.spin:
+                    time.sleep(wait-self.spin)
+                continue
+
+            t_release=due[i]
+            t0=clock()
+            fns[i]()
+            t1=clock()
+
+            # Next release on the fixed timeline, skipping any that were missed entirely
+            k=release[i]+1
+            next_due=start+k*periods[i]
+            if t1>=next_due:
+                self.overruns[i]=self.overruns[i]+1
+                missed=int((t1-next_due)/periods[i])
+                if missed>0:
+                    self.skipped[i]=self.skipped[i]+missed
+                    k=k+missed
+                    next_due=start+k*periods[i]
+            release[i]=k
+            due[i]=next_due
+
+            # Statistics
+            jitter=t0-t_release
+            self.runs[i]=self.runs[i]+1
+            self.sum_jitter[i]=self.sum_jitter[i]+jitter
+            if jitter>self.max_jitter[i]:
+                self.max_jitter[i]=jitter
+            if t1-t0>self.max_exec[i]:
+                self.max_exec[i]=t1-t0
+            self.dispatch_time=self.dispatch_time+(clock()-t1)+(t0-now)
+            self.dispatches=self.dispatches+1
+
+        self.running=0
+        return None
+
+    ## Per task statistics
+    def statistics(self):
+        stats={}
+        for i in range(len(self.names)):
+            runs=self.runs[i]
+            stats[self.names[i]]={'runs':runs,
+                                  'overruns':self.overruns[i],
+                                  'skipped':self.skipped[i],
+                                  'max_exec':self.max_exec[i],
+                                  'mean_jitter':self.sum_jitter[i]/runs if runs else 0.0,
+                                  'max_jitter':self.max_jitter[i]}
+        return stats
+
+    ## Mean scheduler time per task run (s)
+    def overhead(self):
+        if self.dispatches==0:
+            return 0.0
+        return self.dispatch_time/self.dispatches
+
+
+## Benchmark the scheduling overhead and jitter with empty tasks
+if __name__ == '__main__':
+    def task():
+        return None
+
+    s=scheduler()
+    for name,rate in (('attitude',1000),('control',100),('baro',25),('sonar',10),('gps',5)):
+        s.add_task(name,task,rate)
+    if '--realtime' in sys.argv:
+        print('SCHED_FIFO: %s' % ('on' if s.set_realtime() else 'not permitted'))
+    s.run(2.0)
+
+    print('Overhead per task run:  %.2f us' % (s.overhead()*1e6))
+    print('%-10s %6s %9s %8s %16s %15s' % ('task','runs','overruns','skipped','mean jitter(us)','max jitter(us)'))
+    stats=s.statistics()
+    for name in s.names:
+        t=stats[name]
+        print('%-10s %6d %9d %8d %16.1f %15.1f' % (name,t['runs'],t['overruns'],t['skipped'],t['mean_jitter']*1e6,t['max_jitter']*1e6))
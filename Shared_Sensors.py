@@ -0,0 +1,315 @@
+'''
+    Shared_Sensors.py
+
+    Description: Sensor acquisition in worker processes, latest samples exchanged through shared memory
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Samples carry a CRC checked on read, readers yield and give up after a retry limit
+
+    Inputs: sensor_acquisition init
+                - processes <defaults to 1> = 1 to run each sensor in its own process,
+                                              0 to run them as threads of this process
+            add
+                - name = sensor name
+                - fields = names of the values returned by the reader (a time stamp is added)
+                - factory = function called in the worker that opens the sensor and returns a
+                            reader, a function with no arguments returning a tuple of the values
+                            (see ms5805_reader, mb1242_reader, hwssc_reader, ublox_reader)
+                - rate <optional> = samples per second, if not given the reader is called back
+                                    to back (for readers that block until data is ready)
+            read
+                - name = sensor name
+                - retries <defaults to 1000> = attempts to get a consistent sample before giving up
+
+    Outputs: read               - [version, values], version counts the samples published (0 until
+                                  the first one) and values is a tuple of t (time.monotonic()),
+                                  then the fields given to add. If no consistent sample is read
+                                  in retries attempts the last good one is returned, IOError is
+                                  raised if there is none
+
+    NOTES:
+    - Written for python3
+    - Blocking SPI/I2C transfers and the driver code around them hold the GIL for much of
+      their time. Running acquisition in separate processes leaves the control loop's
+      interpreter to the attitude and control math (on a multicore board)
+    - Each sensor publishes into a multiprocessing.shared_memory block laid out as a 64-bit
+      sequence number, the values as doubles, then a check word holding the low 32 bits of
+      the sequence and the CRC-32 of the values. The writer makes the sequence odd, writes
+      the values and check word and makes the sequence even again. A reader copies the block
+      in one go and accepts the copy only if the sequence is even, matches the check word
+      and the CRC matches the values, otherwise it yields (time.sleep(0)) and tries again.
+      Neither side ever waits on a lock
+    - The check is made on the reader's private copy, so it does not depend on the order in
+      which the writer's stores become visible to the reader (Python has no memory
+      barriers and ARM may reorder them). A copy mixing two samples fails the CRC
+    - Nothing is pickled or sent through pipes, a read is one copy of the block and a CRC
+    - The factory runs inside the worker, so the bus is opened by the process that uses it.
+      With the spawn start method factories must be picklable, use module level functions or
+      functools.partial as in the example
+    - Example:
+          acq=sensor_acquisition()
+          acq.add('baro',SENSOR_FIELDS['baro'],functools.partial(ms5805_reader,0x76),rate=50)
+          acq.add('gps',SENSOR_FIELDS['gps'],ublox_reader)
+          acq.start()
+          version,(t,press,temp)=acq.read('baro')
+          acq.stop()
+
+    Calls: MS5805, MB1242, SSC005D, UbloxGPS (by the standard readers)
+
+'''
+
+
+import time
+import zlib
+import struct
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+## Fields published by the standard readers
+SENSOR_FIELDS={
+    'baro':  ('press','temp'),
+    'sonar': ('dist',),
+    'pitot': ('press',),
+    'gps':   ('lat','lon','h','hmsl','N','E','D','crs','nsat','stat','pdop','horizacc','altacc','velacc'),
+}
+
+
+class shared_block:
+    def __init__(self,n,name=None):
+        self.n=n
+        self.size=8+8*n+8
+        self.shm=shared_memory.SharedMemory(name=name,create=name is None,size=self.size)
+        self.name=self.shm.name
+        self.buf=self.shm.buf
+        # The sequence is stored through a native 64-bit view so it is written in one
+        # access, struct's '<Q' packs byte by byte
+        self.seq=self.buf[:8].cast('Q')
+        self.values=struct.Struct('=%dd' % n)
+        self.layout=struct.Struct('=Q%ddII' % n)
+        self.check=struct.Struct('=II')
+        self.sequence=self.seq[0]
+        self.last=None
+        if name is None:
+            # Valid empty sample, version 0 with all values 0
+            self.check.pack_into(self.buf,8+8*n,0,zlib.crc32(bytes(8*n)))
+
+    ## Publish one sample, only one process may write a block
+    def write(self,values):
+        s=self.sequence+1
+        self.seq[0]=s
+        self.values.pack_into(self.buf,8,*values)
+        crc=zlib.crc32(self.buf[8:8+8*self.n])
+        self.check.pack_into(self.buf,8+8*self.n,(s+1)&0xFFFFFFFF,crc)
+        self.sequence=s+1
+        self.seq[0]=s+1
+
+    ## Latest sample, returns [version, values]
+    def read(self,retries=1000):
+        n=self.n
+        for k in range(retries):
+            data=bytes(self.buf[:self.size])
+            fields=self.layout.unpack(data)
+            s=fields[0]
+            if (s & 1)==0 and fields[-2]==(s & 0xFFFFFFFF) and fields[-1]==zlib.crc32(data[8:8+8*n]):
+                self.last=[s>>1,fields[1:1+n]]
+                return self.last
+            time.sleep(0)
+        if self.last is None:
+            raise IOError('No consistent sample in %d reads of shared block %s' % (retries,self.name))
+        return self.last
+
+    def close(self):
+        self.seq.release()
+        self.buf=None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+## Worker loop, publishes the reader's samples until stop is set
+def _acquire(block_name,n,factory,period,stop):
+    block=shared_block(n,block_name)
+    try:
+        read=factory()
+        clock=time.monotonic
+        next_t=clock()
+        while not stop.is_set():
+            values=read()
+            block.write((clock(),)+tuple(values))
+            if period is not None:
+                next_t=next_t+period
+                wait=next_t-clock()
+                if wait>0:
+                    time.sleep(wait)
+                else:
+                    next_t=clock()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        block.close()
+    return None
+
+
+class sensor_acquisition:
+    def __init__(self,processes=1):
+        self.processes=processes
+        self.names=[]
+        self.specs={}
+        self.blocks={}
+        self.workers=[]
+        self.stop_event=None
+
+    ## Register a sensor, must be called before start()
+    def add(self,name,fields,factory,rate=None):
+        self.names.append(name)
+        self.specs[name]=(tuple(fields),factory,None if rate is None else 1.0/rate)
+        self.blocks[name]=shared_block(len(fields)+1)
+        return None
+
+    def fields(self,name):
+        return ('t',)+self.specs[name][0]
+
+    ## Start one worker per sensor
+    def start(self):
+        if self.processes==1:
+            self.stop_event=multiprocessing.Event()
+        else:
+            self.stop_event=threading.Event()
+        for name in self.names:
+            fields,factory,period=self.specs[name]
+            args=(self.blocks[name].name,len(fields)+1,factory,period,self.stop_event)
+            if self.processes==1:
+                w=multiprocessing.Process(target=_acquire,args=args,name='acquire_'+name,daemon=True)
+            else:
+                w=threading.Thread(target=_acquire,args=args,name='acquire_'+name,daemon=True)
+            w.start()
+            self.workers.append(w)
+        return None
+
+    ## Latest sample of a sensor, returns [version, values]
+    def read(self,name,retries=1000):
+        return self.blocks[name].read(retries)
+
+    ## Bound read function of a sensor, saves the lookup in the loop
+    def reader(self,name):
+        return self.blocks[name].read
+
+    ## Stop the workers and release the shared memory
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for w in self.workers:
+            w.join(2.0)
+            if self.processes==1 and w.is_alive():
+                w.terminate()
+        self.workers=[]
+        for name in self.names:
+            self.blocks[name].close()
+            self.blocks[name].unlink()
+        self.blocks={}
+        return None
+
+
+## Standard readers, each opens its sensor and returns a function reading one sample
+def ms5805_reader(devAddr=0x76):
+    from MS5805 import MS5805
+    baro=MS5805(devAddr)
+    baro.initialize()
+    def read():
+        baro.read_pressure_temperature()
+        return (baro.PRESS,baro.TEMP)
+    return read
+
+def mb1242_reader(i2c_addr=0x70):
+    from MB1242 import MB1242
+    sonar=MB1242(i2c_addr)
+    def read():
+        sonar.refreshDistance()
+        time.sleep(0.1) # MaxBotix recommends 100ms between reading commands
+        sonar.readDistance()
+        return (sonar.dist,)
+    return read
+
+def hwssc_reader(devAddr=0x28,calRange=1,sensRange=5):
+    from SSC005D import HWSSC
+    pitot=HWSSC(devAddr)
+    def read():
+        pitot.readPressure_raw()
+        return (pitot.convertPressure(calRange,sensRange),)
+    return read
+
+def ublox_reader():
+    from UbloxGPS import Ublox
+    gps=Ublox()
+    gps.initialize()
+    def read():
+        # Wait for the next position/velocity/time message
+        while gps.getMessage()!=0x07:
+            pass
+        return (gps.gps_lat,gps.gps_lon,gps.gps_h,gps.gps_hmsl,gps.gps_N,gps.gps_E,gps.gps_D,gps.gps_crs,
+                gps.gps_nsat,gps.gps_stat,gps.gps_pdop,gps.gps_horizacc,gps.gps_altacc,gps.gps_velacc)
+    return read
+
+
+## Reader standing in for a driver, cpu seconds of Python work (holding the GIL) then io seconds of waiting
+def simulated_reader(cpu,io):
+    def read():
+        t_end=time.perf_counter()+cpu
+        x=0
+        while time.perf_counter()<t_end:
+            x=x+1
+        time.sleep(io)
+        return (float(x),)
+    return read
+
+
+## Control loop jitter with acquisition in threads and in processes
+if __name__ == '__main__':
+    import os
+    import functools
+    from Complementary_Filter2 import comp_filt
+
+    rate=500
+    duration=3.0
+
+    def control_loop(acq):
+        cf=comp_filt()
+        readers=[acq.reader(name) for name in acq.names]
+        period=1.0/rate
+        clock=time.monotonic
+        start=clock()
+        late=[]
+        k=0
+        while k*period<duration:
+            k=k+1
+            release=start+k*period
+            wait=release-clock()
+            if wait>0:
+                time.sleep(wait)
+            late.append(clock()-release)
+            for r in readers:
+                r()
+            cf.attitude3(0.0,0.0,1.0,0.1,0.2,0.3,20.0,5.0,40.0)
+        late.sort()
+        return late[len(late)//2],late[int(len(late)*0.99)],late[-1]
+
+    results=[]
+    for processes in (0,1):
+        acq=sensor_acquisition(processes)
+        # Roughly the driver time of the baro, pitot, sonar and GPS
+        acq.add('baro',('value',),functools.partial(simulated_reader,0.002,0.018))
+        acq.add('pitot',('value',),functools.partial(simulated_reader,0.001,0.004))
+        acq.add('sonar',('value',),functools.partial(simulated_reader,0.001,0.1))
+        acq.add('gps',('value',),functools.partial(simulated_reader,0.010,0.19))
+        acq.start()
+        time.sleep(0.3)
+        results.append(control_loop(acq))
+        acq.stop()
+
+    print('CPUs: %d, control loop %d Hz for %.0fs' % (os.cpu_count(),rate,duration))
+    print('%-24s %12s %12s %12s' % ('acquisition','median(us)','p99(us)','max(us)'))
+    for name,(median,p99,worst) in zip(('threads','processes'),results):
+        print('%-24s %12.0f %12.0f %12.0f' % (name,median*1e6,p99*1e6,worst*1e6))
@@ -0,0 +1,261 @@
+'''
+    Spatial_Index.py
+
+    Description: Spatial index for nearest waypoint and within radius queries over large missions
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+
+    References:
+    - https://en.wikipedia.org/wiki/K-d_tree
+    - http://www.movable-type.co.uk/scripts/latlong-vectors.html
+
+    Inputs: init
+                - points <optional> = list of [lat,lon] to build the index from
+            build_from_file
+                - file_name = waypoint file (see Navigation.py for format)
+            insert
+                - p = [lat,lon] of the new point
+            nearest / nearest_k
+                - p = [lat,lon] of the query point
+                - k = number of points to return
+            within_radius
+                - p = [lat,lon] of the query point
+                - r = search radius (ft)
+
+    Outputs: nearest            - [index,distance(ft)]
+             nearest_k          - list of [index,distance(ft)] sorted by distance
+             within_radius      - list of [index,distance(ft)] sorted by distance
+
+    NOTES:
+    - Written for python3
+    - Input coordinate format: [lat,lon] (deg), indices are in insertion order
+    - Points are stored as unit vectors on the sphere, so the straight line (chord)
+      distance is monotonic with the great circle distance and the tree needs no
+      special handling at the poles or the +/-180deg meridian
+    - Distances use the same Earth radius as Navigation.nav so results match nav.distance
+    - Points inserted after a build are added as leaves, the tree is rebuilt once
+      the number of inserted points exceeds the number of points in the last build
+
+'''
+
+
+import math
+import heapq
+from Navigation import nav, read_waypoint_file
+
+class waypoint_index:
+    def __init__(self,points=None):
+        self.ER=nav().ER
+        self.reset()
+        if points is not None:
+            self.build(points)
+
+    ## Remove all points from the index
+    def reset(self):
+        self.ll=[]      # [lat,lon] of each point
+        self.xyz=[]     # Unit vector of each point
+        self.axis=[]    # Split axis of each node (0=x, 1=y, 2=z)
+        self.left=[]    # Index of left child, -1 if none
+        self.right=[]   # Index of right child, -1 if none
+        self.root=-1
+        self.n_built=0
+        self.n_inserted=0
+
+    def __len__(self):
+        return len(self.ll)
+
+    ## Convert [lat,lon] (deg) to a unit vector
+    def to_xyz(self,p):
+        phi=math.radians(p[0])
+        lam=math.radians(p[1])
+        cphi=math.cos(phi)
+        return (cphi*math.cos(lam),cphi*math.sin(lam),math.sin(phi))
+
+    ## Convert a squared chord length on the unit sphere to great circle distance
+    def chord2_to_distance(self,c2):
+        return 2*self.ER*math.asin(min(1.0,math.sqrt(c2)*0.5)) #ft
+
+    ## Build a balanced tree from a list of [lat,lon]
+    def build(self,points):
+        self.reset()
+        for p in points:
+            self.ll.append([p[0],p[1]])
+            self.xyz.append(self.to_xyz(p))
+        self.rebuild()
+
+    ## Build the index from a waypoint file
+    def build_from_file(self,file_name):
+        self.build(read_waypoint_file(file_name))
+
+    ## Rebuild a balanced tree over all the points currently in the index
+    def rebuild(self):
+        n=len(self.xyz)
+        self.axis=[0]*n
+        self.left=[-1]*n
+        self.right=[-1]*n
+        self.root=self._build(list(range(n)))
+        self.n_built=n
+        self.n_inserted=0
+
+    def _build(self,idx):
+        if not idx:
+            return -1
+        xyz=self.xyz
+        # Split along the axis with the largest spread
+        spread=[0,0,0]
+        for a in range(3):
+            values=[xyz[i][a] for i in idx]
+            spread[a]=max(values)-min(values)
+        a=spread.index(max(spread))
+        idx.sort(key=lambda i: xyz[i][a])
+        m=len(idx)//2
+        node=idx[m]
+        self.axis[node]=a
+        self.left[node]=self._build(idx[:m])
+        self.right[node]=self._build(idx[m+1:])
+        return node
+
+    ## Add a single point, returns its index
+    def insert(self,p):
+        i=len(self.ll)
+        self.ll.append([p[0],p[1]])
+        q=self.to_xyz(p)
+        self.xyz.append(q)
+        self.left.append(-1)
+        self.right.append(-1)
+        if self.root<0:
+            self.axis.append(0)
+            self.root=i
+        else:
+            # Descend to a leaf and attach the new point below it
+            node=self.root
+            while True:
+                a=self.axis[node]
+                if q[a]<self.xyz[node][a]:
+                    if self.left[node]<0:
+                        self.left[node]=i
+                        break
+                    node=self.left[node]
+                else:
+                    if self.right[node]<0:
+                        self.right[node]=i
+                        break
+                    node=self.right[node]
+            self.axis.append((a+1)%3)
+        self.n_inserted=self.n_inserted+1
+        # Keep the tree balanced, amortized cost stays O(log n) per insert
+        if self.n_inserted>max(self.n_built,64):
+            self.rebuild()
+        return i
+
+    ## Nearest k points to p
+    def nearest_k(self,p,k):
+        if k<=0 or self.root<0:
+            return []
+        q=self.to_xyz(p)
+        xyz=self.xyz
+        axis=self.axis
+        left=self.left
+        right=self.right
+        heap=[] # Max heap of (-chord^2,index)
+        stack=[(self.root,0.0)]
+        while stack:
+            node,bound=stack.pop()
+            if node<0 or (len(heap)==k and bound>=-heap[0][0]):
+                continue
+            v=xyz[node]
+            dx=q[0]-v[0]
+            dy=q[1]-v[1]
+            dz=q[2]-v[2]
+            c2=dx*dx+dy*dy+dz*dz
+            if len(heap)<k:
+                heapq.heappush(heap,(-c2,node))
+            elif c2<-heap[0][0]:
+                heapq.heapreplace(heap,(-c2,node))
+            a=axis[node]
+            diff=q[a]-v[a]
+            if diff<0:
+                near=left[node]
+                far=right[node]
+            else:
+                near=right[node]
+                far=left[node]
+            # Far side is pushed first so the near side is searched first
+            stack.append((far,diff*diff))
+            stack.append((near,bound))
+        result=[[i,self.chord2_to_distance(-c2)] for c2,i in heap]
+        result.sort(key=lambda r: r[1])
+        return result
+
+    ## Nearest point to p
+    def nearest(self,p):
+        result=self.nearest_k(p,1)
+        if result:
+            return result[0]
+        return None
+
+    ## All points within r (ft) of p
+    def within_radius(self,p,r):
+        if self.root<0:
+            return []
+        q=self.to_xyz(p)
+        # Convert the great circle radius to a chord length on the unit sphere
+        ang=min(r/self.ER,math.pi)
+        r2=(2*math.sin(ang*0.5))**2
+        xyz=self.xyz
+        axis=self.axis
+        left=self.left
+        right=self.right
+        result=[]
+        stack=[self.root]
+        while stack:
+            node=stack.pop()
+            v=xyz[node]
+            dx=q[0]-v[0]
+            dy=q[1]-v[1]
+            dz=q[2]-v[2]
+            c2=dx*dx+dy*dy+dz*dz
+            if c2<=r2:
+                result.append([node,self.chord2_to_distance(c2)])
+            a=axis[node]
+            diff=q[a]-v[a]
+            if diff<0 or diff*diff<=r2:
+                if left[node]>=0:
+                    stack.append(left[node])
+            if diff>=0 or diff*diff<=r2:
+                if right[node]>=0:
+                    stack.append(right[node])
+        result.sort(key=lambda r: r[1])
+        return result
+
+
+## Benchmark against a brute force scan using nav.distance
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(1)
+    n=20000
+    points=[[40+random.random()*0.5,-105+random.random()*0.5] for i in range(n)]
+    queries=[[40+random.random()*0.5,-105+random.random()*0.5] for i in range(200)]
+
+    t0=time.perf_counter()
+    index=waypoint_index(points)
+    t_build=time.perf_counter()-t0
+
+    n1=nav()
+    t0=time.perf_counter()
+    brute=[min(range(n),key=lambda i: n1.distance(q,points[i])) for q in queries]
+    t_brute=(time.perf_counter()-t0)/len(queries)
+
+    t0=time.perf_counter()
+    fast=[index.nearest(q)[0] for q in queries]
+    t_index=(time.perf_counter()-t0)/len(queries)
+
+    print('Points:            %d' % n)
+    print('Build:             %.3f s' % t_build)
+    print('Brute force:       %.1f us/query' % (t_brute*1e6))
+    print('Index:             %.1f us/query' % (t_index*1e6))
+    print('Speedup:           %.0fx' % (t_brute/t_index))
+    print('Results match:     %s' % (brute==fast))
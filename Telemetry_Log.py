@@ -0,0 +1,291 @@
+'''
+    Telemetry_Log.py
+
+    Description: Binary telemetry logger with a background writer thread, and a reader returning NumPy arrays
+
+    Revision History
+    19 Oct 2026 - Created and debugged
+    19 Oct 2026 - Write errors are kept and raised by flush()/close() instead of hanging them
+    19 Oct 2026 - Short raw writes are completed, a write that makes no progress is an error
+
+    Inputs: telemetry_logger init
+                - prefix = path prefix of the log files, each stream is written to <prefix>_<stream>.bin
+                - buffer_rows <defaults to 4096> = rows held in each of a stream's two buffers
+                - wait_when_full <defaults to 0> = 1 to wait for the writer instead of dropping rows,
+                                                   for offline use such as simulation and replay
+            add_stream
+                - name = stream name
+                - fields = list of field names
+                - fmt = struct format of one row without the byte order, e.g. 'dfff'
+            add_standard_streams
+                - None, adds the streams in STANDARD_STREAMS
+            log_attitude / log_altitude / log_pid / log_gps
+                - t = time stamp (s), time.monotonic() if not given
+                - see the functions for the other inputs
+            read_log
+                - file_name = log file written by telemetry_logger
+
+    Outputs: add_stream         - stream, stream.write(*values) logs one row
+             read_log           - NumPy structured array with one field per stream field
+
+    NOTES:
+    - Written for python3
+    - Every stream has a fixed row layout (little endian, no padding) and its own file, which
+      starts with a short header describing the layout
+    - The loop side cost of a row is one struct.pack_into into a preallocated buffer. When a
+      buffer is full it is handed to the writer thread, which writes it out in one large
+      sequential write while the loop fills the stream's other buffer
+    - If the writer falls behind so that both buffers of a stream are full, rows are dropped
+      and counted in stream.dropped rather than stalling the loop (unless wait_when_full=1)
+    - close() (or flush()) must be called to write the rows still in the buffers
+    - If a file write fails (disk full, card removed) the writer keeps the first error in
+      logger.error and discards the rows it is given from then on, counting them in
+      stream.lost. The loop is never stalled by it, write() drops rows instead of waiting
+      even with wait_when_full=1, and flush()/close() raise the error
+    - stream.lost is written only by the writer thread and stream.dropped only by the loop
+    - The files are unbuffered, each buffer goes to the OS directly. A raw write may take
+      fewer bytes than it is given, write_all() repeats it until the whole buffer is written
+      and treats a write that makes no progress as a failed write
+
+    Requirements: numpy (read_log only)
+
+'''
+
+
+import time
+import struct
+import threading
+import queue
+
+LOG_MAGIC=b'APTL'
+LOG_HEADER=struct.Struct('<4sH')
+
+## Standard streams, name : (fields, format)
+STANDARD_STREAMS={
+    'attitude': (('t','roll_d','pitch_d','yaw_d','phid_d','thetad_d','psid_d'),'d6f'),
+    'altitude': (('t','h','h_dot'),'d2f'),
+    'pid':      (('t','controller','target','actual','output'),'dB3f'),
+    'gps':      (('t','lat','lon','h','hmsl','N','E','D','crs','nsat','stat','pdop','horizacc','altacc','velacc'),'d2d6fBB4f'),
+}
+
+## struct format character : NumPy type
+NUMPY_TYPES={'b':'i1','B':'u1','h':'<i2','H':'<u2','i':'<i4','I':'<u4','q':'<i8','Q':'<u8','f':'<f4','d':'<f8'}
+
+
+class _stream:
+    def __init__(self,logger,name,fields,fmt,buffer_rows):
+        self.logger=logger
+        self.name=name
+        self.fields=tuple(fields)
+        self.fmt=fmt
+        packer=struct.Struct('<'+fmt)
+        if len(expand_format(fmt))!=len(self.fields):
+            raise ValueError('Stream %s has %d fields but format %s has %d values' % (name,len(self.fields),fmt,len(expand_format(fmt))))
+        self.row_size=packer.size
+        self.pack_into=packer.pack_into
+        self.capacity=buffer_rows*self.row_size
+        self.buffers=[bytearray(self.capacity),bytearray(self.capacity)]
+        self.busy=[0,0]     # 1 while the writer thread owns the buffer
+        self.active=0
+        self.buf=self.buffers[0]
+        self.offset=0
+        self.rows=0
+        self.dropped=0
+        self.lost=0
+        self.file=open(logger.prefix+'_'+name+'.bin','wb',buffering=0)
+        header=(fmt+';'+','.join(self.fields)).encode()
+        write_all(self.file,LOG_HEADER.pack(LOG_MAGIC,LOG_HEADER.size+len(header))+header)
+
+    ## Log one row
+    def write(self,*values):
+        if self.offset+self.row_size>self.capacity:
+            while self.swap()==0:
+                if self.logger.wait_when_full==0 or not self.logger.writing():
+                    self.dropped=self.dropped+1
+                    return None
+                time.sleep(0.0005)
+        self.pack_into(self.buf,self.offset,*values)
+        self.offset=self.offset+self.row_size
+        self.rows=self.rows+1
+        return None
+
+    ## Hand the active buffer to the writer and switch to the other one, returns 0 if both are full
+    def swap(self):
+        other=1-self.active
+        if self.busy[other]==1:
+            return 0
+        if self.offset>0:
+            self.busy[self.active]=1
+            self.logger.queue.put((self,self.active,self.offset))
+        self.active=other
+        self.buf=self.buffers[other]
+        self.offset=0
+        return 1
+
+
+class telemetry_logger:
+    def __init__(self,prefix,buffer_rows=4096,wait_when_full=0):
+        self.prefix=prefix
+        self.buffer_rows=buffer_rows
+        self.wait_when_full=wait_when_full
+        self.streams={}
+        self.error=None
+        self.queue=queue.Queue()
+        self.thread=threading.Thread(target=self._writer,name='telemetry_logger',daemon=True)
+        self.thread.start()
+
+    ## Add a stream with a fixed row layout
+    def add_stream(self,name,fields,fmt):
+        stream=_stream(self,name,fields,fmt,self.buffer_rows)
+        self.streams[name]=stream
+        return stream
+
+    ## Add the streams for comp_filt, alt_kalman, PID and Ublox
+    def add_standard_streams(self):
+        for name in STANDARD_STREAMS:
+            fields,fmt=STANDARD_STREAMS[name]
+            self.add_stream(name,fields,fmt)
+        return None
+
+    ## Log the attitude of a comp_filt instance after attitude3()
+    def log_attitude(self,cf,t=None):
+        self.streams['attitude'].write(time.monotonic() if t is None else t,cf.roll_d,cf.pitch_d,cf.yaw_d,cf.phid_d,cf.thetad_d,cf.psid_d)
+
+    ## Log the [h, h_dot] estimate returned by alt_kalman.alt_kf()
+    def log_altitude(self,xest,t=None):
+        self.streams['altitude'].write(time.monotonic() if t is None else t,xest[0],xest[1])
+
+    ## Log a PID controller, controller is a number identifying it (e.g. 0=pitch, 1=roll, ...)
+    def log_pid(self,controller,target,actual,output,t=None):
+        self.streams['pid'].write(time.monotonic() if t is None else t,controller,target,actual,output)
+
+    ## Log the latest fix of a Ublox instance
+    def log_gps(self,gps,t=None):
+        self.streams['gps'].write(time.monotonic() if t is None else t,gps.gps_lat,gps.gps_lon,gps.gps_h,gps.gps_hmsl,
+                                  gps.gps_N,gps.gps_E,gps.gps_D,gps.gps_crs,gps.gps_nsat,gps.gps_stat,gps.gps_pdop,
+                                  gps.gps_horizacc,gps.gps_altacc,gps.gps_velacc)
+
+    ## Writer thread, after a failed write the remaining buffers are released without writing
+    def _writer(self):
+        while True:
+            item=self.queue.get()
+            if item is None:
+                return None
+            stream,index,nbytes=item
+            try:
+                if self.error is None:
+                    write_all(stream.file,memoryview(stream.buffers[index])[:nbytes])
+                else:
+                    stream.lost=stream.lost+nbytes//stream.row_size
+            except Exception as e:
+                self.error=e
+                stream.lost=stream.lost+nbytes//stream.row_size
+            finally:
+                stream.busy[index]=0
+
+    ## 1 while buffers handed to the writer are being written
+    def writing(self):
+        return 1 if self.error is None and self.thread.is_alive() else 0
+
+    def _check_writer(self):
+        if self.error is not None:
+            raise IOError('Telemetry log write failed: %s' % (self.error,)) from self.error
+        if not self.thread.is_alive():
+            raise IOError('Telemetry log writer thread has stopped')
+
+    ## Hand all partially filled buffers to the writer and wait until they are written
+    def flush(self):
+        for name in self.streams:
+            stream=self.streams[name]
+            while stream.offset>0 and stream.swap()==0:
+                self._check_writer()
+                time.sleep(0.001)
+        for name in self.streams:
+            stream=self.streams[name]
+            while stream.busy[0]==1 or stream.busy[1]==1:
+                self._check_writer()
+                time.sleep(0.001)
+        self._check_writer()
+        return None
+
+    ## Write everything out and close the files
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.thread.is_alive():
+                self.queue.put(None)
+                self.thread.join()
+            for name in self.streams:
+                self.streams[name].file.close()
+        return None
+
+
+## Write all of data to an unbuffered file, a raw write may write only part of it
+def write_all(file,data):
+    view=memoryview(data).cast('B')
+    while len(view)>0:
+        n=file.write(view)
+        if not n:
+            raise IOError('Short write to %s, %d bytes not written' % (getattr(file,'name','log file'),len(view)))
+        view=view[n:]
+    return None
+
+## Expand a struct format such as 'd2f' to one character per value
+def expand_format(fmt):
+    chars=[]
+    count=''
+    for c in fmt:
+        if c.isdigit():
+            count=count+c
+        else:
+            chars.extend([c]*(int(count) if count else 1))
+            count=''
+    return chars
+
+## Load a log file into a NumPy structured array
+def read_log(file_name):
+    import numpy as np
+    with open(file_name,'rb') as f:
+        magic,header_len=LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+        if magic!=LOG_MAGIC:
+            raise ValueError('%s is not a telemetry log' % file_name)
+        fmt,fields=f.read(header_len-LOG_HEADER.size).decode().split(';')
+    fields=fields.split(',')
+    dtype=np.dtype([(name,NUMPY_TYPES[c]) for name,c in zip(fields,expand_format(fmt))])
+    return np.fromfile(file_name,dtype=dtype,offset=header_len)
+
+
+## Loop side cost compared to writing CSV lines
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    n=200000
+    folder=tempfile.mkdtemp()
+    results=[]
+    for wait in (0,1):
+        log=telemetry_logger(os.path.join(folder,'bench%d' % wait),wait_when_full=wait)
+        s=log.add_stream('attitude',STANDARD_STREAMS['attitude'][0],STANDARD_STREAMS['attitude'][1])
+        t0=time.perf_counter()
+        for i in range(n):
+            s.write(i*0.001,1.0,2.0,3.0,0.1,0.2,0.3)
+        results.append(((time.perf_counter()-t0)/n,s.dropped))
+        log.close()
+
+    f=open(os.path.join(folder,'bench.csv'),'w')
+    t0=time.perf_counter()
+    for i in range(n):
+        f.write('%f,%f,%f,%f,%f,%f,%f\n' % (i*0.001,1.0,2.0,3.0,0.1,0.2,0.3))
+    t_csv=(time.perf_counter()-t0)/n
+    f.close()
+
+    t0=time.perf_counter()
+    data=read_log(os.path.join(folder,'bench1_attitude.bin'))
+    t_read=time.perf_counter()-t0
+
+    # Rows are logged back to back here, a real loop leaves the writer time between cycles
+    print('Binary logger:              %.3f us/row (%d of %d dropped)' % (results[0][0]*1e6,results[0][1],n))
+    print('Binary logger, waiting:     %.3f us/row' % (results[1][0]*1e6))
+    print('CSV write:                  %.3f us/row' % (t_csv*1e6))
+    print('read_log:                   %d rows in %.1f ms' % (len(data),t_read*1e3))
@@ -5,10 +5,13 @@
     
     Revision History
     17 Apr 2016 - V1.0 Created and debugged
+    19 Oct 2026 - getMessage() reads a single message, for use from acquisition workers
+    19 Oct 2026 - SPI device can be passed in, spidev is only imported when it is opened
     
     Author: Lars Soltmann
     
-    INPUTS:    = None (spidev address is 0,0)
+    INPUTS:    = bus <optional> = object with the spidev methods used (xfer2), e.g. Hardware.fake_spi,
+                                  otherwise spidev 0,0 is opened with Hardware.open_spi
     
     
     OUTPUTS:   = gps_lat
@@ -34,15 +37,16 @@
     '''
 
 
-import spidev
 import math
 import struct
 import time
 
 class Ublox:
-    def __init__(self):
-        self.bus = spidev.SpiDev()
-        self.bus.open(0,0)  #Specifically for Navio2
+    def __init__(self,bus=None):
+        if bus is None:
+            from Hardware import open_spi
+            bus = open_spi(0,0)  #Specifically for Navio2
+        self.bus = bus
     
     def disableNMEA_GLL(self):
         msg = [0xb5, 0x62, 0x06, 0x01, 0x08, 0x00, 0xF0, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x01, 0x2B]
@@ -155,6 +159,14 @@ class Ublox:
         return None
                
     def getMessages(self):
+        while True:
+            self.getMessage()
+            time.sleep(0.0001)
+
+        return None
+
+    ## Read from the receiver until one message has been decoded, returns its message ID
+    def getMessage(self):
         message_ID=0;
         to_gps_data = [0x00]
         from_gps_data = [0x00]
@@ -186,16 +198,11 @@ class Ublox:
 
             elif message_flag==1:
                 self.decodeMessage(data_array)
-                message_flag=0
-                message_ID=0
-                spi_transfer_data_length=1
-                data_array[0:4]=[0,0,0,0]
                 self.typeFlag=0
+                return message_ID
 
             if message_flag==0:
                 time.sleep(0.0001)
-
-        return None
                
                
 